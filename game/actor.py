@@ -0,0 +1,92 @@
+"""
+Актор комнаты
+Действия игроков попадают в почтовый ящик комнаты и применяются строго по одному
+в порядке поступления. Обработчик может ждать (await) – следующее действие всё равно
+начнётся только после него, поэтому состояние партии не защищаем блокировками.
+Задача-обработчик живёт, пока в ящике есть действия: простаивающие комнаты задач не держат
+"""
+
+import os
+import time
+import asyncio
+import inspect
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Optional, Tuple
+
+from utils.metrics import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+MAILBOX_SIZE = int(os.environ.get('ROOM_MAILBOX_SIZE', 256))
+
+ACTION_LATENCY = Histogram(
+    'codenames_action_latency_seconds',
+    'От постановки действия в ящик до конца обработки (рассылка уже в очередях)',
+    ['action'],
+)
+ACTIONS_QUEUED = Gauge('codenames_actions_queued', 'Действия, ждущие в почтовых ящиках комнат')
+
+_queued = ACTIONS_QUEUED.labels()
+
+
+class RoomActor:
+    """Почтовый ящик комнаты с одной задачей-обработчиком"""
+
+    def __init__(self, room_id: str, mailbox_size: int = MAILBOX_SIZE):
+        self.room_id = room_id
+        self.mailbox_size = mailbox_size
+        self.mailbox: Deque[Tuple[Callable, tuple, float]] = deque()
+        self.processed = 0
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def __len__(self) -> int:
+        return len(self.mailbox)
+
+    @property
+    def busy(self) -> bool:
+        return self._task is not None
+
+    def submit(self, handler: Callable[..., Any], *args) -> bool:
+        """
+        Ставит действие в очередь: handler(*args) выполнится после всех предыдущих
+        False – ящик переполнен или комната уже закрыта
+        """
+        if self._closed or len(self.mailbox) >= self.mailbox_size:
+            return False
+        self.mailbox.append((handler, args, time.perf_counter()))
+        _queued.inc()
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return True
+
+    async def _run(self):
+        try:
+            while self.mailbox:
+                handler, args, enqueued_at = self.mailbox.popleft()
+                _queued.dec()
+                try:
+                    result = handler(*args)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"❌ Комната {self.room_id}: ошибка действия {handler.__name__}: {e}")
+                ACTION_LATENCY.labels(handler.__name__).observe(time.perf_counter() - enqueued_at)
+                self.processed += 1
+        finally:
+            self._task = None
+
+    async def drain(self):
+        """Ждёт, пока ящик опустеет"""
+        while self._task is not None:
+            await asyncio.shield(self._task)
+
+    def close(self):
+        """Комната удалена – необработанные действия выбрасываем"""
+        self._closed = True
+        _queued.dec(len(self.mailbox))
+        self.mailbox.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
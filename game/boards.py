@@ -0,0 +1,205 @@
+"""
+Раскладки без слишком похожих слов
+Рядом с источником слов может лежать индекс похожести <источник>.affinity.json:
+для каждого слова – до k самых близких (однокоренные, близкие по векторам).
+Строит его tools/build_affinity.py. Раскладка набирается жадно из случайных
+слов: слово не берём, если оно соседствует с уже выбранными, поэтому раскладка
+стоит O(25·k) обращений к индексу, а не O(V²).
+Готовые раскладки копит BoardPool в фоне, и /new и сброс партии их только забирают
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, FrozenSet, List, Optional
+
+from game.words import RELOAD_CHECK_INTERVAL, word_bank
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+BOARD_SIZE = 25
+# Сколько готовых раскладок держать на каждый источник слов
+BOARD_POOL_SIZE = int(os.environ.get('BOARD_POOL_SIZE', 32))
+# Сколько раз добирать случайные слова, прежде чем смириться с похожими
+MAX_ROUNDS = 4
+# Сколько раскладок строить подряд, не отдавая управление циклу событий
+GENERATE_CHUNK = 8
+
+BOARDS_GENERATED = Counter('codenames_boards_generated', 'Раскладки, построенные с учётом похожести', ['path'])
+BOARDS_RELAXED = Counter('codenames_boards_relaxed', 'Раскладки, где пришлось оставить похожие слова')
+
+_generated_pool = BOARDS_GENERATED.labels('pool')
+_generated_inline = BOARDS_GENERATED.labels('inline')
+_relaxed = BOARDS_RELAXED.labels()
+
+_EMPTY: FrozenSet[str] = frozenset()
+
+
+def affinity_path(words) -> str:
+    """Индекс лежит рядом с JSON-исходником словаря или пака"""
+    source = getattr(words, 'source', None) or words.path
+    return os.path.splitext(source)[0] + '.affinity.json'
+
+
+class AffinityIndex:
+    """Соседи слов по похожести; файл перечитывается, если изменился"""
+
+    def __init__(self, path: str, check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self.neighbors: Dict[str, FrozenSet[str]] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self.neighbors)
+
+    def reload(self) -> bool:
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            self.neighbors, self._mtime = {}, None
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Индекс похожести {self.path} не загружен: {e}")
+            return False
+        self.neighbors = {word: frozenset(near) for word, near in data.get('neighbors', {}).items()}
+        self._mtime = mtime
+        logger.info(f"🧲 Индекс похожести {self.path}: {len(self.neighbors)} слов")
+        return True
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self.reload()
+
+    def near(self, word: str) -> FrozenSet[str]:
+        return self.neighbors.get(word, _EMPTY)
+
+
+def generate_board(words, index: AffinityIndex, size: int = BOARD_SIZE) -> List[str]:
+    """
+    size разных слов, попарно не соседних в индексе. Если источник не даёт
+    столько далёких слов за MAX_ROUNDS добора, остаток берём из отвергнутых –
+    с наименьшим числом соседей на поле
+    """
+    if not index.neighbors:
+        return words.sample(size)
+    chosen: List[str] = []
+    taken = set()
+    blocked = set()    # соседи уже выбранных слов
+    rejected: List[str] = []
+    for _ in range(MAX_ROUNDS):
+        for word in words.sample(size):
+            if word in taken:
+                continue
+            taken.add(word)
+            near = index.near(word)
+            # Индекс мог обрезать список соседей, поэтому проверяем в обе стороны
+            if word in blocked or not near.isdisjoint(chosen):
+                rejected.append(word)
+                continue
+            chosen.append(word)
+            blocked |= near
+            if len(chosen) == size:
+                return chosen
+    _relaxed.inc()
+    rejected.sort(key=lambda w: len(index.near(w) & taken))
+    chosen.extend(rejected[:size - len(chosen)])
+    if len(chosen) < size:
+        chosen.extend(w for w in words.sample(size) if w not in taken)
+    return chosen[:size]
+
+
+class BoardPool:
+    """Заготовленные раскладки по источникам слов с фоновым пополнением"""
+
+    def __init__(self, size: int = BOARD_POOL_SIZE):
+        self.size = size
+        self.pools: Dict[int, Deque[List[str]]] = {}
+        self.sources: Dict[int, object] = {}
+        self.indexes: Dict[int, AffinityIndex] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def index(self, words) -> AffinityIndex:
+        key = id(words)
+        index = self.indexes.get(key)
+        if index is None:
+            index = self.indexes[key] = AffinityIndex(affinity_path(words))
+        index.maybe_reload()
+        return index
+
+    def generate(self, words) -> List[str]:
+        return generate_board(words, self.index(words))
+
+    def add(self, words) -> Deque[List[str]]:
+        """Источник, для которого держим запас раскладок"""
+        key = id(words)
+        if key not in self.sources:
+            self.sources[key] = words
+            self.pools[key] = deque()
+            if hasattr(words, 'on_reload'):
+                words.on_reload = self.reset
+        return self.pools[key]
+
+    def reset(self, words):
+        """Словарь перечитан: раскладки из старых слов больше не выдаём"""
+        pool = self.pools.get(id(words))
+        if pool:
+            pool.clear()
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    def take(self, words) -> List[str]:
+        """Готовая раскладка для источника; если запас кончился – строим на месте"""
+        pool = self.add(words)
+        maybe_reload = getattr(words, 'maybe_reload', None)
+        if maybe_reload is not None:
+            maybe_reload()  # перечитанный словарь сбросит pool через reset
+        if self._wakeup is not None and len(pool) <= self.size // 2:
+            self._wakeup.set()
+        if pool:
+            return pool.popleft()
+        _generated_inline.inc()
+        return self.generate(words)
+
+    def fill(self, words, count: int) -> int:
+        """Достраивает запас не больше чем на count раскладок, возвращает сколько построено"""
+        pool = self.add(words)
+        built = 0
+        while len(pool) < self.size and built < count:
+            pool.append(self.generate(words))
+            built += 1
+        _generated_pool.inc(built)
+        return built
+
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            self._wakeup.clear()
+            try:
+                for words in list(self.sources.values()):
+                    while self.fill(words, GENERATE_CHUNK):
+                        await asyncio.sleep(0)
+            except Exception as e:
+                logger.error(f"❌ Ошибка заготовки раскладок: {e}")
+            await self._wakeup.wait()
+
+
+board_pool = BoardPool()
+board_pool.add(word_bank)
@@ -0,0 +1,387 @@
+"""
+Журнал событий партий
+Каждое изменение партии дописывается в конец файла-сегмента компактной
+двоичной записью:
+
+    length u32 | crc32 u32 | kind u8 | ts f64 | room_len u8 | room_id | payload
+
+length и crc32 считаются по всему, что после них. Записи копятся в памяти
+и раз в flush_interval уходят на диск одной записью с одним fsync на всех.
+Полное состояние (создание, сброс, снимок каждые snapshot_every событий)
+позволяет восстановить комнату, прочитав только хвост её событий.
+Сегменты читаются один раз в open() – в потоке, уже после того, как сервер
+открыл порт, – и в памяти остаётся индекс:
+комната -> позиции её событий с начала текущей партии.
+События, пришедшие до конца чтения, ждут в памяти и дописываются после него
+"""
+
+import os
+import time
+import zlib
+import struct
+import asyncio
+import logging
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Пустой EVENT_LOG_DIR – журнал выключен
+EVENT_LOG_DIR = os.environ.get('EVENT_LOG_DIR', '')
+EVENT_LOG_FLUSH_INTERVAL = float(os.environ.get('EVENT_LOG_FLUSH_INTERVAL', 0.2))
+EVENT_LOG_SEGMENT_MB = float(os.environ.get('EVENT_LOG_SEGMENT_MB', 64))
+EVENT_LOG_SNAPSHOT_EVERY = int(os.environ.get('EVENT_LOG_SNAPSHOT_EVERY', 32))
+# Сколько часов хранить закрытые сегменты
+EVENT_LOG_RETENTION_HOURS = float(os.environ.get('EVENT_LOG_RETENTION_HOURS', 48))
+
+CREATE, RESET, SNAPSHOT, REVEAL, TURN, HINT, DELETE = range(1, 8)
+KIND_NAMES = {CREATE: 'create', RESET: 'reset', SNAPSHOT: 'snapshot', REVEAL: 'reveal',
+              TURN: 'turn', HINT: 'hint', DELETE: 'delete'}
+# События с полным состоянием партии – с них начинается восстановление
+FULL_STATE = (CREATE, RESET, SNAPSHOT)
+
+_PREFIX = struct.Struct('<II')   # length, crc32
+_HEAD = struct.Struct('<BdB')    # kind, ts, room_len
+_HINT = struct.Struct('<B')
+
+Position = Tuple[int, int]       # (номер сегмента, смещение)
+
+
+class Event(NamedTuple):
+    kind: int
+    ts: float
+    room_id: str
+    payload: bytes
+
+
+def encode_record(kind: int, room_id: str, payload: bytes = b'', ts: Optional[float] = None) -> bytes:
+    room = room_id.encode('utf-8')
+    body = _HEAD.pack(kind, time.time() if ts is None else ts, len(room)) + room + payload
+    return _PREFIX.pack(len(body), zlib.crc32(body)) + body
+
+
+def decode_body(body: bytes) -> Event:
+    kind, ts, room_len = _HEAD.unpack_from(body)
+    start = _HEAD.size
+    return Event(kind, ts, body[start:start + room_len].decode('utf-8'), body[start + room_len:])
+
+
+def hint_payload(word: str, number: int) -> bytes:
+    return _HINT.pack(number) + word.encode('utf-8')
+
+
+def parse_hint(payload: bytes) -> Tuple[str, int]:
+    return payload[_HINT.size:].decode('utf-8'), payload[0]
+
+
+class _RoomIndex:
+    """Позиции событий комнаты с последнего создания или сброса"""
+
+    __slots__ = ('positions', 'base', 'since_snapshot')
+
+    def __init__(self):
+        self.positions: List[Position] = []
+        self.base = 0            # индекс последнего полного состояния в positions
+        self.since_snapshot = 0
+
+
+class EventLog:
+    """Выключенный журнал: события никуда не пишутся"""
+
+    enabled = False
+
+    def append(self, room_id: str, kind: int, payload: bytes = b'') -> bool:
+        return False
+
+    async def open(self):
+        pass
+
+    def rooms(self) -> List[str]:
+        return []
+
+    def replay_events(self, room_id: str) -> List[Event]:
+        return []
+
+    async def game_events(self, room_id: str) -> List[Event]:
+        return []
+
+    async def restore_events(self, room_ids: List[str]) -> Dict[str, List[Event]]:
+        return {}
+
+    async def flush(self):
+        pass
+
+    async def run(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class SegmentEventLog(EventLog):
+    """Журнал в файлах-сегментах с пакетным fsync"""
+
+    enabled = True
+
+    def __init__(self, directory: str,
+                 flush_interval: float = EVENT_LOG_FLUSH_INTERVAL,
+                 segment_size: int = int(EVENT_LOG_SEGMENT_MB * 1024 * 1024),
+                 snapshot_every: int = EVENT_LOG_SNAPSHOT_EVERY,
+                 retention: float = EVENT_LOG_RETENTION_HOURS * 3600):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.segment_size = segment_size
+        self.snapshot_every = snapshot_every
+        self.retention = retention
+        self.index: Dict[str, _RoomIndex] = {}
+        # Ещё не записанные куски: (сегмент, смещение начала, байты)
+        self._pending: List[Tuple[int, int, bytearray]] = []
+        self._inflight: List[Tuple[int, int, bytearray]] = []
+        self._flushing: Optional[asyncio.Task] = None
+        # До open() номер нового сегмента неизвестен: события ждут здесь
+        self._early: Optional[List[Tuple[str, int, bytes, float]]] = []
+        self.segment = 0
+        self.size = 0
+
+    def _open(self) -> List[int]:
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self._segments()
+        for number in segments:
+            self._scan(number)
+        return segments
+
+    async def open(self):
+        """Читает сегменты в потоке и дописывает события, пришедшие за это время"""
+        started = time.perf_counter()
+        segments = await asyncio.to_thread(self._open)
+        self.segment = segments[-1] + 1 if segments else 1
+        early, self._early = self._early, None
+        for room_id, kind, payload, ts in early:
+            self._append(room_id, kind, payload, ts)
+        logger.info(f"📼 Журнал событий {self.directory}: {len(segments)} сегментов, {len(self.index)} комнат, "
+                    f"прочитан за {time.perf_counter() - started:.2f} с")
+
+    # ==================== ФАЙЛЫ ====================
+
+    def _path(self, number: int) -> str:
+        return os.path.join(self.directory, f'segment-{number:08d}.log')
+
+    def _segments(self) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith('segment-') and name.endswith('.log'):
+                numbers.append(int(name[8:-4]))
+        return sorted(numbers)
+
+    def _records(self, data: bytes) -> Iterator[Tuple[int, bytes]]:
+        """Целые записи сегмента; на оборванной или битой записи чтение останавливается"""
+        offset = 0
+        while offset + _PREFIX.size <= len(data):
+            length, crc = _PREFIX.unpack_from(data, offset)
+            body = data[offset + _PREFIX.size:offset + _PREFIX.size + length]
+            if len(body) < length or zlib.crc32(body) != crc:
+                return
+            yield offset, body
+            offset += _PREFIX.size + length
+
+    def _scan(self, number: int):
+        path = self._path(number)
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = 0
+        for offset, body in self._records(data):
+            event = decode_body(body)
+            self._index(event.room_id, event.kind, (number, offset))
+            end = offset + _PREFIX.size + len(body)
+        if end < len(data):
+            # Хвост от аварийной остановки посреди записи
+            logger.warning(f"⚠️ {path}: обрезаем {len(data) - end} байт недописанной записи")
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+
+    # ==================== ИНДЕКС ====================
+
+    def _index(self, room_id: str, kind: int, position: Position) -> bool:
+        """Учитывает событие; True – пора записать снимок состояния"""
+        if kind == DELETE:
+            self.index.pop(room_id, None)
+            return False
+        entry = self.index.get(room_id)
+        if entry is None:
+            if kind not in FULL_STATE:
+                return False  # начало комнаты ушло вместе со старым сегментом
+            entry = self.index[room_id] = _RoomIndex()
+        if kind in (CREATE, RESET):
+            entry.positions = [position]
+            entry.base = 0
+            entry.since_snapshot = 0
+            return False
+        entry.positions.append(position)
+        if kind == SNAPSHOT:
+            entry.base = len(entry.positions) - 1
+            entry.since_snapshot = 0
+            return False
+        entry.since_snapshot += 1
+        return entry.since_snapshot >= self.snapshot_every
+
+    def rooms(self) -> List[str]:
+        return list(self.index)
+
+    # ==================== ЗАПИСЬ ====================
+
+    def append(self, room_id: str, kind: int, payload: bytes = b'') -> bool:
+        """
+        Дописывает событие (на диск – при ближайшем flush)
+        True – после этого события стоит записать SNAPSHOT комнаты
+        """
+        if self._early is not None:
+            self._early.append((room_id, kind, payload, time.time()))
+            return False
+        return self._append(room_id, kind, payload)
+
+    def _append(self, room_id: str, kind: int, payload: bytes, ts: Optional[float] = None) -> bool:
+        record = encode_record(kind, room_id, payload, ts)
+        if self.size and self.size + len(record) > self.segment_size:
+            self.segment += 1
+            self.size = 0
+        if not self._pending or self._pending[-1][0] != self.segment:
+            self._pending.append((self.segment, self.size, bytearray()))
+        self._pending[-1][2].extend(record)
+        position = (self.segment, self.size)
+        self.size += len(record)
+        return self._index(room_id, kind, position)
+
+    def _write(self, chunks: List[Tuple[int, int, bytearray]]):
+        for number, start, data in chunks:
+            path = self._path(number)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                # Пишем ровно с позиции куска: повтор после ошибки не сдвинет записи
+                f.truncate(start)
+                f.seek(start)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    async def flush(self):
+        """Пишет накопленное одним заходом; параллельные вызовы ждут друг друга"""
+        while self._flushing is not None:
+            try:
+                await asyncio.shield(self._flushing)
+            except OSError:
+                pass  # ошибку пишет и данные возвращает в очередь тот, кто начал запись
+        if not self._pending:
+            return
+        self._inflight, self._pending = self._pending, []
+        self._flushing = asyncio.ensure_future(asyncio.to_thread(self._write, self._inflight))
+        try:
+            await asyncio.shield(self._flushing)
+        except OSError as e:
+            logger.error(f"❌ Ошибка записи журнала событий: {e}")
+            self._pending[:0] = self._inflight  # повторим при следующем flush
+        finally:
+            self._inflight = []
+            self._flushing = None
+
+    def _prune(self, now: float):
+        """Удаляет закрытые сегменты старше retention и события, которые в них были"""
+        removed = set()
+        for number in self._segments():
+            if number >= self.segment:
+                continue
+            path = self._path(number)
+            if now - os.path.getmtime(path) > self.retention:
+                os.remove(path)
+                removed.add(number)
+        if removed:
+            for room_id in [r for r, e in self.index.items() if e.positions[0][0] in removed]:
+                del self.index[room_id]
+            logger.info(f"🧹 Журнал событий: удалено сегментов {len(removed)}")
+
+    async def run(self):
+        last_prune = time.time()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.time() - last_prune > 600:
+                last_prune = time.time()
+                self._prune(last_prune)
+
+    async def close(self):
+        await self.flush()
+
+    # ==================== ЧТЕНИЕ ====================
+
+    def _read(self, positions: List[Position]) -> List[Event]:
+        return self._read_files(positions, [self._buffered(number, offset) for number, offset in positions])
+
+    def _read_files(self, positions: List[Position], buffered: List[Optional[bytes]]) -> List[Event]:
+        """События по позициям; buffered – уже найденные в памяти записи (None – читать с диска)"""
+        events = []
+        files = {}
+        try:
+            for (number, offset), data in zip(positions, buffered):
+                if data is None:
+                    f = files.get(number)
+                    if f is None:
+                        f = files[number] = open(self._path(number), 'rb')
+                    f.seek(offset)
+                    data = f.read(_PREFIX.size)
+                    data += f.read(_PREFIX.unpack(data)[0])
+                events.append(decode_body(data[_PREFIX.size:]))
+        finally:
+            for f in files.values():
+                f.close()
+        return events
+
+    def _buffered(self, number: int, offset: int) -> Optional[bytes]:
+        """Запись из ещё не записанных на диск кусков"""
+        for segment, start, chunk in self._inflight + self._pending:
+            if segment == number and start <= offset < start + len(chunk):
+                at = offset - start
+                length = _PREFIX.unpack_from(chunk, at)[0]
+                return bytes(chunk[at:at + _PREFIX.size + length])
+        return None
+
+    def replay_events(self, room_id: str) -> List[Event]:
+        """Последнее полное состояние комнаты и события после него"""
+        entry = self.index.get(room_id)
+        if entry is None:
+            return []
+        return self._read(entry.positions[entry.base:])
+
+    async def game_events(self, room_id: str) -> List[Event]:
+        """
+        Вся текущая партия комнаты без служебных снимков – для повтора игрокам.
+        Незаписанное берём из памяти здесь же, а файлы читаем в потоке,
+        как и пишем: цикл событий не ждёт диска
+        """
+        entry = self.index.get(room_id)
+        if entry is None:
+            return []
+        positions = list(entry.positions)
+        buffered = [self._buffered(number, offset) for number, offset in positions]
+        events = await asyncio.to_thread(self._read_files, positions, buffered)
+        return [e for e in events if e.kind != SNAPSHOT]
+
+    async def restore_events(self, room_ids: List[str]) -> Dict[str, List[Event]]:
+        """replay_events сразу для многих комнат: файлы читаются в потоке одним заходом"""
+        positions, buffered, counts = [], [], []
+        for room_id in room_ids:
+            entry = self.index.get(room_id)
+            chunk = entry.positions[entry.base:] if entry is not None else []
+            positions += chunk
+            buffered += [self._buffered(number, offset) for number, offset in chunk]
+            counts.append(len(chunk))
+        events = await asyncio.to_thread(self._read_files, positions, buffered)
+        result, at = {}, 0
+        for room_id, count in zip(room_ids, counts):
+            if count:
+                result[room_id] = events[at:at + count]
+            at += count
+        return result
+
+
+def create_event_log(directory: str = EVENT_LOG_DIR, **kwargs) -> EventLog:
+    """Журнал по настройке EVENT_LOG_DIR"""
+    if directory:
+        return SegmentEventLog(directory, **kwargs)
+    return EventLog()
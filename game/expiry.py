@@ -0,0 +1,97 @@
+"""
+Планировщик истечения комнат
+Дедлайны лежат в куче, поэтому работа пропорциональна числу истёкших комнат,
+а не всех комнат сразу. У комнаты два срока:
+  • абсолютный – через ttl после создания
+  • простой    – через idle_ttl после ухода последнего игрока
+"""
+
+import time
+import heapq
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """Куча (дедлайн, room_id) с ленивым удалением устаревших записей"""
+
+    def __init__(self, on_expire: Callable[[str], None], ttl: float, idle_ttl: Optional[float] = None):
+        self.on_expire = on_expire
+        self.ttl = ttl
+        self.idle_ttl = idle_ttl
+        self._heap: List[Tuple[float, str]] = []
+        self._absolute: Dict[str, float] = {}
+        self._idle: Dict[str, float] = {}
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._absolute)
+
+    def deadline(self, room_id: str) -> Optional[float]:
+        """Текущий дедлайн комнаты по time.monotonic()"""
+        if room_id not in self._absolute:
+            return None
+        return min(self._absolute[room_id], self._idle.get(room_id, float('inf')))
+
+    def _push(self, room_id: str):
+        deadline = self.deadline(room_id)
+        if not self._heap or deadline < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (deadline, room_id))
+        # Переподключения оставляют в куче устаревшие записи – иногда чистим
+        if len(self._heap) > 2 * len(self._absolute) + 64:
+            self._heap = [(self.deadline(rid), rid) for rid in self._absolute]
+            heapq.heapify(self._heap)
+
+    def track(self, room_id: str, ttl: Optional[float] = None):
+        """Начинает отслеживать комнату (простой считается с момента создания)"""
+        now = time.monotonic()
+        self._absolute[room_id] = now + (self.ttl if ttl is None else ttl)
+        if self.idle_ttl is not None:
+            self._idle[room_id] = now + self.idle_ttl
+        self._push(room_id)
+
+    def connected(self, room_id: str):
+        """В комнате появился игрок – срок простоя не действует"""
+        if self._idle.pop(room_id, None) is not None:
+            self._push(room_id)
+
+    def disconnected(self, room_id: str):
+        """Из комнаты ушёл последний игрок – запускаем срок простоя"""
+        if self.idle_ttl is None or room_id not in self._absolute:
+            return
+        self._idle[room_id] = time.monotonic() + self.idle_ttl
+        self._push(room_id)
+
+    def forget(self, room_id: str):
+        self._absolute.pop(room_id, None)
+        self._idle.pop(room_id, None)
+
+    def pop_expired(self, now: Optional[float] = None) -> List[str]:
+        """Снимает с кучи истёкшие комнаты"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, room_id = heapq.heappop(self._heap)
+            if self.deadline(room_id) == deadline:
+                self.forget(room_id)
+                expired.append(room_id)
+        return expired
+
+    async def run(self):
+        while True:
+            for room_id in self.pop_expired():
+                try:
+                    self.on_expire(room_id)
+                except Exception as e:
+                    logger.error(f"❌ Ошибка удаления комнаты {room_id}: {e}")
+
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
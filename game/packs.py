@@ -0,0 +1,223 @@
+"""
+Наборы слов (паки) по языку, теме и сложности
+
+Описания паков лежат в packs/manifest.json, сами слова – в JSON-файлах.
+Перед первым использованием пак компилируется в бинарный .pack:
+
+    b'CNPK' | версия u8 | 3 байта резерв | count u32 | offsets u32 * (count + 1) | UTF-8 слова
+
+Файл .pack открывается через mmap, поэтому при старте читается только манифест,
+а в памяти оказываются лишь страницы тех паков, из которых реально берут слова.
+
+    python -m game.packs build [--force]
+"""
+
+import os
+import json
+import mmap
+import time
+import random
+import struct
+import logging
+from typing import Dict, List, Optional, Sequence, Set
+
+from game.words import ROOT_DIR, RELOAD_CHECK_INTERVAL, word_bank
+
+logger = logging.getLogger(__name__)
+
+PACKS_DIR = os.environ.get('PACKS_DIR', os.path.join(ROOT_DIR, 'packs'))
+
+MAGIC = b'CNPK'
+VERSION = 1
+_HEADER = struct.Struct('<4sB3xI')
+_OFFSET = struct.Struct('<I')
+_SPAN = struct.Struct('<II')
+
+
+def compile_pack(words: Sequence[str], path: str) -> int:
+    """Записывает слова в бинарный формат, возвращает их количество"""
+    words = list(dict.fromkeys(w.strip() for w in words if w.strip()))
+    if len(words) < 25:
+        raise ValueError(f"в паке {path} меньше 25 разных слов")
+
+    blob = bytearray()
+    offsets = [0]
+    for word in words:
+        blob += word.encode('utf-8')
+        offsets.append(len(blob))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(words)))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        f.write(blob)
+    os.replace(tmp_path, path)
+    return len(words)
+
+
+class WordPack:
+    """Пак слов, который компилируется и открывается при первом обращении"""
+
+    def __init__(self, pack_id: str, language: str, theme: str, difficulty: str,
+                 title: str, source: str, directory: str = PACKS_DIR):
+        self.id = pack_id
+        self.language = language
+        self.theme = theme
+        self.difficulty = difficulty
+        self.title = title
+        self.source = os.path.normpath(os.path.join(directory, source))
+        self.path = os.path.join(directory, f'{pack_id}.pack')
+        self._mm: Optional[mmap.mmap] = None
+        self._count = 0
+        self._blob_start = 0
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._mm is not None
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return self._count
+
+    def build(self, force: bool = False) -> bool:
+        """Компилирует пак, если .pack нет или он старше исходника"""
+        if not force and os.path.exists(self.path) and \
+                os.stat(self.path).st_mtime >= os.stat(self.source).st_mtime:
+            return False
+        with open(self.source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        words = data['words'] if isinstance(data, dict) else data
+        count = compile_pack(words, self.path)
+        logger.info(f"📦 Пак {self.id} скомпилирован: {count} слов")
+        return True
+
+    def _open(self):
+        self.build()
+        with open(self.path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION:
+            mm.close()
+            raise ValueError(f"{self.path}: неизвестный формат пака")
+
+        if self._mm is not None:
+            self._mm.close()
+        self._mm = mm
+        self._count = count
+        self._blob_start = _HEADER.size + _OFFSET.size * (count + 1)
+        self._mtime = os.stat(self.source).st_mtime
+        self._checked_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._mm is None:
+            self._open()
+            return
+        now = time.monotonic()
+        if now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+        try:
+            if os.stat(self.source).st_mtime != self._mtime:
+                self._open()
+        except OSError:
+            pass
+
+    def word(self, index: int) -> str:
+        start, end = _SPAN.unpack_from(self._mm, _HEADER.size + _OFFSET.size * index)
+        base = self._blob_start
+        return self._mm[base + start:base + end].decode('utf-8')
+
+    def sample(self, k: int = 25) -> List[str]:
+        """k разных слов: читаем из файла только их смещения и байты"""
+        self._ensure_loaded()
+        return [self.word(i) for i in random.sample(range(self._count), k)]
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class PackRegistry:
+    """Каталог паков с индексами по языку, теме и сложности"""
+
+    def __init__(self, directory: str = PACKS_DIR):
+        self.directory = directory
+        self.packs: Dict[str, WordPack] = {}
+        self.by_language: Dict[str, Set[str]] = {}
+        self.by_theme: Dict[str, Set[str]] = {}
+        self.by_difficulty: Dict[str, Set[str]] = {}
+        self._load_manifest()
+
+    def _load_manifest(self):
+        path = os.path.join(self.directory, 'manifest.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"⚠️ Нет манифеста паков {path}")
+            return
+
+        for entry in manifest.get('packs', []):
+            pack = WordPack(
+                entry['id'], entry['language'], entry.get('theme', 'general'),
+                entry.get('difficulty', 'normal'), entry.get('title', entry['id']),
+                entry['source'], self.directory,
+            )
+            self.packs[pack.id] = pack
+            self.by_language.setdefault(pack.language, set()).add(pack.id)
+            self.by_theme.setdefault(pack.theme, set()).add(pack.id)
+            self.by_difficulty.setdefault(pack.difficulty, set()).add(pack.id)
+
+    def find(self, language: Optional[str] = None, theme: Optional[str] = None,
+             difficulty: Optional[str] = None) -> List[WordPack]:
+        ids = set(self.packs)
+        for index, value in ((self.by_language, language), (self.by_theme, theme),
+                             (self.by_difficulty, difficulty)):
+            if value is not None:
+                ids &= index.get(value, set())
+        return [self.packs[i] for i in sorted(ids)]
+
+    def resolve(self, args: Sequence[str]) -> Optional[WordPack]:
+        """
+        Подбирает пак по аргументам команды: /new en, /new ru animals hard
+        Первый аргумент может быть и id пака
+        """
+        tokens = [a.lower() for a in args]
+        if len(tokens) == 1 and tokens[0] in self.packs:
+            return self.packs[tokens[0]]
+
+        ids = set(self.packs)
+        for token in tokens:
+            matched = (self.by_language.get(token, set()) | self.by_theme.get(token, set())
+                       | self.by_difficulty.get(token, set()))
+            ids &= matched
+        if not ids:
+            return None
+        return self.packs[random.choice(sorted(ids))]
+
+    def build_all(self, force: bool = False) -> int:
+        return sum(pack.build(force) for pack in self.packs.values())
+
+
+pack_registry = PackRegistry()
+
+
+def get_word_source(args: Sequence[str] = ()):
+    """Источник слов для новой комнаты: пак по аргументам или общий словарь"""
+    if not args:
+        return word_bank
+    return pack_registry.resolve(args)
+
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    if sys.argv[1:2] == ['build']:
+        built = pack_registry.build_all(force='--force' in sys.argv)
+        print(f"Скомпилировано паков: {built} из {len(pack_registry.packs)}")
+    else:
+        for pack in pack_registry.packs.values():
+            print(f"{pack.id:16} {pack.language:4} {pack.theme:12} {pack.difficulty:8} {pack.title}")
@@ -3,68 +3,48 @@
 Версия 3.0 - Полная логика игры
 """
 
-import json
-import random
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Optional
 
-# Глобальное хранилище активных комнат
-active_rooms: Dict[str, 'GameRoom'] = {}
+from game.actor import RoomActor
+from game.state import GameState, Team, Status, RED, BLUE, BLACK, COLOR_NAMES
+from game.room_ids import RoomIdAllocator
+from game.store import MemoryRoomStore, RoomStore
+from game.words import word_bank
+from game.boards import board_pool
+
+# Глобальное хранилище активных комнат – общее для бота и WebSocket
+active_rooms: RoomStore = MemoryRoomStore()
+room_ids = RoomIdAllocator(is_taken=lambda code: code in active_rooms)
 
 
 class GameRoom:
     """Класс для управления игровой комнатой"""
 
-    def __init__(self, room_id: str):
+    def __init__(self, room_id: str, words=None):
         self.room_id = room_id
         self.created_at = datetime.now()
+        # Локальный импорт: пакет websocket сам импортирует game.room
+        from websocket.broadcaster import RoomBroadcaster
+
+        self.words = words if words is not None else word_bank  # словарь или пак
         self.game_state = self._create_game_state()
         self.players: Dict[int, Dict] = {}  # user_id -> player_data
-        self.ws_connections: List = []       # WebSocket соединения
+        self.broadcaster = RoomBroadcaster(room_id)  # WebSocket соединения
+        self.actor = RoomActor(room_id)              # действия игроков по очереди
         self.captains: Dict[str, Optional[int]] = {'red': None, 'blue': None}
+        self.version = 0                     # растёт при каждом изменении партии
+        self.on_change: Optional[Callable[['GameRoom'], None]] = None  # ставит хранилище
 
-    def _create_game_state(self) -> Dict:
+    def _create_game_state(self) -> GameState:
         """Создаёт начальное состояние игры"""
-        words = self._load_words()
-        
-        # Стандартная колода Codenames: 9 красных, 8 синих, 1 чёрный, 7 нейтральных
-        colors = (['red'] * 9) + (['blue'] * 8) + ['black'] + (['neutral'] * 7)
-        random.shuffle(colors)
-        
-        return {
-            'words': random.sample(words, 25),
-            'colors': colors,
-            'revealed': [False] * 25,
-            'current_team': 'red',      # Красные ходят первыми
-            'current_turn': 1,
-            'red_score': 9,
-            'blue_score': 8,
-            'game_status': 'waiting',    # waiting, active, finished
-            'winner': None,
-            'last_action': None,
-            'hint': None,               # Текущая подсказка капитана
-            'hint_number': None,        # Количество слов в подсказке
-            'guesses_left': 0           # Сколько ещё можно угадать
-        }
+        return GameState.new(board_pool.take(self.words))
 
-    def _load_words(self) -> List[str]:
-        """Загружает список слов из файла или использует резервный"""
-        try:
-            with open('words.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            # Резервный список русских слов
-            return [
-                "яблоко", "гора", "мост", "врач", "луна", "книга", "огонь", "река", "часы",
-                "снег", "глаз", "дом", "змея", "кольцо", "корабль", "лев", "лес", "машина",
-                "медведь", "нос", "океан", "перо", "пила", "поле", "пуля", "работа", "роза",
-                "рука", "сапог", "сок", "стол", "театр", "тень", "фонтан", "хлеб", "школа",
-                "шляпа", "ящик", "игла", "йогурт", "зонт", "ксерокс", "эхо", "юла", "якорь",
-                "аэропорт", "балерина", "вентилятор", "градусник", "дерево", "ёжик", "железо",
-                "замок", "игрушка", "капуста", "лампа", "метро", "ноутбук", "облако", "пальто",
-                "ракета", "самолет", "телефон", "улица", "фонарь", "хоккей", "цветок", "человек",
-                "шапка", "щука", "экран", "юбка", "язык", "аптека", "бензин", "велосипед", "газета"
-            ]
+    def _changed(self) -> None:
+        """Отмечает изменение партии для хранилища"""
+        self.version += 1
+        if self.on_change is not None:
+            self.on_change(self)
 
     # ==================== УПРАВЛЕНИЕ ИГРОКАМИ ====================
 
@@ -137,28 +117,13 @@ class GameRoom:
         Возвращает состояние игры для конкретного игрока
         Капитаны видят цвета, агенты - нет
         """
-        base_state = {
-            'room_id': self.room_id,
-            'words': self.game_state['words'],
-            'revealed': self.game_state['revealed'],
-            'current_team': self.game_state['current_team'],
-            'current_turn': self.game_state['current_turn'],
-            'red_score': self.game_state['red_score'],
-            'blue_score': self.game_state['blue_score'],
-            'game_status': self.game_state['game_status'],
-            'winner': self.game_state['winner'],
-            'players_count': len(self.players),
-            'user_role': self.players.get(user_id, {}).get('role', 'agent'),
-            'user_team': self.players.get(user_id, {}).get('team'),
-            'captains': {
-                'red': self.captains['red'] is not None,
-                'blue': self.captains['blue'] is not None
-            }
-        }
+        base_state = self.get_public_state()
+        base_state['user_role'] = self.players.get(user_id, {}).get('role', 'agent')
+        base_state['user_team'] = self.players.get(user_id, {}).get('team')
         
         # Капитанам добавляем цвета карточек
         if self.is_captain(user_id):
-            base_state['colors'] = self.game_state['colors']
+            base_state['colors'] = self.game_state.colors_wire()
         
         return base_state
 
@@ -167,22 +132,13 @@ class GameRoom:
         Возвращает публичное состояние игры (без user_id)
         Используется для рассылки всем игрокам
         """
-        return {
-            'room_id': self.room_id,
-            'words': self.game_state['words'],
-            'revealed': self.game_state['revealed'],
-            'current_team': self.game_state['current_team'],
-            'current_turn': self.game_state['current_turn'],
-            'red_score': self.game_state['red_score'],
-            'blue_score': self.game_state['blue_score'],
-            'game_status': self.game_state['game_status'],
-            'winner': self.game_state['winner'],
-            'players_count': len(self.players),
-            'captains': {
-                'red': self.captains['red'] is not None,
-                'blue': self.captains['blue'] is not None
-            }
+        state = self.game_state.to_wire(self.room_id)
+        state['players_count'] = len(self.players)
+        state['captains'] = {
+            'red': self.captains['red'] is not None,
+            'blue': self.captains['blue'] is not None
         }
+        return state
 
     # ==================== ИГРОВАЯ ЛОГИКА ====================
 
@@ -195,41 +151,41 @@ class GameRoom:
         if not (0 <= index < 25):
             return {'error': 'Invalid card index'}
         
+        game = self.game_state
+        
         # Проверка, что карта ещё не открыта
-        if self.game_state['revealed'][index]:
+        if game.is_revealed(index):
             return {'error': 'Card already revealed'}
         
         # Проверка, что игра активна
-        if self.game_state['game_status'] != 'active':
+        if game.status is not Status.ACTIVE:
             return {'error': 'Game is not active'}
         
         # Проверка, что игрок в правильной команде
         player_team = self.get_player_team(user_id)
-        if player_team != self.game_state['current_team']:
+        if player_team != game.current_team.value:
             return {'error': 'Not your team\'s turn'}
         
-        # Получаем цвет карты
-        color = self.game_state['colors'][index]
-        
-        # Открываем карту
-        self.game_state['revealed'][index] = True
-        self.game_state['last_action'] = {
+        # Открываем карту и получаем её цвет
+        color = game.reveal(index)
+        color_name = COLOR_NAMES[color]
+        game.last_action = {
             'type': 'card_revealed',
             'index': index,
-            'color': color,
+            'color': color_name,
             'user_id': user_id,
             'timestamp': datetime.now().isoformat()
         }
         
         # Обновляем счёт
-        if color == 'red':
-            self.game_state['red_score'] = max(0, self.game_state['red_score'] - 1)
-        elif color == 'blue':
-            self.game_state['blue_score'] = max(0, self.game_state['blue_score'] - 1)
+        if color == RED:
+            game.red_score = max(0, game.red_score - 1)
+        elif color == BLUE:
+            game.blue_score = max(0, game.blue_score - 1)
         
         # Уменьшаем количество оставшихся попыток, если есть подсказка
-        if self.game_state['guesses_left'] > 0:
-            self.game_state['guesses_left'] -= 1
+        if game.guesses_left > 0:
+            game.guesses_left -= 1
         
         # Проверяем условия победы
         winner_check = self._check_winner(color)
@@ -237,41 +193,43 @@ class GameRoom:
         winner = winner_check['winner']
         
         if game_over:
-            self.game_state['game_status'] = 'finished'
-            self.game_state['winner'] = winner
+            game.status = Status.FINISHED
+            game.winner = winner
+        self._changed()
         
         return {
             'index': index,
-            'color': color,
+            'color': color_name,
             'game_state': self.get_game_state_for_player(user_id),
             'game_over': game_over,
-            'winner': winner
+            'winner': winner.value if winner else None
         }
 
-    def _check_winner(self, last_color: str) -> Dict:
+    def _check_winner(self, last_color: int) -> Dict:
         """Проверяет условия завершения игры"""
         game = self.game_state
         
         # Если открыли чёрную карточку
-        if last_color == 'black':
-            winner = 'blue' if game['current_team'] == 'red' else 'red'
-            return {'game_over': True, 'winner': winner, 'reason': 'assassin'}
+        if last_color == BLACK:
+            return {'game_over': True, 'winner': game.current_team.other, 'reason': 'assassin'}
         
         # Если одна из команд открыла все свои карточки
-        if game['red_score'] == 0:
-            return {'game_over': True, 'winner': 'red', 'reason': 'all_found'}
-        if game['blue_score'] == 0:
-            return {'game_over': True, 'winner': 'blue', 'reason': 'all_found'}
+        if game.red_score == 0:
+            return {'game_over': True, 'winner': Team.RED, 'reason': 'all_found'}
+        if game.blue_score == 0:
+            return {'game_over': True, 'winner': Team.BLUE, 'reason': 'all_found'}
         
         return {'game_over': False, 'winner': None, 'reason': None}
 
     def switch_team(self) -> None:
         """Переключает текущую команду"""
-        self.game_state['current_team'] = 'blue' if self.game_state['current_team'] == 'red' else 'red'
-        self.game_state['current_turn'] += 1
-        self.game_state['guesses_left'] = 0  # Сбрасываем количество попыток
-        self.game_state['hint'] = None
-        self.game_state['hint_number'] = None
+        game = self.game_state
+        game.current_team = game.current_team.other
+        game.current_turn += 1
+        game.guesses_left = 0  # Сбрасываем количество попыток
+        game.hint = None
+        game.hint_number = None
+        self._changed()
 
     def set_hint(self, hint_word: str, hint_number: int) -> bool:
         """
@@ -281,9 +239,10 @@ class GameRoom:
         if hint_number < 0 or hint_number > 9:
             return False
         
-        self.game_state['hint'] = hint_word
-        self.game_state['hint_number'] = hint_number
-        self.game_state['guesses_left'] = hint_number + 1  # Можно угадать N+1 слов
+        self.game_state.hint = hint_word
+        self.game_state.hint_number = hint_number
+        self.game_state.guesses_left = hint_number + 1  # Можно угадать N+1 слов
+        self._changed()
         return True
 
     def end_turn(self) -> None:
@@ -299,7 +258,8 @@ class GameRoom:
     def start_game(self) -> bool:
         """Начинает игру (если есть оба капитана)"""
         if self.captains['red'] is not None and self.captains['blue'] is not None:
-            self.game_state['game_status'] = 'active'
+            self.game_state.status = Status.ACTIVE
+            self._changed()
             return True
         return False
 
@@ -311,6 +271,7 @@ class GameRoom:
             if captain_id and captain_id in self.players:
                 self.players[captain_id]['role'] = 'captain'
                 self.players[captain_id]['team'] = team
+        self._changed()
 
     def is_active(self) -> bool:
         """Проверяет, активна ли комната (не старше 24 часов)"""
@@ -318,11 +279,9 @@ class GameRoom:
 
     def cleanup(self) -> None:
         """Очищает ресурсы комнаты"""
-        import asyncio
-        for ws in self.ws_connections:
-            if hasattr(ws, 'closed') and not ws.closed:
-                asyncio.create_task(ws.close())
-        self.ws_connections.clear()
+        room_ids.release(self.room_id)
+        self.actor.close()
+        self.broadcaster.close_all()
         self.players.clear()
         self.captains = {'red': None, 'blue': None}
 
@@ -330,24 +289,24 @@ class GameRoom:
 
     def get_stats(self) -> Dict:
         """Возвращает статистику комнаты"""
-        revealed_count = sum(1 for r in self.game_state['revealed'] if r)
-        red_found = 9 - self.game_state['red_score']
-        blue_found = 8 - self.game_state['blue_score']
+        game = self.game_state
+        red_found = 9 - game.red_score
+        blue_found = 8 - game.blue_score
         
         return {
             'room_id': self.room_id,
             'created_at': self.created_at.isoformat(),
             'age_minutes': (datetime.now() - self.created_at).seconds // 60,
             'players': len(self.players),
-            'connections': len(self.ws_connections),
-            'game_status': self.game_state['game_status'],
-            'current_team': self.game_state['current_team'],
-            'current_turn': self.game_state['current_turn'],
-            'revealed_cards': revealed_count,
+            'connections': len(self.broadcaster),
+            'game_status': game.status.value,
+            'current_team': game.current_team.value,
+            'current_turn': game.current_turn,
+            'revealed_cards': game.revealed_count,
             'red_found': red_found,
             'blue_found': blue_found,
-            'red_left': self.game_state['red_score'],
-            'blue_left': self.game_state['blue_score'],
+            'red_left': game.red_score,
+            'blue_left': game.blue_score,
             'captains': {
                 'red': self.captains['red'] is not None,
                 'blue': self.captains['blue'] is not None
@@ -371,10 +330,10 @@ class GameRoom:
                 'red': self.captains['red'],
                 'blue': self.captains['blue']
             },
-            'game_status': self.game_state['game_status'],
-            'winner': self.game_state['winner'],
-            'red_score': self.game_state['red_score'],
-            'blue_score': self.game_state['blue_score'],
-            'current_team': self.game_state['current_team'],
-            'current_turn': self.game_state['current_turn']
+            'game_status': self.game_state.status.value,
+            'winner': self.game_state.winner.value if self.game_state.winner else None,
+            'red_score': self.game_state.red_score,
+            'blue_score': self.game_state.blue_score,
+            'current_team': self.game_state.current_team.value,
+            'current_turn': self.game_state.current_turn
         }
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Коды комнат
+Код – 6 символов из 32 без похожих друг на друга (нет 0/O и 1/I), всего 32^6 ≈ 10^9.
+Код – единственное, что закрывает ссылку капитана, поэтому каждый новый код
+тянется из secrets: по своим комнатам чужие не угадать. Занятый код тянется заново.
+Освобождённый код отлёживается в карантине, чтобы старая ссылка не
+привела в чужую партию, а потом снова может выпасть наравне с остальными.
+Заодно ведётся индекс «создатель -> комнаты» для лимита и /my
+"""
+
+import os
+import time
+import logging
+import secrets
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from utils.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+CODE_LENGTH = 6
+SPACE = len(ALPHABET) ** CODE_LENGTH  # 2^30
+
+# Сколько код лежит в карантине после удаления комнаты
+QUARANTINE_HOURS = float(os.environ.get('ROOM_ID_QUARANTINE_HOURS', 24))
+# Сколько комнат одновременно может держать один пользователь (0 – без лимита)
+MAX_ROOMS_PER_USER = int(os.environ.get('MAX_ROOMS_PER_USER', 5))
+
+ROOM_IDS_QUARANTINED = Gauge('codenames_room_ids_quarantined', 'Освобождённые коды, ждущие повторной выдачи')
+
+_quarantined = ROOM_IDS_QUARANTINED.labels()
+
+_INDEX = {ch: i for i, ch in enumerate(ALPHABET)}
+
+
+def encode(number: int) -> str:
+    chars = []
+    for _ in range(CODE_LENGTH):
+        number, digit = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def is_valid(code: str) -> bool:
+    return len(code) == CODE_LENGTH and all(ch in _INDEX for ch in code)
+
+
+class RoomLimitReached(Exception):
+    """У пользователя уже максимум комнат"""
+
+
+class RoomIdAllocator:
+    """Выдача кодов без коллизий и индекс комнат по создателям"""
+
+    def __init__(self, is_taken: Callable[[str], bool] = lambda code: False,
+                 accept: Callable[[str], bool] = lambda code: True,
+                 quarantine: float = QUARANTINE_HOURS * 3600,
+                 max_per_user: int = MAX_ROOMS_PER_USER):
+        # is_taken – код уже занят (например, комнатой из базы прошлого запуска),
+        # accept – код подходит этому процессу (свой шард)
+        self.is_taken = is_taken
+        self.accept = accept
+        self.quarantine = quarantine
+        self.max_per_user = max_per_user
+        self._released: Deque[Tuple[float, str]] = deque()  # (когда освобождён, код)
+        self._quarantine: Set[str] = set()
+        self.creators: Dict[str, int] = {}
+        self.by_user: Dict[int, 'OrderedDict[str, None]'] = {}
+
+    def _expire_quarantine(self, now: float):
+        while self._released and now - self._released[0][0] >= self.quarantine:
+            self._quarantine.discard(self._released.popleft()[1])
+            _quarantined.dec()
+
+    def allocate(self, creator: Optional[int] = None, elsewhere: int = 0, now: Optional[float] = None) -> str:
+        """
+        Новый код; RoomLimitReached, если у создателя уже максимум комнат
+        (elsewhere – сколько его комнат живёт в других воркерах)
+        """
+        if (creator is not None and self.max_per_user
+                and len(self.rooms_of(creator)) + elsewhere >= self.max_per_user):
+            raise RoomLimitReached(f"у пользователя {creator} уже {self.max_per_user} комнат")
+        now = time.monotonic() if now is None else now
+        self._expire_quarantine(now)
+        # Чужой шард отсеивается в среднем за WORKERS попыток
+        while True:
+            code = encode(secrets.randbelow(SPACE))
+            if (code not in self._quarantine and code not in self.creators
+                    and self.accept(code) and not self.is_taken(code)):
+                break
+        self.register(code, creator)
+        return code
+
+    def register(self, code: str, creator: Optional[int]):
+        """Учитывает уже существующую комнату (например, поднятую из базы)"""
+        if creator is None or code in self.creators:
+            return
+        self.creators[code] = creator
+        self.by_user.setdefault(creator, OrderedDict())[code] = None
+
+    def release(self, code: str, now: Optional[float] = None):
+        """Комната удалена: код уходит в карантин, создатель её больше не держит"""
+        creator = self.creators.pop(code, None)
+        if creator is not None:
+            rooms = self.by_user[creator]
+            rooms.pop(code, None)
+            if not rooms:
+                del self.by_user[creator]
+        if is_valid(code) and code not in self._quarantine:  # коды старого формата новыми не выпадут
+            self._quarantine.add(code)
+            self._released.append((time.monotonic() if now is None else now, code))
+            _quarantined.inc()
+
+    def rooms_of(self, user_id: int) -> List[str]:
+        """Комнаты пользователя в порядке создания"""
+        return list(self.by_user.get(user_id, ()))
+
+    def creator_of(self, code: str) -> Optional[int]:
+        return self.creators.get(code)
@@ -0,0 +1,183 @@
+"""
+Подсказки капитана по векторам слов
+Векторы лежат в SPYMASTER_DIR: <язык>.npy – матрица float32 (строки нормированы,
+порядок – от частых слов к редким) и <язык>.vocab.txt – слова по строке.
+Матрица открывается через mmap, поэтому память делят все процессы. Для поля
+считаем сходство всех кандидатов со всеми закрытыми словами одним умножением
+матриц, затем для каждого кандидата – сколько слов своей команды ближе,
+чем любое опасное слово (чужие, нейтральные с поправкой, убийца с запасом).
+Считаем в пуле потоков: numpy отпускает GIL, цикл событий не ждёт.
+Подготовить файлы: tools/spymaster_embeddings.py
+"""
+
+import os
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from game.state import RED, BLUE, BLACK, NEUTRAL
+from utils.metrics import Histogram
+
+np = None  # numpy импортируется, только если подсказчик включён
+
+
+def _import_numpy() -> bool:
+    global np
+    if np is None:
+        try:
+            import numpy as np
+        except ImportError:
+            return False
+    return True
+
+logger = logging.getLogger(__name__)
+
+# Пустой SPYMASTER_DIR – подсказчик выключен
+SPYMASTER_DIR = os.environ.get('SPYMASTER_DIR', '')
+SPYMASTER_THREADS = int(os.environ.get('SPYMASTER_THREADS', 1))
+# Кандидаты в подсказки – первые N слов словаря (0 – все)
+SPYMASTER_CANDIDATES = int(os.environ.get('SPYMASTER_CANDIDATES', 0))
+# Язык общего словаря (у паков язык свой)
+SPYMASTER_DEFAULT_LANGUAGE = os.environ.get('SPYMASTER_DEFAULT_LANGUAGE', 'ru')
+
+TOP_K = 5
+MAX_COUNT = 4            # больше слов одной подсказкой не загадываем
+MIN_SIMILARITY = 0.25    # слабее – уже не связь, а шум
+MARGIN = 0.05            # насколько своё слово должно быть ближе опасного
+NEUTRAL_DISCOUNT = 0.1   # нейтральное слово – меньшая беда, чем чужое
+ASSASSIN_PENALTY = 0.1   # убийцу обходим с запасом
+PREFIX_LENGTH = 5        # подсказка не может быть однокоренной со словом поля
+
+SPYMASTER_SECONDS = Histogram('codenames_spymaster_seconds', 'Подбор подсказки для поля (с ожиданием пула)')
+
+
+class Clue(NamedTuple):
+    word: str
+    count: int
+    targets: List[str]   # какие слова своей команды имеются в виду
+    score: float
+
+
+class Embeddings:
+    """Векторы одного языка и индексы для быстрого поиска"""
+
+    def __init__(self, matrix_path: str, vocab_path: str, candidates: int = SPYMASTER_CANDIDATES):
+        _import_numpy()
+        self.vectors = np.load(matrix_path, mmap_mode='r')
+        with open(vocab_path, encoding='utf-8') as f:
+            self.words = [line.rstrip('\n') for line in f]
+        if len(self.words) != self.vectors.shape[0]:
+            raise ValueError(f"{vocab_path}: {len(self.words)} слов, а векторов {self.vectors.shape[0]}")
+        self.ids = {word: i for i, word in enumerate(self.words)}
+        size = min(candidates, len(self.words)) if candidates else len(self.words)
+        self.candidates = self.vectors[:size]
+        self.by_prefix: Dict[str, List[int]] = {}
+        for i, word in enumerate(self.words[:size]):
+            self.by_prefix.setdefault(word[:PREFIX_LENGTH], []).append(i)
+
+    def suggest(self, words: Sequence[str], colors: bytes, revealed: int, team: int,
+                k: int = TOP_K) -> List[Clue]:
+        """Лучшие k подсказок для команды team (RED или BLUE) по закрытым словам поля"""
+        other = BLUE if team == RED else RED
+        groups = {team: [], other: [], NEUTRAL: [], BLACK: []}
+        targets = []
+        excluded = set()
+        for i, word in enumerate(words):
+            word = word.lower()
+            excluded.update(self.by_prefix.get(word[:PREFIX_LENGTH], ()))
+            row = self.ids.get(word)
+            if row is None or revealed >> i & 1:
+                continue
+            groups[colors[i]].append(row)
+            if colors[i] == team:
+                targets.append(word)
+        own = len(groups[team])
+        if not own:
+            return []
+
+        rows = groups[team] + groups[other] + groups[NEUTRAL] + groups[BLACK]
+        board = np.asarray(self.vectors[rows], dtype=np.float32)
+        sims = board @ self.candidates.T     # (закрытые слова, кандидаты)
+
+        danger = np.full(sims.shape[1], -1.0, dtype=np.float32)
+        start = own
+        for color, shift in ((other, 0.0), (NEUTRAL, -NEUTRAL_DISCOUNT), (BLACK, ASSASSIN_PENALTY)):
+            size = len(groups[color])
+            if size:
+                np.maximum(danger, sims[start:start + size].max(axis=0) + shift, out=danger)
+            start += size
+
+        own_sims = sims[:own]
+        above = own_sims > np.maximum(danger + MARGIN, MIN_SIMILARITY)
+        count = above.sum(axis=0)
+        weakest = np.where(above, own_sims, np.inf).min(axis=0)
+        # Больше слов – лучше, при равенстве – увереннее отрыв от опасных
+        score = np.where(count > 0, np.minimum(count, MAX_COUNT) + (weakest - danger), -np.inf)
+        if excluded:
+            score[list(excluded)] = -np.inf
+
+        k = min(k, score.shape[0])
+        best = np.argpartition(-score, k - 1)[:k]
+        clues = []
+        for column in best[np.argsort(-score[best])]:
+            if not np.isfinite(score[column]):
+                break
+            n = int(min(count[column], MAX_COUNT))
+            order = np.argsort(-own_sims[:, column])[:n]
+            clues.append(Clue(self.words[column], n, [targets[j] for j in order], float(score[column])))
+        return clues
+
+
+class Spymaster:
+    """Подсказчик: векторы по языкам, загрузка по первому запросу, пул потоков"""
+
+    def __init__(self, directory: str, threads: int = SPYMASTER_THREADS):
+        self.directory = directory
+        self.models: Dict[str, Optional[Embeddings]] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix='spymaster')
+
+    def model(self, language: str) -> Optional[Embeddings]:
+        with self._lock:
+            if language not in self.models:
+                matrix = os.path.join(self.directory, f'{language}.npy')
+                vocab = os.path.join(self.directory, f'{language}.vocab.txt')
+                model = None
+                if os.path.exists(matrix) and os.path.exists(vocab):
+                    try:
+                        model = Embeddings(matrix, vocab)
+                        logger.info(f"🧠 Векторы {language}: {model.vectors.shape[0]} слов, "
+                                    f"размерность {model.vectors.shape[1]}")
+                    except (OSError, ValueError) as e:
+                        logger.error(f"❌ Не удалось загрузить векторы {language}: {e}")
+                else:
+                    logger.warning(f"⚠️ Нет векторов для языка {language} в {self.directory}")
+                self.models[language] = model
+            return self.models[language]
+
+    def _suggest(self, language: str, *args) -> List[Clue]:
+        model = self.model(language)
+        return model.suggest(*args) if model is not None else []
+
+    async def suggest(self, language: str, words: Sequence[str], colors: bytes, revealed: int,
+                      team: int, k: int = TOP_K) -> List[Clue]:
+        """Подсказки в пуле потоков; аргументы – неизменяемый снимок поля"""
+        loop = asyncio.get_running_loop()
+        with SPYMASTER_SECONDS.time():
+            return await loop.run_in_executor(self._pool, self._suggest, language,
+                                              tuple(words), bytes(colors), revealed, team, k)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_spymaster(directory: str = SPYMASTER_DIR) -> Optional[Spymaster]:
+    """Подсказчик по настройке SPYMASTER_DIR; None – выключен или нет numpy"""
+    if not directory:
+        return None
+    if not _import_numpy():
+        logger.warning("⚠️ SPYMASTER_DIR задан, но numpy не установлен – подсказок не будет")
+        return None
+    return Spymaster(directory)
@@ -0,0 +1,162 @@
+"""
+Компактное состояние партии Codenames
+Цвета хранятся кодами в bytes, открытые карточки – битовой маской,
+команда и статус – перечислениями
+"""
+
+import random
+from enum import Enum
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BOARD_SIZE = 25
+
+# Коды цветов карточек
+RED, BLUE, BLACK, NEUTRAL = range(4)
+COLOR_NAMES = ('red', 'blue', 'black', 'neutral')
+COLOR_CODES = {name: code for code, name in enumerate(COLOR_NAMES)}
+
+# Стандартная колода: 9 красных, 8 синих, 1 чёрный, 7 нейтральных
+DECK = bytes([RED] * 9 + [BLUE] * 8 + [BLACK] + [NEUTRAL] * 7)
+
+# Байт маски -> 8 флагов, чтобы не проверять 25 бит по одному
+_BYTE_FLAGS = [tuple(bool(b >> i & 1) for i in range(8)) for b in range(256)]
+
+
+class Team(Enum):
+    RED = 'red'
+    BLUE = 'blue'
+
+    @property
+    def other(self) -> 'Team':
+        return Team.BLUE if self is Team.RED else Team.RED
+
+    @property
+    def color(self) -> int:
+        return RED if self is Team.RED else BLUE
+
+
+class Status(Enum):
+    WAITING = 'waiting'
+    ACTIVE = 'active'
+    FINISHED = 'finished'
+
+
+class GameState:
+    """Состояние одной партии"""
+
+    __slots__ = (
+        'words', 'colors', 'revealed', 'current_team', 'current_turn',
+        'red_score', 'blue_score', 'status', 'winner',
+        'last_action', 'hint', 'hint_number', 'guesses_left',
+        '_revealed_wire', '_revealed_wire_mask',
+    )
+
+    def __init__(self, words: Sequence[str], colors: bytes):
+        self.words = tuple(words)
+        self.colors = colors
+        self.revealed = 0                   # бит i – открыта карточка i
+        self.current_team = Team.RED        # Красные ходят первыми
+        self.current_turn = 1
+        self.red_score = 9
+        self.blue_score = 8
+        self.status = Status.WAITING
+        self.winner: Optional[Team] = None
+        self.last_action: Optional[Dict] = None
+        self.hint: Optional[str] = None     # Текущая подсказка капитана
+        self.hint_number: Optional[int] = None
+        self.guesses_left = 0
+        # Флаги открытых карточек для клиента; пересобираются, только когда меняется маска
+        self._revealed_wire: Tuple[bool, ...] = ()
+        self._revealed_wire_mask = -1
+
+    @classmethod
+    def new(cls, words: Sequence[str]) -> 'GameState':
+        """Новая партия со случайной раскладкой цветов"""
+        colors = bytearray(DECK)
+        random.shuffle(colors)
+        return cls(words, bytes(colors))
+
+    # ==================== КАРТОЧКИ ====================
+
+    def is_revealed(self, index: int) -> bool:
+        return bool(self.revealed >> index & 1)
+
+    def reveal(self, index: int) -> int:
+        """Открывает карточку и возвращает код её цвета"""
+        self.revealed |= 1 << index
+        return self.colors[index]
+
+    def color_name(self, index: int) -> str:
+        return COLOR_NAMES[self.colors[index]]
+
+    @property
+    def revealed_count(self) -> int:
+        return bin(self.revealed).count('1')
+
+    # ==================== СОХРАНЕНИЕ ====================
+
+    def to_record(self) -> Dict:
+        """Полное состояние для хранилища"""
+        return {
+            'words': list(self.words),
+            'colors': self.colors.hex(),
+            'revealed': self.revealed,
+            'current_team': self.current_team.value,
+            'current_turn': self.current_turn,
+            'red_score': self.red_score,
+            'blue_score': self.blue_score,
+            'status': self.status.value,
+            'winner': self.winner.value if self.winner else None,
+            'last_action': self.last_action,
+            'hint': self.hint,
+            'hint_number': self.hint_number,
+            'guesses_left': self.guesses_left,
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'GameState':
+        state = cls(record['words'], bytes.fromhex(record['colors']))
+        state.revealed = record['revealed']
+        state.current_team = Team(record['current_team'])
+        state.current_turn = record['current_turn']
+        state.red_score = record['red_score']
+        state.blue_score = record['blue_score']
+        state.status = Status(record['status'])
+        state.winner = Team(record['winner']) if record['winner'] else None
+        state.last_action = record['last_action']
+        state.hint = record['hint']
+        state.hint_number = record['hint_number']
+        state.guesses_left = record['guesses_left']
+        return state
+
+    # ==================== ПРЕДСТАВЛЕНИЕ ДЛЯ КЛИЕНТА ====================
+
+    def revealed_wire(self) -> Tuple[bool, ...]:
+        mask = self.revealed
+        if mask != self._revealed_wire_mask:
+            self._revealed_wire = (*_BYTE_FLAGS[mask & 255], *_BYTE_FLAGS[mask >> 8 & 255],
+                                   *_BYTE_FLAGS[mask >> 16 & 255], bool(mask >> 24 & 1))
+            self._revealed_wire_mask = mask
+        return self._revealed_wire
+
+    def colors_wire(self) -> List[str]:
+        return [COLOR_NAMES[c] for c in self.colors]
+
+    def to_wire(self, room_id: str) -> Dict:
+        """Общая часть состояния в прежнем JSON-формате"""
+        # _value_ – обычный атрибут, .value у Enum заметно медленнее.
+        # Слова и флаги – неизменяемые кортежи (JSON видит в них массивы):
+        # их можно отдавать без копии, живое состояние через них не поменять.
+        # room_id – сразу в литерал: лишний ключ потом заставил бы словарь расти
+        revealed = self._revealed_wire if self.revealed == self._revealed_wire_mask else self.revealed_wire()
+        return {
+            'room_id': room_id,
+            'words': self.words,
+            'revealed': revealed,
+            'current_team': self.current_team._value_,
+            'current_turn': self.current_turn,
+            'red_score': self.red_score,
+            'blue_score': self.blue_score,
+            'game_status': self.status._value_,
+            'winner': self.winner._value_ if self.winner else None,
+        }
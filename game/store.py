@@ -0,0 +1,246 @@
+"""
+Хранилища комнат
+RoomStore ведёт себя как словарь room_id -> GameRoom. SQLiteRoomStore
+дополнительно сохраняет комнаты на диск: изменения копятся в памяти
+и пишутся пачкой раз в flush_interval, а после перезапуска комната
+поднимается из базы только при первом обращении. Сама база открывается
+в open() – в потоке, когда сервер уже слушает порт
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+from functools import partial
+from typing import Callable, Dict, Iterator, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+ROOM_STORE = os.environ.get('ROOM_STORE', 'memory')  # memory | sqlite
+ROOM_DB_PATH = os.environ.get('ROOM_DB_PATH', 'rooms.sqlite3')
+ROOM_FLUSH_INTERVAL = float(os.environ.get('ROOM_FLUSH_INTERVAL', 1.0))
+
+_MISSING = object()
+
+
+class RoomStore:
+    """Общая часть хранилищ: комнаты, загруженные в память процесса"""
+
+    def __init__(self):
+        self.rooms: Dict[str, object] = {}
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self.rooms
+
+    def __getitem__(self, room_id: str):
+        room = self.get(room_id)
+        if room is None:
+            raise KeyError(room_id)
+        return room
+
+    def __setitem__(self, room_id: str, room):
+        self.rooms[room_id] = room
+        room.on_change = self.mark_dirty
+
+    def __delitem__(self, room_id: str):
+        if self.pop(room_id, _MISSING) is _MISSING:
+            raise KeyError(room_id)
+
+    def __len__(self) -> int:
+        return len(self.rooms)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self.rooms))
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def get(self, room_id: str, default=None):
+        return self.rooms.get(room_id, default)
+
+    def pop(self, room_id: str, default=None):
+        return self.rooms.pop(room_id, default)
+
+    def items(self):
+        """Комнаты, загруженные в память"""
+        return self.rooms.items()
+
+    def values(self):
+        return self.rooms.values()
+
+    def mark_dirty(self, room):
+        """Комната изменилась (в памяти сохранять нечего)"""
+
+    async def open(self):
+        """Подготовка хранилища (в памяти готовить нечего)"""
+
+    async def run(self):
+        """Фоновая задача хранилища"""
+
+    async def close(self):
+        """Сохраняет несохранённое перед остановкой"""
+
+
+class MemoryRoomStore(RoomStore):
+    """Комнаты только в памяти – пропадают при перезапуске"""
+
+
+class SQLiteRoomStore(RoomStore):
+    """Комнаты в SQLite с отложенной пакетной записью"""
+
+    def __init__(self, path: str, room_factory: Callable[[Dict], object],
+                 flush_interval: float = ROOM_FLUSH_INTERVAL,
+                 max_age: Optional[float] = None,
+                 on_load: Optional[Callable[[object], None]] = None):
+        super().__init__()
+        self.path = path
+        self.room_factory = room_factory
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        self.on_load = on_load
+        self._dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+        # Для проверки существования и подсчёта держим только ключи
+        self._known: Set[str] = set()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._reader: Optional[sqlite3.Connection] = None
+        # Запись в потоке: одна за раз, переживает отмену того, кто её начал
+        self._writing: Optional[asyncio.Future] = None
+
+    def _open(self) -> Set[str]:
+        # WAL: чтение при ленивой загрузке не ждёт запись в фоне
+        writer = sqlite3.connect(self.path, check_same_thread=False)
+        writer.execute('PRAGMA journal_mode=WAL')
+        writer.execute('PRAGMA synchronous=NORMAL')
+        writer.execute(
+            'CREATE TABLE IF NOT EXISTS rooms ('
+            'room_id TEXT PRIMARY KEY, created_at REAL NOT NULL, data TEXT NOT NULL)'
+        )
+        if self.max_age is not None:
+            writer.execute('DELETE FROM rooms WHERE created_at < ?', (time.time() - self.max_age,))
+        writer.commit()
+        self._writer = writer
+        self._reader = sqlite3.connect(self.path, check_same_thread=False)
+        return {row[0] for row in self._reader.execute('SELECT room_id FROM rooms')}
+
+    async def open(self):
+        """Открывает базу в потоке; комнаты, созданные до этого, сохранятся при ближайшем flush"""
+        known = await asyncio.to_thread(self._open)
+        self._known |= known - self._deleted
+        logger.info(f"💾 SQLite {self.path}: {len(known)} комнат на диске")
+
+    def __contains__(self, room_id: str) -> bool:
+        return room_id in self.rooms or room_id in self._known
+
+    def __setitem__(self, room_id: str, room):
+        super().__setitem__(room_id, room)
+        self._known.add(room_id)
+        self._deleted.discard(room_id)
+        self._dirty.add(room_id)
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._known))
+
+    def get(self, room_id: str, default=None):
+        room = self.rooms.get(room_id)
+        if room is None and room_id in self._known and self._reader is not None:
+            room = self._load(room_id)
+        return default if room is None else room
+
+    def pop(self, room_id: str, default=None):
+        room = self.get(room_id)
+        if room_id not in self._known:
+            return default
+        self._known.discard(room_id)
+        self.rooms.pop(room_id, None)
+        self._dirty.discard(room_id)
+        self._deleted.add(room_id)
+        return room
+
+    def _load(self, room_id: str):
+        row = self._reader.execute(
+            'SELECT created_at, data FROM rooms WHERE room_id = ?', (room_id,)
+        ).fetchone()
+        if row is None or (self.max_age is not None and time.time() - row[0] > self.max_age):
+            self._known.discard(room_id)
+            return None
+
+        room = self.room_factory(json.loads(row[1]))
+        self.rooms[room_id] = room
+        room.on_change = self.mark_dirty
+        logger.info(f"💾 Комната {room_id} восстановлена из базы")
+        if self.on_load is not None:
+            self.on_load(room)
+        return room
+
+    def mark_dirty(self, room):
+        self._dirty.add(room.room_id)
+
+    def _write(self, records, deleted):
+        with self._writer:
+            if records:
+                self._writer.executemany(
+                    'INSERT OR REPLACE INTO rooms (room_id, created_at, data) VALUES (?, ?, ?)',
+                    records
+                )
+            if deleted:
+                self._writer.executemany('DELETE FROM rooms WHERE room_id = ?', [(r,) for r in deleted])
+
+    def _written(self, dirty: Set[str], deleted: Set[str], future: asyncio.Future):
+        self._writing = None
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            logger.error(f"❌ Ошибка записи комнат в SQLite: {error}")
+            self._dirty |= dirty
+            self._deleted |= deleted
+
+    async def flush(self):
+        """Пишет все накопленные изменения одной транзакцией; параллельные вызовы ждут друг друга"""
+        while self._writing is not None:
+            await asyncio.wait([self._writing])
+        if self._writer is None or (not self._dirty and not self._deleted):
+            return
+        dirty, self._dirty = self._dirty, set()
+        deleted, self._deleted = self._deleted, set()
+        # Снимок делаем в потоке цикла событий, пока состояние не меняется
+        records = []
+        for room_id in dirty:
+            room = self.rooms.get(room_id)
+            if room is not None:
+                record = room.to_record()
+                records.append((room_id, record['created_at'], json.dumps(record, ensure_ascii=False)))
+        writing = self._writing = asyncio.ensure_future(asyncio.to_thread(self._write, records, deleted))
+        writing.add_done_callback(partial(self._written, dirty, deleted))
+        await asyncio.wait([writing])
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self):
+        # flush дождётся записи, которую начал run(), и допишет остальное
+        await self.flush()
+        if self._writer is not None:
+            writer, reader, self._writer, self._reader = self._writer, self._reader, None, None
+            writer.close()
+            reader.close()
+
+
+def worker_db_path(path: str, worker_id: int) -> str:
+    """База воркера рядом с общей: rooms.sqlite3 -> rooms.worker-1.sqlite3"""
+    root, ext = os.path.splitext(path)
+    return f'{root}.worker-{worker_id}{ext}'
+
+
+def create_room_store(room_factory: Callable[[Dict], object], backend: str = ROOM_STORE,
+                      **kwargs) -> RoomStore:
+    """Хранилище по настройке ROOM_STORE"""
+    if backend == 'sqlite':
+        return SQLiteRoomStore(kwargs.pop('path', ROOM_DB_PATH), room_factory, **kwargs)
+    return MemoryRoomStore()
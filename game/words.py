@@ -0,0 +1,91 @@
+"""
+Словарь для раскладок
+Загружается один раз на процесс и перечитывается, только если файл изменился
+"""
+
+import os
+import json
+import time
+import random
+import logging
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS_PATH = os.environ.get('WORDS_PATH', os.path.join(ROOT_DIR, 'words.json'))
+# Как часто (в секундах) проверять mtime файла
+RELOAD_CHECK_INTERVAL = float(os.environ.get('WORDS_RELOAD_INTERVAL', 5))
+
+# Резервный список русских слов
+FALLBACK_WORDS = (
+    "яблоко", "гора", "мост", "врач", "луна", "книга", "огонь", "река", "часы",
+    "снег", "глаз", "дом", "змея", "кольцо", "корабль", "лев", "лес", "машина",
+    "медведь", "нос", "океан", "перо", "пила", "поле", "пуля", "работа", "роза",
+    "рука", "сапог", "сок", "стол", "театр", "тень", "фонтан", "хлеб", "школа",
+    "шляпа", "ящик", "игла", "йогурт", "зонт", "ксерокс", "эхо", "юла", "якорь",
+    "аэропорт", "балерина", "вентилятор", "градусник", "дерево", "ёжик", "железо",
+    "замок", "игрушка", "капуста", "лампа", "метро", "ноутбук", "облако", "пальто",
+    "ракета", "самолет", "телефон", "улица", "фонарь", "хоккей", "цветок", "человек",
+    "шапка", "щука", "экран", "юбка", "язык", "аптека", "бензин", "велосипед", "газета"
+)
+
+
+class WordBank:
+    """Неизменяемый кортеж слов с горячей перезагрузкой по mtime"""
+
+    def __init__(self, path: str, fallback: Sequence[str] = FALLBACK_WORDS,
+                 check_interval: float = RELOAD_CHECK_INTERVAL):
+        self.path = path
+        self.fallback = tuple(fallback)
+        self.check_interval = check_interval
+        self.words: Tuple[str, ...] = ()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        # Вызывается после каждой удачной перезагрузки (BoardPool сбрасывает запас раскладок)
+        self.on_reload: Optional[Callable[['WordBank'], None]] = None
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def reload(self) -> bool:
+        """Перечитывает файл; при ошибке оставляет прежний словарь"""
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with open(self.path, 'r', encoding='utf-8') as f:
+                words = tuple(dict.fromkeys(json.load(f)))  # без повторов
+        except (OSError, ValueError) as e:
+            if not self.words:
+                logger.warning(f"⚠️ Словарь {self.path} не загружен ({e}), используем резервный")
+                self.words = self.fallback
+            return False
+
+        self.words = words
+        self._mtime = mtime
+        logger.info(f"📚 Словарь {self.path}: {len(words)} слов")
+        if self.on_reload is not None:
+            self.on_reload(self)
+        return True
+
+    def maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def sample(self, k: int = 25) -> List[str]:
+        """k разных слов за O(k): выбираем индексы, а не копируем словарь"""
+        self.maybe_reload()
+        words = self.words
+        return [words[i] for i in random.sample(range(len(words)), k)]
+
+
+word_bank = WordBank(WORDS_PATH)
@@ -5,6 +5,7 @@ const CONFIG = {
     VERSION: '3.1.0',
     MAX_RECONNECT_ATTEMPTS: 5,
     PING_INTERVAL: 30000,
+    BINARY_PROTOCOL: true,
     ROOM_LIFETIME: 24 * 60 * 60 * 1000
 };
 
@@ -24,7 +25,8 @@ const TEAM_NAMES = {
 
 const ROLES = {
     CAPTAIN: 'captain',
-    AGENT: 'agent'
+    AGENT: 'agent',
+    SPECTATOR: 'spectator'
 };
 
 const GAME_STATUS = {
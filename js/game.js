@@ -59,7 +59,9 @@ var GameManager = {
         // Если агент и карточка не открыта
         else {
             card.classList.add('neutral-closed');
-            this._setupHoldEvents(card, index);
+            if (gameState.role !== ROLES.SPECTATOR) {
+                this._setupHoldEvents(card, index);
+            }
         }
 
         return card;
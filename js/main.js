@@ -77,7 +77,7 @@ function setupWebSocketHandlers() {
         
         // Обновляем заголовок с ролью
         if (UI.elements.roomDisplay) {
-            var roleText = (data.game_state.role === 'captain') ? '👑 Капитан' : '🔎 Агент';
+            var roleText = { captain: '👑 Капитан', spectator: '👀 Зритель' }[data.game_state.role] || '🔎 Агент';
             UI.elements.roomDisplay.textContent = roomId + ' - ' + roleText;
         }
     });
@@ -107,6 +107,10 @@ function setupWebSocketHandlers() {
     });
     // Сброс игры
     wsManager.on('game_reset', function(data) {
+        // Зритель остаётся зрителем, даже если сервер прислал вид агента
+        if (role === ROLES.SPECTATOR) {
+            data.game_state.role = ROLES.SPECTATOR;
+        }
         gameManager.renderBoard(data.game_state);
         gameManager.updateGameInfo(data.game_state);
         gameManager.currentMove = 1;
@@ -9,6 +9,8 @@ var WebSocketManager = {
     isConnected: false,
     messageHandlers: {},
     pingInterval: null,
+    lastSeq: null,
+    epoch: null,
 
     /**
      * Подключение к WebSocket
@@ -19,13 +21,26 @@ var WebSocketManager = {
             return false;
         }
 
+        // Другая комната – дочитывать нечего
+        if (roomId !== this.roomId || role !== this.role) {
+            this.lastSeq = null;
+            this.epoch = null;
+        }
+
         this.roomId = roomId;
         this.role = role;
 
         var wsUrl = 'wss://' + CONFIG.RENDER_URL + '/ws?room=' + roomId + '&role=' + role;
+        if (CONFIG.BINARY_PROTOCOL) {
+            wsUrl += '&proto=bin';
+        }
+        if (this.lastSeq !== null && this.epoch) {
+            wsUrl += '&since=' + this.lastSeq + '&epoch=' + this.epoch;
+        }
         console.log('🔌 Подключение к WebSocket:', wsUrl);
         
         this.socket = new WebSocket(wsUrl);
+        this.socket.binaryType = 'arraybuffer';
         this._setupEventListeners();
         
         return true;
@@ -70,15 +85,75 @@ var WebSocketManager = {
      */
     _handleMessage: function(event) {
         try {
-            var data = JSON.parse(event.data);
+            var data = typeof event.data === 'string' ? JSON.parse(event.data) : this._decodeBinary(event.data);
             console.log('📨 Получено:', data.type);
-            this._emit(data.type, data);
-            this._emit('message', data);
+            // Зрители получают рассылки пачками раз в тик
+            var messages = data.type === 'batch' ? data.messages : [data];
+            for (var i = 0; i < messages.length; i++) {
+                if (!this._trackSeq(messages[i])) {
+                    continue;
+                }
+                this._emit(messages[i].type, messages[i]);
+                this._emit('message', messages[i]);
+            }
         } catch (e) {
-            console.error('❌ Ошибка парсинга JSON:', e);
+            console.error('❌ Ошибка разбора сообщения:', e);
         }
     },
 
+    /**
+     * Разбор бинарного кадра (раскладки – в websocket/frames.py)
+     */
+    _decodeBinary: function(buffer) {
+        var view = new DataView(buffer);
+        var colors = ['red', 'blue', 'black', 'neutral'];
+        var teams = ['red', 'blue'];
+        switch (view.getUint8(0)) {
+            case 1:
+                return {
+                    type: 'card_revealed',
+                    seq: view.getUint32(1, true),
+                    index: view.getUint8(5),
+                    color: colors[view.getUint8(6)],
+                    red_score: view.getUint8(7),
+                    blue_score: view.getUint8(8)
+                };
+            case 2:
+                return { type: 'turn_switch', seq: view.getUint32(1, true), current_team: teams[view.getUint8(5)] };
+            case 3:
+                var winner = view.getUint8(5);
+                return { type: 'game_over', seq: view.getUint32(1, true), winner: winner === 255 ? null : teams[winner] };
+            case 4:
+                return { type: 'pong' };
+        }
+        throw new Error('неизвестный бинарный кадр ' + view.getUint8(0));
+    },
+
+    /**
+     * Учёт номеров рассылок: false – сообщение обрабатывать не нужно
+     */
+    _trackSeq: function(data) {
+        if (data.type === 'init') {
+            this.lastSeq = data.seq;
+            this.epoch = data.epoch;
+            return true;
+        }
+        if (typeof data.seq !== 'number' || this.lastSeq === null) {
+            return true;
+        }
+        if (data.seq <= this.lastSeq) {
+            return false;
+        }
+        if (data.seq > this.lastSeq + 1) {
+            // Пропустили рассылку – переподключаемся и дочитываем с lastSeq
+            console.warn('⚠️ Пропущены сообщения ' + (this.lastSeq + 1) + '–' + (data.seq - 1));
+            this.socket.close();
+            return false;
+        }
+        this.lastSeq = data.seq;
+        return true;
+    },
+
     /**
      * Обработчик ошибок
      */
@@ -1,18 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+from __future__ import annotations
+
 import os
-import json
-import uuid
-import random
+import time
 import asyncio
 import logging
+from functools import partial
+from itertools import islice
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 
 from aiohttp import web
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
+
+from utils import cluster
 
 # ==================== НАСТРОЙКА ====================
 logging.basicConfig(
@@ -25,46 +27,106 @@ logger = logging.getLogger(__name__)
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 RENDER_URL = os.environ.get('RENDER_URL', 'https://codenames-u88n.onrender.com')
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'https://raphov.github.io')
+# Другой адрес Bot API, например локальный tools/fake_bot_api.py
+TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL')
+ROOM_TTL_HOURS = float(os.environ.get('ROOM_TTL_HOURS', 24))
+# Через сколько минут удалять комнату, из которой все ушли
+ROOM_IDLE_TTL_MINUTES = float(os.environ.get('ROOM_IDLE_TTL_MINUTES', 30))
+# Сколько комнат максимум отдаёт одна страница /debug
+DEBUG_PAGE_LIMIT = int(os.environ.get('DEBUG_PAGE_LIMIT', 1000))
+# permessage-deflate для /ws (клиент может отказаться через ?compress=0)
+WS_COMPRESS = os.environ.get('WS_COMPRESS', '1') != '0'
 
 if not BOT_TOKEN:
     logger.critical("❌ BOT_TOKEN не задан!")
     raise ValueError("BOT_TOKEN обязателен")
 
+# Супервизор только запускает и перезапускает воркеры: словари, хранилище,
+# журнал и подсказчик ему ни к чему, поэтому уходим в него до их импорта
+if __name__ == '__main__' and cluster.WORKERS > 1 and 'WORKER_ID' not in os.environ:
+    cluster.run_workers(os.path.abspath(__file__))
+    raise SystemExit
+
+from game.state import GameState, Team, Status, RED, BLUE, BLACK, COLOR_NAMES
+from game.words import word_bank
+from game.packs import pack_registry, get_word_source
+from game.boards import board_pool
+from game.actor import RoomActor
+from game.expiry import ExpiryScheduler
+from game.store import RoomStore, create_room_store, worker_db_path, ROOM_DB_PATH
+from game.room_ids import RoomIdAllocator, RoomLimitReached
+from game import eventlog
+from game.spymaster import create_spymaster, SPYMASTER_DEFAULT_LANGUAGE
+from tg_bot.ingest import UpdateQueue, FULL, chat_key
+from tg_bot.outbox import outbox, reply, HIGH, NORMAL, LOW
+from utils import metrics
+from websocket import frames
+from websocket.broadcaster import RoomBroadcaster, WS_CONNECTIONS, WS_MESSAGES, WS_BYTES
+from websocket.spectators import SPECTATORS
+from websocket.admission import Admission, AdmissionRejected, client_ip, WS_MAX_MESSAGE_BYTES
+
+if TYPE_CHECKING:
+    # Сам telegram импортирует start_bot уже после того, как порт слушается
+    from telegram import Update
+    from telegram.ext import Application
+
 # ==================== ИГРОВАЯ КОМНАТА ====================
 class GameRoom:
-    def __init__(self, room_id: str):
+    def __init__(self, room_id: str, words=None, state: Optional[GameState] = None,
+                 creator: Optional[int] = None):
         self.room_id = room_id
+        self.creator = creator  # Telegram id того, кто создал комнату
         self.created_at = datetime.now()
-        self.game_state = self._create_game_state()
-        self.ws_connections = []
+        # Источник слов: общий словарь или выбранный пак
+        self.words = words if words is not None else word_bank
+        self.game_state = state if state is not None else self._create_game_state()
+        self.broadcaster = RoomBroadcaster(room_id)
+        self.actor = RoomActor(room_id)  # действия игроков – строго по очереди
+        self.version = 0
+        self.on_change: Optional[Callable[['GameRoom'], None]] = None  # ставит хранилище
+        # Готовый JSON состояния по ролям; годен, пока не изменилась version
+        self._snapshots: Dict[str, bytes] = {}
+        self._snapshots_version = -1
+        self.log_events = True  # при восстановлении из журнала события не пишем повторно
+        # Статус, под которым комната учтена в сводке GAMES
+        self._counted_status = self.game_state.status
+        _games[self._counted_status].inc()
+        # При задержке трансляции зрителям нужен свой, отстающий снимок
+        self.broadcaster.spectators.watch(partial(self.state_snapshot, 'spectator'), self.broadcaster.seq)
 
-    def _create_game_state(self) -> Dict:
-        words = self._load_words()
-        colors = (['red'] * 9) + (['blue'] * 8) + ['black'] + (['neutral'] * 7)
-        random.shuffle(colors)
+    def _changed(self):
+        self.version += 1
+        status = self.game_state.status
+        if status is not self._counted_status:
+            _games[self._counted_status].dec()
+            _games[status].inc()
+            self._counted_status = status
+        if self.on_change is not None:
+            self.on_change(self)
+
+    def to_record(self) -> Dict:
         return {
-            'words': random.sample(words, 25),
-            'colors': colors,
-            'revealed': [False] * 25,
-            'current_team': 'red',
-            'current_turn': 1,
-            'red_score': 9,
-            'blue_score': 8,
-            'game_status': 'waiting',
-            'winner': None,
+            'room_id': self.room_id,
+            'created_at': self.created_at.timestamp(),
+            'creator': self.creator,
+            'pack': getattr(self.words, 'id', None),
+            'state': self.game_state.to_record(),
         }
 
-    def _load_words(self) -> List[str]:
-        try:
-            with open('words.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return ["яблоко", "гора", "мост", "врач", "луна", "книга", "огонь", "река", "часы"]
+    @classmethod
+    def from_record(cls, record: Dict) -> 'GameRoom':
+        room = cls(record['room_id'], pack_registry.packs.get(record['pack']),
+                   GameState.from_record(record['state']), record.get('creator'))
+        room.created_at = datetime.fromtimestamp(record['created_at'])
+        return room
+
+    def _create_game_state(self) -> GameState:
+        return GameState.new(board_pool.take(self.words))
 
     def get_captain_state(self) -> Dict:
         """Для капитана – со всеми цветами"""
         state = self.get_public_state()
-        state['colors'] = self.game_state['colors']
+        state['colors'] = self.game_state.colors_wire()
         state['role'] = 'captain'
         return state
 
@@ -74,75 +136,182 @@ class GameRoom:
         state['role'] = 'agent'
         return state
 
+    def get_spectator_state(self) -> Dict:
+        """Для зрителя – как у агента"""
+        state = self.get_public_state()
+        state['role'] = 'spectator'
+        return state
+
+    def state_snapshot(self, role: str) -> bytes:
+        """
+        Состояние для роли, уже в JSON. Строится один раз на версию партии,
+        дальше все подключения получают те же неизменяемые байты
+        """
+        if self._snapshots_version != self.version:
+            self._snapshots.clear()
+            self._snapshots_version = self.version
+        snapshot = self._snapshots.get(role)
+        if snapshot is None:
+            builder = _STATE_BUILDERS.get(role, GameRoom.get_agent_state)
+            snapshot = self._snapshots[role] = frames.dumps(builder(self))
+        return snapshot
+
+    def init_frame(self, role: str) -> frames.Frame:
+        """Кадр init из готового снимка: склейка байтов без сериализации"""
+        view = self.broadcaster.spectators.delayed_view() if role == 'spectator' else None
+        snapshot, seq = view if view is not None else (self.state_snapshot(role), self.broadcaster.seq)
+        return frames.Frame(b'{"type":"init","game_state":%s,"seq":%d,"epoch":"%s"}' % (
+            snapshot, seq, self.broadcaster.epoch.encode('ascii')))
+
     def get_public_state(self) -> Dict:
         """Общая часть состояния"""
-        return {
-            'room_id': self.room_id,
-            'words': self.game_state['words'],
-            'revealed': self.game_state['revealed'],
-            'current_team': self.game_state['current_team'],
-            'current_turn': self.game_state['current_turn'],
-            'red_score': self.game_state['red_score'],
-            'blue_score': self.game_state['blue_score'],
-            'game_status': self.game_state['game_status'],
-            'winner': self.game_state['winner'],
-        }
+        state = self.game_state.to_wire(self.room_id)
+        if self.game_state.hint is not None:
+            state['hint'] = self.game_state.hint
+            state['hint_number'] = self.game_state.hint_number
+        return state
+
+    def log_event(self, kind: int, payload: bytes = b''):
+        """Событие партии в журнал; по сигналу журнала следом идёт снимок"""
+        if self.log_events and event_log.append(self.room_id, kind, payload):
+            self.log_state(eventlog.SNAPSHOT)
+
+    def log_state(self, kind: int):
+        """Полное состояние комнаты в журнал (создание, сброс, снимок)"""
+        if self.log_events:
+            event_log.append(self.room_id, kind, frames.dumps(self.to_record()))
 
     def reset_game(self):
         """Сбрасывает игру в комнате, создаёт новое состояние"""
         self.game_state = self._create_game_state()
+        self.log_state(eventlog.RESET)
+        self._changed()
 
     def reveal_card(self, index: int) -> Dict:
-        if not (0 <= index < 25) or self.game_state['revealed'][index]:
+        state = self.game_state
+        if not (0 <= index < 25) or state.is_revealed(index):
             return {'error': 'Invalid'}
         
-        color = self.game_state['colors'][index]
-        self.game_state['revealed'][index] = True
+        color = state.reveal(index)
         
-        if color == 'red':
-            self.game_state['red_score'] = max(0, self.game_state['red_score'] - 1)
-        elif color == 'blue':
-            self.game_state['blue_score'] = max(0, self.game_state['blue_score'] - 1)
+        if color == RED:
+            state.red_score = max(0, state.red_score - 1)
+        elif color == BLUE:
+            state.blue_score = max(0, state.blue_score - 1)
+
+        # После подсказки у команды number + 1 попыток; последняя заканчивает ход
+        guesses_over = False
+        if state.guesses_left > 0:
+            state.guesses_left -= 1
+            guesses_over = state.guesses_left == 0
         
         result = self._check_winner(color)
         if result['game_over']:
-            self.game_state['game_status'] = 'finished'
-            self.game_state['winner'] = result['winner']
+            state.status = Status.FINISHED
+            state.winner = result['winner']
+        self.log_event(eventlog.REVEAL, bytes((index,)))
+        self._changed()
         
         return {
             'index': index,
-            'color': color,
-            'red_score': self.game_state['red_score'],
-            'blue_score': self.game_state['blue_score'],
+            'color': COLOR_NAMES[color],
+            'red_score': state.red_score,
+            'blue_score': state.blue_score,
             'game_over': result['game_over'],
-            'winner': result['winner']
+            'winner': result['winner'].value if result['winner'] else None,
+            'guesses_over': guesses_over,
         }
 
-    def _check_winner(self, last_color: str) -> Dict:
-        if last_color == 'black':
-            winner = 'blue' if self.game_state['current_team'] == 'red' else 'red'
-            return {'game_over': True, 'winner': winner}
-        if self.game_state['red_score'] == 0:
-            return {'game_over': True, 'winner': 'red'}
-        if self.game_state['blue_score'] == 0:
-            return {'game_over': True, 'winner': 'blue'}
+    def _check_winner(self, last_color: int) -> Dict:
+        state = self.game_state
+        if last_color == BLACK:
+            return {'game_over': True, 'winner': state.current_team.other}
+        if state.red_score == 0:
+            return {'game_over': True, 'winner': Team.RED}
+        if state.blue_score == 0:
+            return {'game_over': True, 'winner': Team.BLUE}
         return {'game_over': False, 'winner': None}
 
     def switch_team(self):
-        self.game_state['current_team'] = 'blue' if self.game_state['current_team'] == 'red' else 'red'
-        self.game_state['current_turn'] += 1
+        self.game_state.current_team = self.game_state.current_team.other
+        self.game_state.current_turn += 1
+        self.game_state.hint = None
+        self.game_state.hint_number = None
+        self.game_state.guesses_left = 0
+        self.log_event(eventlog.TURN)
+        self._changed()
+
+    def set_hint(self, word: str, number: int) -> bool:
+        """Подсказка капитана текущей команды: можно угадать number + 1 слов"""
+        if not word or len(word) > 40 or not (0 <= number <= 9):
+            return False
+        self.game_state.hint = word
+        self.game_state.hint_number = number
+        self.game_state.guesses_left = number + 1
+        self.log_event(eventlog.HINT, eventlog.hint_payload(word, number))
+        self._changed()
+        return True
 
     def is_active(self) -> bool:
-        return datetime.now() - self.created_at < timedelta(hours=24)
+        return datetime.now() - self.created_at < timedelta(hours=ROOM_TTL_HOURS)
 
     def cleanup(self):
-        for ws in self.ws_connections:
-            if not ws.closed:
-                asyncio.create_task(ws.close())
-        self.ws_connections.clear()
+        self.actor.close()
+        self.broadcaster.close_all()
+        _games[self._counted_status].dec()
+
+
+_STATE_BUILDERS = {
+    'captain': GameRoom.get_captain_state,
+    'agent': GameRoom.get_agent_state,
+    'spectator': GameRoom.get_spectator_state,
+}
+
+
+def restore_room(room: GameRoom):
+    """Комната поднята из базы – досчитываем ей оставшийся срок"""
+    age = (datetime.now() - room.created_at).total_seconds()
+    room_expiry.track(room.room_id, ttl=max(0.0, ROOM_TTL_HOURS * 3600 - age))
+    room_ids.register(room.room_id, room.creator)
+
+
+# У каждого воркера своя база: в ней только комнаты его шарда
+active_rooms: RoomStore = create_room_store(
+    GameRoom.from_record,
+    path=worker_db_path(ROOM_DB_PATH, cluster.WORKER_ID) if cluster.WORKERS > 1 else ROOM_DB_PATH,
+    max_age=ROOM_TTL_HOURS * 3600,
+    on_load=restore_room,
+)
+
+# Журнал событий партий: у каждого воркера свой каталог.
+# База и журнал открываются в restore_rooms(), когда порт уже открыт
+event_log = eventlog.create_event_log(
+    os.path.join(eventlog.EVENT_LOG_DIR, f'worker-{cluster.WORKER_ID}')
+    if eventlog.EVENT_LOG_DIR and cluster.WORKERS > 1 else eventlog.EVENT_LOG_DIR
+)
 
+# Подсказчик по векторам слов (None – SPYMASTER_DIR не задан)
+spymaster = create_spymaster()
 
-active_rooms: Dict[str, GameRoom] = {}
+# Лимиты подключений к /ws и частоты действий
+admission = Admission()
+# Приложение внутреннего канала: соединения туда уже проверил принявший воркер
+INTERNAL = web.AppKey('internal', bool)
+
+# Коды комнат: только своего шарда и не занятые комнатами из базы
+room_ids = RoomIdAllocator(is_taken=lambda code: code in active_rooms, accept=cluster.is_local)
+
+# ==================== МЕТРИКИ ====================
+ROOMS = metrics.Gauge('codenames_rooms', 'Комнаты этого воркера', func=lambda: len(active_rooms))
+ROOMS_CREATED = metrics.Counter('codenames_rooms_created', 'Созданные комнаты')
+ROOMS_EXPIRED = metrics.Counter('codenames_rooms_expired', 'Комнаты, удалённые по сроку')
+WEBHOOK_SECONDS = metrics.Histogram('codenames_webhook_seconds', 'Ответ вебхука Telegram (до постановки в очередь)')
+GAMES = metrics.Gauge('codenames_games', 'Партии загруженных в память комнат по статусу', ['status'])
+_games = {status: GAMES.labels(status.value) for status in Status}
+_connections = WS_CONNECTIONS.labels()
+_spectators = SPECTATORS.labels()
+_messages_in = WS_MESSAGES.labels('in')
+_bytes_in = WS_BYTES.labels('in')
 
 
 # ==================== ВСПОМОГАТЕЛЬНЫЕ ====================
@@ -152,113 +321,345 @@ def make_captain_link(room_id: str) -> str:
 def make_agent_link(room_id: str) -> str:
     return f"{FRONTEND_URL}?room={room_id}&role=agent"
 
+def links_keyboard(room_id: str, captain_text: str, agent_text: str):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # к этому моменту уже загружен
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(captain_text, url=make_captain_link(room_id))],
+        [InlineKeyboardButton(agent_text, url=make_agent_link(room_id))],
+    ])
+
+
+async def room_exists(room_id: str) -> bool:
+    """Есть ли комната – у себя или у воркера-владельца"""
+    if cluster.is_local(room_id):
+        return room_id in active_rooms
+    return await cluster.fetch_json(cluster.shard_of(room_id), f'/internal/rooms/{room_id}') is not None
+
+def local_rooms_info() -> List[Dict]:
+    rooms = []
+    for rid, room in list(active_rooms.items()):
+        if room.is_active():
+            age = (datetime.now() - room.created_at).seconds // 60
+            rooms.append({'room_id': rid, 'age_minutes': age})
+    return rooms
+
 
 # ==================== КОМАНДЫ TELEGRAM ====================
+# Ответы уходят через планировщик tg_bot.outbox: reply() не ждёт отправки
 async def start_command(update: Update, context):
-    await update.message.reply_text(
+    reply(
+        update,
         "👋 <b>Codenames Online</b>\n\n"
-        "<code>/new</code> – создать комнату\n"
+        "<code>/new [язык]</code> – создать комнату\n"
         "<code>/join [код]</code> – присоединиться\n"
+        "<code>/my</code> – мои комнаты\n"
         "<code>/list</code> – список комнат\n"
+        "<code>/packs</code> – наборы слов\n"
         "<code>/help</code> – помощь",
-        parse_mode='HTML'
+        parse_mode='HTML',
+        priority=LOW
     )
 
 async def new_command(update: Update, context):
     user = update.effective_user
-    room_id = str(uuid.uuid4())[:6].upper()
-    room = GameRoom(room_id)
+    words = get_word_source(context.args or ())
+    if words is None:
+        reply(
+            update,
+            "❌ Набор слов не найден. Список: <code>/packs</code>",
+            parse_mode='HTML',
+            priority=NORMAL
+        )
+        return
+
+    elsewhere = 0
+    if cluster.WORKERS > 1:
+        elsewhere = sum(map(len, await cluster.fetch_all(f'/internal/users/{user.id}/rooms')))
+    try:
+        room_id = room_ids.allocate(user.id, elsewhere)
+    except RoomLimitReached:
+        reply(
+            update,
+            f"❌ Достигнут лимит комнат ({room_ids.max_per_user}). Ваши комнаты: <code>/my</code>",
+            parse_mode='HTML',
+            priority=NORMAL
+        )
+        return
+    room = GameRoom(room_id, words, creator=user.id)
     active_rooms[room_id] = room
+    room_expiry.track(room_id)
+    room.log_state(eventlog.CREATE)
+    ROOMS_CREATED.inc()
     logger.info(f"Новая комната {room_id} от {user.id}")
+    pack_line = f"<b>📚 Слова:</b> {words.title}\n" if words is not word_bank else ""
 
-    captain_link = make_captain_link(room_id)
-    agent_link = make_agent_link(room_id)
-
-    keyboard = [
-        [InlineKeyboardButton("👑 Ссылка для капитана", url=captain_link)],
-        [InlineKeyboardButton("🔎 Ссылка для агента", url=agent_link)]
-    ]
-
-    await update.message.reply_text(
+    reply(
+        update,
         f"🎮 <b>КОМНАТА {room_id} СОЗДАНА!</b>\n\n"
+        f"{pack_line}"
         f"<b>👑 Капитан:</b> видит все цвета карточек\n"
         f"<b>🔎 Агент:</b> видит только слова\n\n"
         f"👇 <b>Отправьте друзьям нужные ссылки:</b>",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='HTML'
+        reply_markup=links_keyboard(room_id, "👑 Ссылка для капитана", "🔎 Ссылка для агента"),
+        parse_mode='HTML',
+        priority=HIGH
     )
 
 async def join_command(update: Update, context):
     if not context.args:
-        await update.message.reply_text(
+        reply(
+            update,
             "❓ Укажите код комнаты: <code>/join ABC123</code>",
-            parse_mode='HTML'
+            parse_mode='HTML',
+            priority=NORMAL
         )
         return
     
     room_id = context.args[0].upper()
-    if room_id not in active_rooms:
-        await update.message.reply_text(
+    if not await room_exists(room_id):
+        reply(
+            update,
             f"❌ Комната <code>{room_id}</code> не найдена",
-            parse_mode='HTML'
+            parse_mode='HTML',
+            priority=NORMAL
         )
         return
     
-    captain_link = make_captain_link(room_id)
-    agent_link = make_agent_link(room_id)
-    
-    keyboard = [
-        [InlineKeyboardButton("👑 Капитан", url=captain_link)],
-        [InlineKeyboardButton("🔎 Агент", url=agent_link)]
-    ]
-    
-    await update.message.reply_text(
+    reply(
+        update,
         f"✅ Комната <code>{room_id}</code>\n\n"
         f"Выберите роль:",
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='HTML'
+        reply_markup=links_keyboard(room_id, "👑 Капитан", "🔎 Агент"),
+        parse_mode='HTML',
+        priority=HIGH
     )
 
+async def my_command(update: Update, context):
+    user_id = update.effective_user.id
+    room_list = room_ids.rooms_of(user_id)
+    for worker_rooms in await cluster.fetch_all(f'/internal/users/{user_id}/rooms'):
+        room_list.extend(worker_rooms)
+
+    if not room_list:
+        reply(update, "📭 У вас нет комнат. Создать: <code>/new</code>", parse_mode='HTML', priority=NORMAL)
+        return
+
+    text = "🗂 <b>Ваши комнаты:</b>\n"
+    for room_id in room_list:
+        text += f"• <code>{room_id}</code> – <a href=\"{make_captain_link(room_id)}\">капитан</a>, " \
+                f"<a href=\"{make_agent_link(room_id)}\">агент</a>\n"
+    reply(update, text, parse_mode='HTML', disable_web_page_preview=True, priority=NORMAL)
+
 async def list_command(update: Update, context):
-    if not active_rooms:
-        await update.message.reply_text("📭 Нет активных комнат", parse_mode='HTML')
+    rooms = local_rooms_info()
+    for worker_rooms in await cluster.fetch_all('/internal/rooms'):
+        rooms.extend(worker_rooms)
+
+    if not rooms:
+        reply(update, "📭 Нет активных комнат", parse_mode='HTML', priority=LOW)
         return
     
     text = "📋 <b>Активные комнаты:</b>\n"
-    for rid, room in list(active_rooms.items()):
-        if room.is_active():
-            age = (datetime.now() - room.created_at).seconds // 60
-            text += f"• <code>{rid}</code> – {age} мин.\n"
-    await update.message.reply_text(text, parse_mode='HTML')
+    for info in rooms:
+        text += f"• <code>{info['room_id']}</code> – {info['age_minutes']} мин.\n"
+    reply(update, text, parse_mode='HTML', priority=LOW)
+
+async def packs_command(update: Update, context):
+    if not pack_registry.packs:
+        reply(update, "📭 Наборы слов не установлены", parse_mode='HTML', priority=LOW)
+        return
+
+    text = "📚 <b>Наборы слов:</b>\n"
+    for pack in pack_registry.packs.values():
+        text += f"• <code>{pack.id}</code> – {pack.title} ({pack.language}, {pack.theme}, {pack.difficulty})\n"
+    text += "\nНапример: <code>/new en</code> или <code>/new ru-base</code>"
+    reply(update, text, parse_mode='HTML', priority=LOW)
 
 async def help_command(update: Update, context):
-    await update.message.reply_text(
+    reply(
+        update,
         "🛠 <b>Команды:</b>\n"
-        "<code>/new</code> – создать комнату\n"
+        "<code>/new [язык|набор]</code> – создать комнату\n"
         "<code>/join [код]</code> – присоединиться\n"
-        "<code>/list</code> – список комнат\n\n"
+        "<code>/my</code> – мои комнаты\n"
+        "<code>/list</code> – список комнат\n"
+        "<code>/packs</code> – наборы слов\n\n"
         "<b>Как играть:</b>\n"
         "1. Создайте комнату\n"
         "2. Отправьте друзьям нужные ссылки\n"
         "3. Капитаны видят ВСЕ цвета\n"
         "4. Агенты угадывают вслепую",
-        parse_mode='HTML'
+        parse_mode='HTML',
+        priority=LOW
     )
 
 async def unknown_command(update: Update, context):
-    await update.message.reply_text(
+    reply(
+        update,
         "❓ Неизвестная команда. /help",
-        parse_mode='HTML'
+        parse_mode='HTML',
+        priority=LOW
     )
 
 
+# ==================== ДЕЙСТВИЯ ИГРОКОВ ====================
+# Выполняет актор комнаты по одному, поэтому решение о смене хода
+# всегда принимается по состоянию после предыдущего действия
+
+def click_card(room: GameRoom, conn, data: Dict):
+    index = data.get('index')
+    if not isinstance(index, int):
+        return
+    result = room.reveal_card(index)
+
+    if 'error' in result:
+        conn.send({'type': 'error', 'message': result['error']})
+        return
+
+    # Рассылаем обновление ВСЕМ в комнате
+    room.broadcaster.broadcast({
+        'type': 'card_revealed',
+        'index': result['index'],
+        'color': result['color'],
+        'red_score': result['red_score'],
+        'blue_score': result['blue_score']
+    })
+
+    if result['game_over']:
+        room.broadcaster.broadcast({
+            'type': 'game_over',
+            'winner': result['winner']
+        })
+
+    elif result['guesses_over'] or result['color'] not in [room.game_state.current_team.value, 'neutral', 'black']:
+        room.switch_team()
+        room.broadcaster.broadcast({
+            'type': 'turn_switch',
+            'current_team': room.game_state.current_team.value
+        })
+
+
+def reset_game(room: GameRoom, conn, data: Dict):
+    room.reset_game()
+    # Рассылаем новое состояние каждому игроку с учётом его роли
+    room.broadcaster.broadcast_by_role({
+        'captain': {'type': 'game_reset', 'game_state': room.get_captain_state()},
+        'agent': {'type': 'game_reset', 'game_state': room.get_agent_state()},
+        'spectator': {'type': 'game_reset', 'game_state': room.get_spectator_state()},
+    })
+
+
+def set_hint(room: GameRoom, conn, data: Dict):
+    if conn.role != 'captain':
+        conn.send({'type': 'error', 'message': 'Only captain can give hints'})
+        return
+    word, number = data.get('word'), data.get('number')
+    if (not isinstance(word, str) or not isinstance(number, int) or isinstance(number, bool)
+            or not room.set_hint(word.strip(), number)):
+        conn.send({'type': 'error', 'message': 'Invalid hint'})
+        return
+    state = room.game_state
+    room.broadcaster.broadcast({
+        'type': 'hint',
+        'team': state.current_team.value,
+        'word': state.hint,
+        'number': state.hint_number,
+    })
+
+
+async def board_clues(room: GameRoom, conn) -> List:
+    """Подсказки для текущей команды; пустой список – подсказчику нечего предложить"""
+    if spymaster is None:
+        conn.send({'type': 'error', 'message': 'Spymaster unavailable'})
+        return []
+    state = room.game_state
+    if state.status is Status.FINISHED:
+        conn.send({'type': 'error', 'message': 'Game is over'})
+        return []
+    clues = await spymaster.suggest(getattr(room.words, 'language', SPYMASTER_DEFAULT_LANGUAGE),
+                                    state.words, state.colors, state.revealed, state.current_team.color)
+    if not clues:
+        conn.send({'type': 'error', 'message': 'No clue found'})
+    return clues
+
+
+async def suggest_hints(room: GameRoom, conn, data: Dict):
+    """Варианты подсказок – только спросившему капитану"""
+    if conn.role != 'captain':
+        conn.send({'type': 'error', 'message': 'Only captain can get suggestions'})
+        return
+    clues = await board_clues(room, conn)
+    if clues:
+        conn.send({
+            'type': 'hint_suggestions',
+            'team': room.game_state.current_team.value,
+            'suggestions': [{'word': c.word, 'number': c.count, 'targets': c.targets} for c in clues],
+        })
+
+
+async def auto_hint(room: GameRoom, conn, data: Dict):
+    """Подсказку даёт подсказчик – по просьбе капитана или в комнате без капитана"""
+    if conn.role == 'spectator' or (conn.role != 'captain'
+                                    and any(c.role == 'captain' for c in room.broadcaster)):
+        conn.send({'type': 'error', 'message': 'Only captain can ask for a hint'})
+        return
+    if room.game_state.hint is not None:
+        conn.send({'type': 'error', 'message': 'Hint already given'})
+        return
+    clues = await board_clues(room, conn)
+    # Пока подсказчик думал, подсказку мог дать кто-то ещё
+    if not clues or room.game_state.hint is not None or not room.set_hint(clues[0].word, clues[0].count):
+        return
+    state = room.game_state
+    room.broadcaster.broadcast({
+        'type': 'hint',
+        'team': state.current_team.value,
+        'word': state.hint,
+        'number': state.hint_number,
+        'auto': True,
+    })
+
+
+ROOM_ACTIONS = {
+    'click_card': click_card,
+    'reset_game': reset_game,
+    'set_hint': set_hint,
+    'suggest_hints': suggest_hints,
+    'auto_hint': auto_hint,
+}
+
+
 # ==================== WEBSOCKET ====================
 async def websocket_handler(request):
-    ws = web.WebSocketResponse(autoping=True, heartbeat=30)
-    await ws.prepare(request)
-
     room_id = request.query.get('room', '').upper()
     role = request.query.get('role', 'agent')
+    binary = request.query.get('proto') == 'bin'
+    compress = WS_COMPRESS and request.query.get('compress') != '0'
+
+    local = not room_id or cluster.is_local(room_id)
+
+    # Лимиты проверяем до рукопожатия: отказ стоит одного короткого HTTP-ответа.
+    # IP учитывает воркер, принявший соединение, игроков комнаты – её владелец
+    try:
+        ticket = admission.admit(
+            None if request.app.get(INTERNAL, False) else client_ip(request),
+            room_id if local and role != 'spectator' and room_id in active_rooms else None,
+        )
+    except AdmissionRejected as e:
+        return e.response()
+
+    try:
+        # Комната другого воркера – пробрасываем соединение владельцу
+        if not local:
+            return await cluster.proxy_websocket(request, room_id, compress=compress)
+        return await room_websocket(request, room_id, role, binary, compress, ticket)
+    finally:
+        admission.release(ticket)
+
+
+async def room_websocket(request, room_id: str, role: str, binary: bool, compress: bool, ticket):
+    ws = web.WebSocketResponse(autoping=True, heartbeat=30, compress=compress, max_msg_size=WS_MAX_MESSAGE_BYTES)
+    await ws.prepare(request)
     
     logger.info(f"🔌 WebSocket: комната={room_id}, роль={role}")
 
@@ -273,89 +674,69 @@ async def websocket_handler(request):
 
     room = active_rooms[room_id]
     
-    # Сохраняем роль в объекте ws для последующей рассылки
-    ws.role = role
-    room.ws_connections.append(ws)
-    
-    logger.info(f"✅ WebSocket подключен: комната {room_id}, всего: {len(room.ws_connections)}")
+    # Все исходящие сообщения идут через очередь соединения
+    spectator = role == 'spectator'
+    if spectator:
+        # Зрители не продлевают жизнь комнаты и получают рассылки пачками
+        conn = room.broadcaster.add_spectator(ws, binary=binary)
+        if conn is None:
+            await ws.close(code=1013, message=b'Too many spectators')
+            return ws
+        logger.info(f"👀 Зритель подключен: комната {room_id}, зрителей: {len(room.broadcaster.spectators)}")
+    else:
+        conn = room.broadcaster.add(ws, role, binary=binary)
+        if len(room.broadcaster) == 1:
+            room_expiry.connected(room_id)
+        logger.info(f"✅ WebSocket подключен: комната {room_id}, всего: {len(room.broadcaster)}")
 
     try:
-        # Отправляем начальное состояние
-        if role == 'captain':
-            game_state = room.get_captain_state()
+        # Переподключение с ?since=<seq>: дочитываем пропущенное из журнала комнаты
+        missed = None
+        since = request.query.get('since', '')
+        if since.isdigit():
+            missed = room.broadcaster.replay(int(since), request.query.get('epoch'), role)
+            if missed is not None and len(missed) >= conn.queue.maxsize:
+                missed = None
+
+        if missed is not None:
+            conn.send({'type': 'resumed', 'missed': len(missed)})
+            for frame in missed:
+                conn.send(frame)
         else:
-            game_state = room.get_agent_state()
-        
-        await ws.send_json({
-            'type': 'init',
-            'game_state': game_state
-        })
+            # Начальное состояние – готовый снимок для роли
+            conn.send(room.init_frame(role))
 
         async for msg in ws:
-            if msg.type == web.WSMsgType.TEXT:
+            if msg.type in (web.WSMsgType.TEXT, web.WSMsgType.BINARY):
+                _messages_in.inc()
+                # Без перекодирования: у текстового кадра это символы, для JSON-команд – те же байты
+                _bytes_in.inc(len(msg.data))
+                if not admission.allow_message(ticket, conn):
+                    if admission.kicked(ticket):
+                        await ws.close(code=1008, message=b'Rate limit')
+                        break
+                    continue
+                if msg.type == web.WSMsgType.BINARY:
+                    continue  # команды приходят только JSON-текстом
                 try:
-                    data = json.loads(msg.data)
+                    data = frames.loads(msg.data)
                     action = data.get('action')
                     
-                    if action == 'click_card':
-                        index = data.get('index')
-                        if index is not None:
-                            result = room.reveal_card(index)
-                            
-                            if 'error' in result:
-                                await ws.send_json({'type': 'error', 'message': result['error']})
-                            else:
-                                # Рассылаем обновление ВСЕМ в комнате
-                                update_msg = {
-                                    'type': 'card_revealed',
-                                    'index': result['index'],
-                                    'color': result['color'],
-                                    'red_score': result['red_score'],
-                                    'blue_score': result['blue_score']
-                                }
-                                
-                                for conn in room.ws_connections:
-                                    if not conn.closed:
-                                        await conn.send_json(update_msg)
-                                
-                                if result['game_over']:
-                                    game_over_msg = {
-                                        'type': 'game_over',
-                                        'winner': result['winner']
-                                    }
-                                    for conn in room.ws_connections:
-                                        if not conn.closed:
-                                            await conn.send_json(game_over_msg)
-                                
-                                elif result['color'] not in [room.game_state['current_team'], 'neutral', 'black']:
-                                    room.switch_team()
-                                    turn_msg = {
-                                        'type': 'turn_switch',
-                                        'current_team': room.game_state['current_team']
-                                    }
-                                    for conn in room.ws_connections:
-                                        if not conn.closed:
-                                            await conn.send_json(turn_msg)
-                    
-                    elif action == 'reset_game':
-                        # Сбрасываем состояние игры
-                        room.reset_game()
-                        # Рассылаем новое состояние каждому игроку с учётом его роли
-                        for conn in room.ws_connections:
-                            if not conn.closed:
-                                if hasattr(conn, 'role') and conn.role == 'captain':
-                                    state = room.get_captain_state()
-                                else:
-                                    state = room.get_agent_state()
-                                await conn.send_json({
-                                    'type': 'game_reset',
-                                    'game_state': state
-                                })
-                    
-                    elif action == 'ping':
-                        await ws.send_json({'type': 'pong'})
+                    if action == 'ping':
+                        conn.send({'type': 'pong'})
+                    elif spectator:
+                        conn.send({'type': 'error', 'message': 'Spectators cannot act'})
+                    elif action in ROOM_ACTIONS:
+                        if not admission.allow_action(ticket, action, conn):
+                            if admission.kicked(ticket):
+                                await ws.close(code=1008, message=b'Rate limit')
+                                break
+                            continue
+                        # Состояние меняет только актор комнаты
+                        if not room.actor.submit(ROOM_ACTIONS[action], room, conn, data):
+                            conn.send({'type': 'error', 'message': 'Room busy'})
                         
-                except json.JSONDecodeError:
+                except ValueError:
                     logger.error(f"❌ JSON ошибка")
                 except Exception as e:
                     logger.error(f"❌ Ошибка обработки: {e}")
@@ -366,45 +747,169 @@ async def websocket_handler(request):
     except Exception as e:
         logger.error(f"❌ WebSocket ошибка: {e}")
     finally:
-        if ws in room.ws_connections:
-            room.ws_connections.remove(ws)
-            logger.info(f"🔌 WebSocket отключен: комната {room_id}, осталось: {len(room.ws_connections)}")
+        if spectator:
+            room.broadcaster.remove(conn)
+        elif room.broadcaster.remove(conn):
+            logger.info(f"🔌 WebSocket отключен: комната {room_id}, осталось: {len(room.broadcaster)}")
+            if not len(room.broadcaster):
+                room_expiry.disconnected(room_id)
     
     return ws
 
 
 # ==================== HTTP ЭНДПОИНТЫ ====================
+async def process_update(data: Dict):
+    from telegram import Update
+    await application.process_update(Update.de_json(data, application.bot))
+
+update_queue = UpdateQueue(process_update)
+
 async def telegram_webhook(request):
-    try:
-        data = await request.json()
-        update = Update.de_json(data, application.bot)
-        await application.process_update(update)
+    # Отвечаем сразу: медленные ответы бота не держат запрос,
+    # и Telegram не присылает апдейт повторно
+    with WEBHOOK_SECONDS.time():
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(text='Bad JSON', status=400)
+        if not isinstance(data, dict):
+            return web.Response(text='Bad update', status=400)
+        if update_queue.submit(data.get('update_id'), chat_key(data), data) == FULL:
+            logger.warning(f"⚠️ Очередь апдейтов заполнена ({len(update_queue)}), просим Telegram повторить")
+            return web.Response(text='Busy', status=503)
         return web.Response(text='OK')
-    except Exception as e:
-        logger.error(f"❌ Webhook error: {e}")
-        return web.Response(text='Error', status=500)
 
 async def health_check(request):
-    total_connections = sum(len(r.ws_connections) for r in active_rooms.values())
+    # Только готовые сводки – ответ не зависит от числа комнат
     return web.json_response({
         'status': 'ok',
         'rooms': len(active_rooms),
-        'connections': total_connections,
+        'connections': int(_connections.value),
+        'spectators': int(_spectators.value),
+        'games': {status.value: int(gauge.value) for status, gauge in _games.items()},
+        'updates_pending': len(update_queue),
+        'bot': bot_status,
+        'restore': restore_status,
         'timestamp': datetime.now().isoformat()
     })
 
+def room_debug_info(room: GameRoom) -> Dict:
+    return {
+        'room_id': room.room_id,
+        'connections': len(room.broadcaster),
+        'spectators': len(room.broadcaster.spectators),
+        'status': room.game_state.status.value,
+        'pack': getattr(room.words, 'id', None),
+        'red_score': room.game_state.red_score,
+        'blue_score': room.game_state.blue_score,
+        'revealed': room.game_state.revealed_count,
+        'active': room.is_active()
+    }
+
 async def debug_rooms(request):
-    rooms_info = []
-    for rid, room in active_rooms.items():
-        rooms_info.append({
-            'room_id': rid,
-            'connections': len(room.ws_connections),
-            'red_score': room.game_state['red_score'],
-            'blue_score': room.game_state['blue_score'],
-            'revealed': sum(room.game_state['revealed']),
-            'active': room.is_active()
-        })
-    return web.json_response(rooms_info)
+    """
+    Страница комнат: /debug?offset=0&limit=100&status=finished&min_connections=1&pack=en-base
+    Отдаёт {"rooms": [...], "offset", "count", "next_offset", "total"} потоком
+    """
+    query = request.query
+    try:
+        offset = max(0, int(query.get('offset', 0)))
+        limit = min(DEBUG_PAGE_LIMIT, max(1, int(query.get('limit', 100))))
+        min_connections = int(query.get('min_connections', 0))
+        status = Status(query['status']) if 'status' in query else None
+    except ValueError:
+        raise web.HTTPBadRequest(text='offset, limit, min_connections – числа; status – waiting|active|finished')
+    pack = query.get('pack')
+
+    def matches(room: GameRoom) -> bool:
+        return ((status is None or room.game_state.status is status)
+                and len(room.broadcaster) >= min_connections
+                and (pack is None or getattr(room.words, 'id', None) == pack))
+
+    # Страницу выбираем без await, пока словарь комнат не может измениться;
+    # лишняя комната показывает, есть ли следующая страница
+    page = list(islice((r for r in active_rooms.values() if matches(r)), offset, offset + limit + 1))
+    has_more = len(page) > limit
+    del page[limit:]
+
+    response = web.StreamResponse(headers={'Content-Type': 'application/json; charset=utf-8'})
+    await response.prepare(request)
+    await response.write(b'{"rooms":[')
+    for i, room in enumerate(page):
+        await response.write((b',' if i else b'') + frames.dumps(room_debug_info(room)))
+    tail = frames.dumps({
+        'offset': offset,
+        'count': len(page),
+        'next_offset': offset + len(page) if has_more else None,
+        'total': len(active_rooms),
+    })
+    await response.write(b'],' + tail[1:])
+    await response.write_eof()
+    return response
+
+async def metrics_handler(request):
+    # Другие воркеры присылают свои серии, заголовки метрик печатаем один раз
+    others = await cluster.fetch_all('/internal/metrics')
+    return web.Response(
+        body=metrics.REGISTRY.render(others).encode('utf-8'),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
+
+async def internal_metrics(request):
+    return web.json_response(metrics.REGISTRY.collect())
+
+async def internal_rooms(request):
+    """Комнаты этого воркера – для /list в других воркерах"""
+    return web.json_response(local_rooms_info())
+
+async def internal_room(request):
+    room_id = request.match_info['room_id']
+    if room_id not in active_rooms:
+        raise web.HTTPNotFound()
+    return web.json_response({'room_id': room_id, 'worker': cluster.WORKER_ID})
+
+async def internal_user_rooms(request):
+    """Комнаты пользователя в этом воркере – для /my и лимита комнат"""
+    try:
+        user_id = int(request.match_info['user_id'])
+    except ValueError:
+        raise web.HTTPBadRequest()
+    return web.json_response(room_ids.rooms_of(user_id))
+
+async def replay_handler(request):
+    """События текущей партии комнаты – для повтора после игры"""
+    room_id = request.match_info['room_id'].upper()
+    if not cluster.is_local(room_id) and not request.path.startswith('/internal/'):
+        data = await cluster.fetch_json(cluster.shard_of(room_id), f'/internal/replay/{room_id}')
+        if data is None:
+            raise web.HTTPNotFound(text='Replay not found')
+        return web.json_response(data, headers={"Access-Control-Allow-Origin": "*"})
+
+    events = await event_log.game_events(room_id)
+    if not events:
+        raise web.HTTPNotFound(text='Replay not found')
+    # Пока партия идёт, раскладка – ключ капитана: цвет отдаём только у открытых карт
+    room = active_rooms.get(room_id)
+    finished = room is not None and room.game_state.status is Status.FINISHED
+    started = events[0].ts
+    result = []
+    colors = b''
+    for event in events:
+        item = {'type': eventlog.KIND_NAMES[event.kind], 't': round(event.ts - started, 3)}
+        if event.kind in (eventlog.CREATE, eventlog.RESET):
+            state = frames.loads(event.payload)['state']
+            colors = bytes.fromhex(state['colors'])
+            item['words'] = state['words']
+            if finished:
+                item['colors'] = [COLOR_NAMES[c] for c in colors]
+        elif event.kind == eventlog.REVEAL:
+            item['index'] = event.payload[0]
+            item['color'] = COLOR_NAMES[colors[item['index']]]
+        elif event.kind == eventlog.HINT:
+            item['word'], item['number'] = eventlog.parse_hint(event.payload)
+        result.append(item)
+    return web.json_response({'room_id': room_id, 'started_at': started, 'events': result},
+                             headers={"Access-Control-Allow-Origin": "*"})
 
 async def cors_handler(request):
     return web.Response(
@@ -417,58 +922,209 @@ async def cors_handler(request):
 
 
 # ==================== ОЧИСТКА ====================
-async def cleanup_old_rooms():
-    while True:
-        await asyncio.sleep(300)
-        to_remove = []
-        for rid, room in active_rooms.items():
-            if not room.is_active():
-                room.cleanup()
-                to_remove.append(rid)
-        for rid in to_remove:
-            del active_rooms[rid]
-        if to_remove:
-            logger.info(f"🧹 Очищено {len(to_remove)} комнат")
+def expire_room(room_id: str):
+    room = active_rooms.pop(room_id, None)
+    room_ids.release(room_id)
+    if room is not None:
+        event_log.append(room_id, eventlog.DELETE)
+        room.cleanup()
+        ROOMS_EXPIRED.inc()
+        logger.info(f"🧹 Комната {room_id} удалена по сроку")
+
+
+def rebuild_room(room_id: str, events: List[eventlog.Event]) -> Optional[GameRoom]:
+    """Комната из журнала: последнее полное состояние плюс события после него"""
+    record = frames.loads(events[0].payload)
+    # Истёкшую комнату не собираем: GameRoom сразу попадает в сводку партий
+    if time.time() - record['created_at'] >= ROOM_TTL_HOURS * 3600:
+        return None
+    room = GameRoom.from_record(record)
+    room.log_events = False
+    try:
+        for event in events[1:]:
+            if event.kind == eventlog.REVEAL:
+                room.reveal_card(event.payload[0])
+            elif event.kind == eventlog.TURN:
+                room.switch_team()
+            elif event.kind == eventlog.HINT:
+                room.set_hint(*eventlog.parse_hint(event.payload))
+    except Exception:
+        room.cleanup()
+        raise
+    room.log_events = True
+    return room
+
+
+async def restore_from_event_log():
+    """После перезапуска поднимает из журнала комнаты, которых нет в хранилище"""
+    started = datetime.now()
+    wanted = [r for r in event_log.rooms() if r not in active_rooms and cluster.is_local(r)]
+    restored = 0
+    for i, (room_id, events) in enumerate((await event_log.restore_events(wanted)).items()):
+        if i % 100 == 99:
+            await asyncio.sleep(0)  # сборка комнат не задерживает уже подключённых
+        if room_id in active_rooms:
+            continue
+        try:
+            room = rebuild_room(room_id, events)
+        except Exception as e:
+            logger.error(f"❌ Комната {room_id} не восстановлена из журнала: {e}")
+            continue
+        if room is None:
+            continue
+        active_rooms[room_id] = room
+        restore_room(room)
+        restored += 1
+    if restored:
+        seconds = (datetime.now() - started).total_seconds()
+        logger.info(f"📼 Из журнала восстановлено комнат: {restored} за {seconds:.2f} с")
+
+
+room_expiry = ExpiryScheduler(
+    expire_room,
+    ttl=ROOM_TTL_HOURS * 3600,
+    idle_ttl=ROOM_IDLE_TTL_MINUTES * 60 if ROOM_IDLE_TTL_MINUTES > 0 else None,
+)
 
 
 # ==================== ЗАПУСК ====================
-application = Application.builder().token(BOT_TOKEN).build()
+# Порт открывается первым: хостинг ждёт его недолго, а клиенты WebSocket
+# переподключаются сразу. Бот (импорт telegram, getMe, вебхук) поднимается
+# в фоне; пока он не готов, апдейты ждут в update_queue
+BOT_RETRY_MAX = 60   # предельная пауза между попытками поднять бота, с
 
-async def main():
-    application.add_handler(CommandHandler("start", start_command))
-    application.add_handler(CommandHandler("new", new_command))
-    application.add_handler(CommandHandler("join", join_command))
-    application.add_handler(CommandHandler("list", list_command))
-    application.add_handler(CommandHandler("help", help_command))
-    application.add_handler(MessageHandler(filters.COMMAND, unknown_command))
-
-    await application.initialize()
-    await application.start()
+application: Optional[Application] = None
+bot_status = 'starting'   # starting → ready; retrying, пока Telegram недоступен
+restore_status = 'pending'   # pending → running → done; failed, если база или журнал не открылись
+
+def build_application() -> Application:
+    from telegram.ext import Application, CommandHandler, MessageHandler, filters
+
+    builder = Application.builder().token(BOT_TOKEN)
+    if TELEGRAM_API_URL:
+        builder = builder.base_url(f"{TELEGRAM_API_URL.rstrip('/')}/bot")
+    bot = builder.build()
+    bot.add_handler(CommandHandler("start", start_command))
+    bot.add_handler(CommandHandler("new", new_command))
+    bot.add_handler(CommandHandler("join", join_command))
+    bot.add_handler(CommandHandler("my", my_command))
+    bot.add_handler(CommandHandler("list", list_command))
+    bot.add_handler(CommandHandler("packs", packs_command))
+    bot.add_handler(CommandHandler("help", help_command))
+    bot.add_handler(MessageHandler(filters.COMMAND, unknown_command))
+    return bot
+
+async def start_bot():
+    """Бот в фоне: getMe и установка вебхука идут одновременно, при ошибке – повтор"""
+    global application, bot_status
+    started = time.perf_counter()
+    # Импорт telegram и httpx – в потоке, цикл событий тем временем обслуживает игроков
+    application = await asyncio.to_thread(build_application)
 
     webhook_url = f"{RENDER_URL}/telegram"
-    await application.bot.set_webhook(webhook_url)
-    logger.info(f"✅ Вебхук: {webhook_url}")
+    delay = 1.0
+    while True:
+        steps = [application.initialize()]
+        # Вебхук один на всех, его ставит нулевой воркер
+        if cluster.WORKER_ID == 0:
+            steps.append(application.bot.set_webhook(webhook_url))
+        errors = [e for e in await asyncio.gather(*steps, return_exceptions=True) if isinstance(e, Exception)]
+        if not errors:
+            break
+        bot_status = 'retrying'
+        logger.error(f"❌ Бот не поднялся: {errors[0]}; повтор через {delay:.0f} с")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, BOT_RETRY_MAX)
 
+    await application.start()
+    outbox.bind(application.bot)
+    asyncio.create_task(outbox.run())
+    update_queue.start()
+    bot_status = 'ready'
+    if cluster.WORKER_ID == 0:
+        logger.info(f"✅ Вебхук: {webhook_url}")
+    logger.info(f"🤖 Бот готов за {time.perf_counter() - started:.2f} с, в очереди апдейтов: {len(update_queue)}")
+
+def create_app(webhook: bool = True) -> web.Application:
+    """HTTP-приложение; без webhook – для нагрузочных тестов без Telegram"""
     server = web.Application()
     server.router.add_get('/', health_check)
     server.router.add_get('/health', health_check)
     server.router.add_get('/debug', debug_rooms)
-    server.router.add_post('/telegram', telegram_webhook)
+    server.router.add_get('/replay/{room_id}', replay_handler)
+    server.router.add_get('/metrics', metrics_handler)
+    if webhook:
+        server.router.add_post('/telegram', telegram_webhook)
     server.router.add_get('/ws', websocket_handler)
     server.router.add_options('/{tail:.*}', cors_handler)
+    return server
+
+def create_internal_app() -> web.Application:
+    """Внутренний канал: сюда другие воркеры пробрасывают WebSocket и запросы бота"""
+    internal = web.Application()
+    internal[INTERNAL] = True
+    internal.router.add_get('/ws', websocket_handler)
+    internal.router.add_get('/internal/rooms', internal_rooms)
+    internal.router.add_get('/internal/rooms/{room_id}', internal_room)
+    internal.router.add_get('/internal/replay/{room_id}', replay_handler)
+    internal.router.add_get('/internal/users/{user_id}/rooms', internal_user_rooms)
+    internal.router.add_get('/internal/metrics', internal_metrics)
+    return internal
 
-    runner = web.AppRunner(server)
+async def restore_rooms():
+    """База, журнал и комнаты из них – уже после открытия порта, диск читается в потоках"""
+    global restore_status
+    restore_status = 'running'
+    try:
+        await active_rooms.open()
+        asyncio.create_task(active_rooms.run())
+        await event_log.open()
+        asyncio.create_task(event_log.run())
+        await restore_from_event_log()
+    except Exception:
+        restore_status = 'failed'
+        logger.exception("❌ Комнаты не восстановлены")
+        return
+    restore_status = 'done'
+
+def start_background_tasks():
+    asyncio.create_task(room_expiry.run())
+    asyncio.create_task(board_pool.run())
+    asyncio.create_task(metrics.monitor_event_loop())
+
+async def main():
+    runner = web.AppRunner(create_app())
     await runner.setup()
     port = int(os.environ.get('PORT', 8080))
-    site = web.TCPSite(runner, '0.0.0.0', port)
+    site = web.TCPSite(runner, '0.0.0.0', port, reuse_port=cluster.WORKERS > 1)
     await site.start()
+    logger.info(f"🚀 Сервер на порту {port}")
 
-    asyncio.create_task(cleanup_old_rooms())
+    if cluster.WORKERS > 1:
+        internal_runner = web.AppRunner(create_internal_app())
+        await internal_runner.setup()
+        await web.UnixSite(internal_runner, cluster.socket_path(cluster.WORKER_ID)).start()
+        logger.info(f"👷 Воркер {cluster.WORKER_ID}/{cluster.WORKERS}")
+
+    start_background_tasks()
+    restore_task = asyncio.create_task(restore_rooms())
+    bot_task = asyncio.create_task(start_bot())
 
-    logger.info(f"🚀 Сервер на порту {port}")
     logger.info(f"🔌 WebSocket: /ws?room=XXX&role=XXX")
+    logger.info(f"🧾 JSON: {frames.backend_name}")
     
-    await asyncio.Future()
+    try:
+        await asyncio.Future()
+    finally:
+        bot_task.cancel()
+        restore_task.cancel()
+        await update_queue.stop()
+        await outbox.flush()
+        await event_log.close()
+        await active_rooms.close()
+        if spymaster is not None:
+            spymaster.close()
+        await cluster.close_sessions()
 
 if __name__ == '__main__':
     try:
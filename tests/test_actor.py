@@ -0,0 +1,46 @@
+"""
+Актор комнаты (game/actor.py): действия по одному в порядке поступления
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.actor import RoomActor
+
+
+def test_actions_run_one_at_a_time_in_order():
+    async def run():
+        actor = RoomActor('AAAAAA')
+        log = []
+
+        async def slow(n):
+            log.append(('start', n))
+            await asyncio.sleep(0.01)
+            log.append(('end', n))
+
+        def failing():
+            raise ValueError('сломалось')
+
+        actor.submit(slow, 1)
+        actor.submit(failing)              # ошибка не останавливает ящик
+        actor.submit(slow, 2)
+        await actor.drain()
+        assert log == [('start', 1), ('end', 1), ('start', 2), ('end', 2)]
+        assert actor.processed == 3 and not actor.busy
+    asyncio.run(run())
+
+
+def test_full_or_closed_mailbox_rejects():
+    async def run():
+        actor = RoomActor('AAAAAA', mailbox_size=1)
+        assert actor.submit(lambda: None)
+        assert not actor.submit(lambda: None)
+        actor.close()
+        assert not actor.submit(lambda: None)
+        assert len(actor) == 0
+    asyncio.run(run())
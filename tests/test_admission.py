@@ -0,0 +1,84 @@
+"""
+Допуск к /ws (websocket/admission.py): лимиты подключений,
+вёдра соединения и комнаты, адрес клиента за прокси
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from aiohttp.test_utils import make_mocked_request
+
+from websocket import admission
+from websocket.admission import Admission, AdmissionRejected, client_ip
+
+
+class Conn:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, frame):
+        self.sent.append(frame)
+
+
+def test_connection_limits():
+    gate = Admission(max_connections=3, max_per_ip=2, max_per_room=2)
+    first = gate.admit('1.1.1.1', 'AAAAAA')
+    gate.admit('1.1.1.1', 'AAAAAA')
+    with pytest.raises(AdmissionRejected) as rejected:
+        gate.admit('1.1.1.1', 'BBBBBB')
+    assert rejected.value.reason == 'ip_connections'
+    with pytest.raises(AdmissionRejected) as rejected:
+        gate.admit('2.2.2.2', 'AAAAAA')
+    assert rejected.value.reason == 'room_full'
+    assert rejected.value.response().status == 503
+
+    gate.release(first)
+    gate.admit('2.2.2.2', 'AAAAAA')
+    gate.admit('3.3.3.3', None)
+    with pytest.raises(AdmissionRejected) as rejected:
+        gate.admit('4.4.4.4', None)
+    assert rejected.value.reason == 'server_full'
+    # Проброшенное другим воркером соединение уже проверено
+    gate.admit(None, None)
+
+
+def test_message_bucket_throttles_and_kicks(monkeypatch):
+    monkeypatch.setattr(admission, 'WS_MESSAGE_BURST', 3)
+    monkeypatch.setattr(admission, 'WS_MESSAGE_RATE', 0.001)
+    gate = Admission(max_strikes=3)
+    ticket, conn = gate.admit('1.1.1.1', 'AAAAAA'), Conn()
+    assert [gate.allow_message(ticket, conn) for _ in range(4)] == [True, True, True, False]
+    assert conn.sent == [admission.THROTTLED]
+    gate.allow_message(ticket, conn)
+    assert not gate.kicked(ticket)
+    gate.allow_message(ticket, conn)
+    assert gate.kicked(ticket)
+    assert conn.sent == [admission.THROTTLED]   # об отказе – один раз на серию
+
+
+def test_costly_actions_spend_the_connection_bucket_first(monkeypatch):
+    monkeypatch.setattr(admission, 'WS_MESSAGE_BURST', 20)
+    monkeypatch.setattr(admission, 'WS_MESSAGE_RATE', 0.001)
+    monkeypatch.setattr(admission, 'WS_ROOM_ACTION_BURST', 60)
+    monkeypatch.setattr(admission, 'WS_ROOM_ACTION_RATE', 0.001)
+    gate = Admission()
+    griefer, player = gate.admit('1.1.1.1', 'AAAAAA'), gate.admit('2.2.2.2', 'AAAAAA')
+    conn = Conn()
+    resets = 0
+    while gate.allow_message(griefer, conn) and gate.allow_action(griefer, 'reset_game', conn):
+        resets += 1
+    assert resets == 2                      # 20 токенов соединения – две цены сброса
+    # Ведро комнаты потратилось только на эти два сброса – другой игрок ходит
+    assert gate.allow_message(player, Conn()) and gate.allow_action(player, 'click_card', Conn())
+
+
+def test_client_ip_ignores_forwarded_for_by_default():
+    request = make_mocked_request('GET', '/ws', headers={'X-Forwarded-For': '6.6.6.6, 10.0.0.1'})
+    assert client_ip(request) == (request.remote or '')   # адрес сокета, не заголовок
+    assert client_ip(request, hops=1) == '10.0.0.1'
+    assert client_ip(request, hops=2) == '6.6.6.6'
@@ -0,0 +1,50 @@
+"""
+Запас раскладок (game/boards.py): раскладки без соседних слов
+и сброс запаса после перезагрузки словаря
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.boards import AffinityIndex, BoardPool, generate_board
+from game.words import WordBank
+
+
+def write_words(path, words):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(words, f, ensure_ascii=False)
+
+
+def test_board_has_no_neighbouring_words(tmp_path):
+    words = [f'w{i}' for i in range(60)]
+    write_words(tmp_path / 'words.json', words)
+    with open(tmp_path / 'words.affinity.json', 'w') as f:
+        json.dump({'neighbors': {f'w{i}': [f'w{i + 30}'] for i in range(30)}}, f)
+
+    bank = WordBank(str(tmp_path / 'words.json'))
+    index = AffinityIndex(str(tmp_path / 'words.affinity.json'))
+    for _ in range(20):
+        board = generate_board(bank, index)
+        assert len(set(board)) == 25
+        assert not any(f'w{i}' in board and f'w{i + 30}' in board for i in range(30))
+
+
+def test_reload_drops_pooled_boards(tmp_path):
+    path = str(tmp_path / 'words.json')
+    write_words(path, [f'old{i}' for i in range(30)])
+    bank = WordBank(path, check_interval=0)
+    pool = BoardPool(size=4)
+    pool.fill(bank, 4)
+    assert len(pool.add(bank)) == 4
+
+    write_words(path, [f'new{i}' for i in range(30)])
+    os.utime(path, (0, 1))                 # mtime точно другой
+    board = pool.take(bank)
+    assert all(word.startswith('new') for word in board)
+    assert not pool.add(bank)
+    assert list(pool.sources) == [id(bank)]
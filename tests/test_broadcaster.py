@@ -0,0 +1,45 @@
+"""
+Дочитывание рассылок комнаты по ?since= (websocket/broadcaster.py)
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from websocket import frames
+from websocket.broadcaster import RoomBroadcaster
+
+
+def seqs(replayed):
+    return [frames.loads(frame.data)['seq'] for frame in replayed]
+
+
+def test_replay_after_since():
+    room = RoomBroadcaster('AAAAAA', history_size=3)
+    for n in range(5):
+        room.broadcast({'type': 'card_revealed', 'index': n})
+    assert seqs(room.replay(3, room.epoch, 'agent')) == [4, 5]
+    assert room.replay(5, room.epoch, 'agent') == []
+    # seq 2 уже вытеснен из журнала – нужен полный снимок
+    assert room.replay(1, room.epoch, 'agent') is None
+
+
+def test_replay_rejects_foreign_epoch_and_future_seq():
+    room = RoomBroadcaster('AAAAAA')
+    room.broadcast({'type': 'turn_changed'})
+    assert room.replay(0, 'другая', 'agent') is None
+    assert room.replay(2, room.epoch, 'agent') is None
+    assert room.replay(-1, room.epoch, 'agent') is None
+
+
+def test_full_state_clears_history():
+    room = RoomBroadcaster('AAAAAA')
+    room.broadcast({'type': 'card_revealed', 'index': 0})
+    room.broadcast_by_role({'agent': {'type': 'game_reset'}, 'captain': {'type': 'game_reset', 'colors': []}})
+    room.broadcast({'type': 'card_revealed', 'index': 1})
+    # Сброс не дочитать из журнала: до него – только полный снимок
+    assert room.replay(1, room.epoch, 'agent') is None
+    assert seqs(room.replay(2, room.epoch, 'captain')) == [3]
@@ -0,0 +1,27 @@
+"""
+Шардирование комнат по воркерам (utils/cluster.py)
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.room_ids import RoomIdAllocator
+from utils.cluster import shard_of
+
+
+def test_shards_are_even():
+    codes = [RoomIdAllocator(max_per_user=0).allocate() for _ in range(4000)]
+    assert all(shard_of(code, 1) == 0 for code in codes)
+    counts = Counter(shard_of(code, 4) for code in codes)
+    assert set(counts) == {0, 1, 2, 3}
+    assert min(counts.values()) > 800      # в среднем по 1000 на воркер
+
+
+def test_allocator_keeps_codes_on_its_shard():
+    allocator = RoomIdAllocator(accept=lambda code: shard_of(code, 3) == 1)
+    assert all(shard_of(allocator.allocate(), 3) == 1 for _ in range(100))
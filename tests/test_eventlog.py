@@ -0,0 +1,131 @@
+"""
+Восстановление журнала событий (game/eventlog.py) после сбоев:
+оборванный хвост, битая crc, снимок плюс события после него
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:test')  # импорт game тянет настройки бота
+
+from game import eventlog
+from game.eventlog import SegmentEventLog, CREATE, SNAPSHOT, REVEAL, TURN, HINT
+
+
+def opened(directory, **kwargs) -> SegmentEventLog:
+    """Журнал с прочитанными сегментами"""
+    log = SegmentEventLog(str(directory), **kwargs)
+    asyncio.run(log.open())
+    return log
+
+
+def write(directory, events, **kwargs) -> SegmentEventLog:
+    """Журнал с событиями, уже сброшенными на диск"""
+    log = opened(directory, **kwargs)
+    for room_id, kind, payload in events:
+        log.append(room_id, kind, payload)
+    asyncio.run(log.flush())
+    return log
+
+
+def segment_path(directory) -> str:
+    names = sorted(n for n in os.listdir(directory) if n.startswith('segment-'))
+    return os.path.join(directory, names[-1])
+
+
+def test_torn_tail_is_truncated(tmp_path):
+    write(tmp_path, [('AAAAAA', CREATE, b'{}'), ('AAAAAA', REVEAL, b'\x03')])
+    path = segment_path(tmp_path)
+    size = os.path.getsize(path)
+    with open(path, 'ab') as f:
+        f.write(eventlog.encode_record(REVEAL, 'AAAAAA', b'\x04')[:-3])  # запись оборвалась
+
+    log = opened(tmp_path)
+    assert os.path.getsize(path) == size
+    assert [e.kind for e in log.replay_events('AAAAAA')] == [CREATE, REVEAL]
+
+
+def test_crc_mismatch_stops_the_scan(tmp_path):
+    write(tmp_path, [('AAAAAA', CREATE, b'{}'), ('AAAAAA', REVEAL, b'\x03'), ('AAAAAA', REVEAL, b'\x04')])
+    path = segment_path(tmp_path)
+    first = len(eventlog.encode_record(CREATE, 'AAAAAA', b'{}'))
+    with open(path, 'r+b') as f:
+        f.seek(first + 8)  # первый байт тела второй записи, после length и crc32
+        byte = f.read(1)
+        f.seek(first + 8)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    log = opened(tmp_path)
+    # Всё после битой записи уже не связать с партией – журнал обрезается по ней
+    assert [e.kind for e in log.replay_events('AAAAAA')] == [CREATE]
+    assert os.path.getsize(path) == first
+
+
+def test_replay_starts_from_latest_snapshot(tmp_path):
+    log = opened(tmp_path, snapshot_every=2)
+    log.append('AAAAAA', CREATE, b'{"n":0}')
+    log.append('AAAAAA', REVEAL, b'\x01')
+    assert log.append('AAAAAA', TURN)          # пора писать снимок
+    log.append('AAAAAA', SNAPSHOT, b'{"n":2}')
+    log.append('AAAAAA', HINT, eventlog.hint_payload('море', 2))
+    asyncio.run(log.flush())
+
+    reopened = opened(tmp_path, snapshot_every=2)
+    events = reopened.replay_events('AAAAAA')
+    assert [e.kind for e in events] == [SNAPSHOT, HINT]
+    assert events[0].payload == b'{"n":2}'
+    assert eventlog.parse_hint(events[1].payload) == ('море', 2)
+    # Повтор партии игрокам – от создания и без служебных снимков
+    game = asyncio.run(reopened.game_events('AAAAAA'))
+    assert [e.kind for e in game] == [CREATE, REVEAL, TURN, HINT]
+
+
+def test_game_events_mix_disk_and_pending(tmp_path):
+    log = write(tmp_path, [('AAAAAA', CREATE, b'{}'), ('AAAAAA', REVEAL, b'\x01')])
+    log.append('AAAAAA', REVEAL, b'\x02')      # ещё не на диске
+
+    events = asyncio.run(log.game_events('AAAAAA'))
+    assert [(e.kind, e.payload) for e in events] == [(CREATE, b'{}'), (REVEAL, b'\x01'), (REVEAL, b'\x02')]
+
+
+def test_events_before_open_wait_for_the_scan(tmp_path):
+    write(tmp_path, [('AAAAAA', CREATE, b'{}')])
+    log = SegmentEventLog(str(tmp_path))
+    log.append('BBBBBB', CREATE, b'{}')        # сегменты ещё не прочитаны
+    asyncio.run(log.open())
+    log.append('BBBBBB', REVEAL, b'\x05')
+    asyncio.run(log.flush())
+
+    reopened = opened(tmp_path)
+    assert sorted(reopened.rooms()) == ['AAAAAA', 'BBBBBB']
+    events = asyncio.run(reopened.restore_events(['AAAAAA', 'BBBBBB', 'CCCCCC']))
+    assert [e.kind for e in events['BBBBBB']] == [CREATE, REVEAL]
+    assert 'CCCCCC' not in events
+
+
+def test_failed_write_does_not_break_waiting_flush(tmp_path, monkeypatch):
+    log = opened(tmp_path)
+    write_file = log._write
+    calls = []
+
+    def failing(chunks):
+        calls.append(len(chunks))
+        if len(calls) == 1:
+            raise OSError('диск отвалился')
+        write_file(chunks)
+    monkeypatch.setattr(log, '_write', failing)
+
+    async def run():
+        log.append('AAAAAA', CREATE, b'{}')
+        owner = asyncio.ensure_future(log.flush())
+        await asyncio.sleep(0)
+        await log.flush()          # ждёт неудачную запись и не падает вместе с ней
+        await owner
+        await log.flush()          # данные вернулись в очередь и дописываются
+    asyncio.run(run())
+
+    assert [e.kind for e in opened(tmp_path).replay_events('AAAAAA')] == [CREATE]
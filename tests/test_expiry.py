@@ -0,0 +1,39 @@
+"""
+Истечение комнат (game/expiry.py): абсолютный срок и срок простоя
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.expiry import ExpiryScheduler
+
+
+def test_absolute_and_idle_deadlines():
+    expiry = ExpiryScheduler(lambda room_id: None, ttl=100, idle_ttl=10)
+    now = time.monotonic()
+    expiry.track('AAAAAA')
+    expiry.track('BBBBBB')
+    expiry.connected('BBBBBB')             # игрок пришёл – простой не считается
+    assert expiry.pop_expired(now + 50) == ['AAAAAA']
+
+    expiry.disconnected('BBBBBB')
+    expiry.connected('BBBBBB')
+    expiry.disconnected('BBBBBB')          # устаревшие записи кучи не срабатывают
+    assert expiry.pop_expired(now + 5) == []
+    assert expiry.pop_expired(time.monotonic() + 11) == ['BBBBBB']
+    assert len(expiry) == 0
+
+
+def test_restored_room_keeps_remaining_ttl_and_forget():
+    expiry = ExpiryScheduler(lambda room_id: None, ttl=100)
+    now = time.monotonic()
+    expiry.track('AAAAAA', ttl=5)
+    expiry.track('BBBBBB')
+    expiry.forget('BBBBBB')
+    assert expiry.pop_expired(now + 6) == ['AAAAAA']
+    assert expiry.pop_expired(now + 200) == []
@@ -0,0 +1,62 @@
+"""
+Очередь апдейтов Telegram (tg_bot/ingest.py): отсев повторов,
+порядок внутри чата, лимиты очереди
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tg_bot.ingest import UpdateQueue, QUEUED, DUPLICATE, FULL, chat_key
+
+
+def test_duplicates_and_limits():
+    async def run():
+        queue = UpdateQueue(lambda payload: asyncio.sleep(0), max_pending=3, lane_size=2, dedup_size=2)
+        assert queue.submit(1, 'a', 1) == QUEUED
+        assert queue.submit(1, 'a', 1) == DUPLICATE
+        assert queue.submit(2, 'a', 2) == QUEUED
+        assert queue.submit(3, 'a', 3) == FULL       # полоса чата полна
+        assert queue.submit(3, 'b', 3) == QUEUED     # отказ не запомнил update_id
+        assert queue.submit(4, 'c', 4) == FULL       # вся очередь полна
+        # Помним только dedup_size последних: 1 уже забыт
+        assert queue.submit(2, 'x', 2) == DUPLICATE
+        assert len(queue) == 3
+    asyncio.run(run())
+
+
+def test_lane_keeps_order_and_chats_run_in_parallel():
+    async def run():
+        done, running = [], set()
+        overlapped = False
+
+        async def process(payload):
+            nonlocal overlapped
+            chat, n = payload
+            assert chat not in running            # полосу держит один воркер
+            running.add(chat)
+            overlapped |= len(running) > 1
+            await asyncio.sleep(0.01)
+            running.discard(chat)
+            done.append(payload)
+
+        queue = UpdateQueue(process, workers=4)
+        queue.start()
+        for n in range(5):
+            for chat in ('a', 'b'):
+                queue.submit(None, chat, (chat, n))
+        await queue.stop()
+        assert [n for chat, n in done if chat == 'a'] == list(range(5))
+        assert [n for chat, n in done if chat == 'b'] == list(range(5))
+        assert overlapped
+    asyncio.run(run())
+
+
+def test_chat_key():
+    assert chat_key({'update_id': 1, 'message': {'chat': {'id': 7}}}) == 7
+    assert chat_key({'update_id': 2, 'callback_query': {'from': {'id': 5}}}) == ('user', 5)
+    assert chat_key({'update_id': 3}) == ('update', 3)
@@ -0,0 +1,78 @@
+"""
+Исходящие бота (tg_bot/outbox.py): склейка правок, приоритеты,
+лимит чата и повтор после 429
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.error import RetryAfter
+
+from tg_bot.outbox import Outbox, HIGH, LOW
+
+
+class Bot:
+    """Записывает вызовы Bot API; fail – сколько первых вызовов ответят 429"""
+
+    def __init__(self, fail: int = 0):
+        self.calls = []
+        self.fail = fail
+
+    async def _call(self, method, chat_id, **kwargs):
+        if self.fail:
+            self.fail -= 1
+            raise RetryAfter(0.05)
+        self.calls.append((method, chat_id, kwargs.get('text')))
+        return len(self.calls)
+
+    async def send_message(self, chat_id, **kwargs):
+        return await self._call('send_message', chat_id, **kwargs)
+
+    async def edit_message_text(self, chat_id, **kwargs):
+        return await self._call('edit_message_text', chat_id, **kwargs)
+
+
+async def drain(outbox: Outbox, *futures):
+    task = asyncio.create_task(outbox.run())
+    try:
+        return await asyncio.wait_for(asyncio.gather(*futures), 5)
+    finally:
+        task.cancel()
+
+
+def test_pending_edits_are_coalesced():
+    async def run():
+        bot = Bot()
+        outbox = Outbox(bot)
+        first = outbox.edit_message_text(1, 10, 'раз')
+        second = outbox.edit_message_text(1, 10, 'два')
+        assert first is second and len(outbox) == 1
+        await drain(outbox, first)
+        assert bot.calls == [('edit_message_text', 1, 'два')]
+    asyncio.run(run())
+
+
+def test_priority_and_chat_rate():
+    async def run():
+        bot = Bot()
+        outbox = Outbox(bot, chat_rate=20, chat_burst=1)
+        futures = [outbox.send_message(1, 'справка', LOW), outbox.send_message(1, 'ссылка', HIGH),
+                   outbox.send_message(2, 'другой чат', LOW)]
+        await drain(outbox, *futures)
+        assert [text for _, chat, text in bot.calls if chat == 1] == ['ссылка', 'справка']
+        assert len(bot.calls) == 3
+    asyncio.run(run())
+
+
+def test_retry_after_is_retried():
+    async def run():
+        bot = Bot(fail=1)
+        outbox = Outbox(bot)
+        result = await drain(outbox, outbox.send_message(1, 'привет'))
+        assert result == [1] and bot.calls == [('send_message', 1, 'привет')]
+    asyncio.run(run())
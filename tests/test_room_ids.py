@@ -0,0 +1,60 @@
+"""
+Коды комнат (game/room_ids.py): без повторов, карантин освобождённых кодов,
+лимит и индекс комнат по создателям
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from game import room_ids
+from game.room_ids import RoomIdAllocator, RoomLimitReached
+
+
+def test_codes_are_valid_and_unique():
+    allocator = RoomIdAllocator(max_per_user=0)
+    codes = [allocator.allocate(creator=1) for _ in range(2000)]
+    assert len(set(codes)) == len(codes)
+    assert all(room_ids.is_valid(code) for code in codes)
+
+
+def test_taken_and_foreign_codes_are_redrawn(monkeypatch):
+    draws = iter([0, 1, 2, 3])
+    monkeypatch.setattr(room_ids.secrets, 'randbelow', lambda n: next(draws))
+    allocator = RoomIdAllocator(is_taken=lambda code: code == room_ids.encode(0),
+                                accept=lambda code: code != room_ids.encode(1))
+    assert allocator.allocate() == room_ids.encode(2)
+
+
+def test_released_code_waits_out_quarantine(monkeypatch):
+    code = room_ids.encode(7)
+    draws = iter([7, 8, 7])
+    monkeypatch.setattr(room_ids.secrets, 'randbelow', lambda n: next(draws))
+    allocator = RoomIdAllocator(quarantine=60)
+    allocator.release(code, now=100)
+    # В карантине код не выпадает – тянется следующий
+    assert allocator.allocate(now=130) == room_ids.encode(8)
+    # После карантина код снова на общих правах
+    assert allocator.allocate(now=170) == code
+
+
+def test_per_user_limit_and_index():
+    allocator = RoomIdAllocator(max_per_user=2)
+    first = allocator.allocate(creator=42)
+    second = allocator.allocate(creator=42)
+    assert allocator.rooms_of(42) == [first, second]
+    assert allocator.creator_of(first) == 42
+    with pytest.raises(RoomLimitReached):
+        allocator.allocate(creator=42)
+    with pytest.raises(RoomLimitReached):
+        RoomIdAllocator(max_per_user=2).allocate(creator=42, elsewhere=2)
+
+    allocator.release(first)
+    assert allocator.rooms_of(42) == [second]
+    assert allocator.creator_of(first) is None
+    allocator.allocate(creator=42)
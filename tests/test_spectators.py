@@ -0,0 +1,64 @@
+"""
+Зрители (websocket/spectators.py): батчи по тикам и отложенный вид,
+который не даёт обойти задержку
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from websocket import frames
+from websocket.spectators import SpectatorStream
+
+
+class Conn:
+    closed = False
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, frame):
+        self.sent.append(frames.loads(frame.data))
+
+    def close(self):
+        self.closed = True
+
+
+def test_events_arrive_in_one_batch_per_tick():
+    async def run():
+        stream = SpectatorStream('AAAAAA', tick=0.02, delay=0)
+        conn = Conn()
+        stream.add(conn)
+        stream.push({'type': 'card_revealed', 'seq': 1})
+        stream.push({'type': 'turn_switch', 'seq': 2})
+        await asyncio.sleep(0.06)
+        stream.close_all()
+        assert conn.sent == [{'type': 'batch', 'messages': [{'type': 'card_revealed', 'seq': 1},
+                                                            {'type': 'turn_switch', 'seq': 2}]}]
+    asyncio.run(run())
+
+
+def test_delayed_view_lags_behind_live_state():
+    state = {'revealed': 0}
+    stream = SpectatorStream('AAAAAA', delay=0.05)
+    stream.watch(lambda: frames.encode(dict(state)).data, seq=0)
+    state['revealed'] = 1
+    stream.push({'type': 'card_revealed', 'seq': 1})
+
+    # Без зрителей вид всё равно ведётся, но только с задержкой
+    snapshot, seq = stream.delayed_view()
+    assert seq == 0 and frames.loads(snapshot) == {'revealed': 0}
+    time.sleep(0.06)
+    snapshot, seq = stream.delayed_view()
+    assert seq == 1 and frames.loads(snapshot) == {'revealed': 1}
+
+
+def test_no_delay_means_live_state():
+    stream = SpectatorStream('AAAAAA', delay=0)
+    stream.watch(lambda: b'{}', seq=0)
+    assert not stream.delayed and stream.delayed_view() is None
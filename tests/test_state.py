@@ -0,0 +1,41 @@
+"""
+Состояние партии (game/state.py): маска открытых карточек,
+сохранение и JSON для клиента
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.state import GameState, Team, Status, DECK
+
+
+def test_new_board_uses_the_whole_deck():
+    state = GameState.new([f'w{i}' for i in range(25)])
+    assert sorted(state.colors) == sorted(DECK)
+
+
+def test_reveal_and_wire_flags():
+    state = GameState.new([f'w{i}' for i in range(25)])
+    assert state.reveal(24) == state.colors[24]
+    state.reveal(3)
+    wire = state.to_wire('AAAAAA')
+    assert wire['revealed'] == tuple(i in (3, 24) for i in range(25))
+    assert state.revealed_count == 2 and state.is_revealed(24) and not state.is_revealed(0)
+    state.reveal(0)                       # маска сменилась – флаги пересобраны
+    assert state.to_wire('AAAAAA')['revealed'][0]
+
+
+def test_record_round_trip():
+    state = GameState.new([f'w{i}' for i in range(25)])
+    state.reveal(5)
+    state.current_team = Team.BLUE
+    state.status = Status.FINISHED
+    state.winner = Team.BLUE
+    state.hint, state.hint_number, state.guesses_left = 'море', 2, 3
+    restored = GameState.from_record(state.to_record())
+    assert restored.to_record() == state.to_record()
+    assert restored.to_wire('AAAAAA') == state.to_wire('AAAAAA')
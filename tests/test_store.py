@@ -0,0 +1,105 @@
+"""
+Хранилище комнат в SQLite (game/store.py): запись пачкой, ленивая загрузка
+после перезапуска, закрытие посреди фоновой записи
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game.store import SQLiteRoomStore, worker_db_path
+
+
+class Room:
+    """Минимум от GameRoom, который нужен хранилищу"""
+
+    def __init__(self, room_id: str, created_at: float = None, score: int = 0):
+        self.room_id = room_id
+        self.created_at = time.time() if created_at is None else created_at
+        self.score = score
+        self.on_change = None
+
+    @classmethod
+    def from_record(cls, record):
+        return cls(record['room_id'], record['created_at'], record['score'])
+
+    def to_record(self):
+        return {'room_id': self.room_id, 'created_at': self.created_at, 'score': self.score}
+
+
+def store(path, **kwargs) -> SQLiteRoomStore:
+    rooms = SQLiteRoomStore(str(path), Room.from_record, **kwargs)
+    asyncio.run(rooms.open())
+    return rooms
+
+
+def test_round_trip_and_lazy_load(tmp_path):
+    path = tmp_path / 'rooms.sqlite3'
+    rooms = store(path)
+    rooms['AAAAAA'] = Room('AAAAAA', score=3)
+    rooms['BBBBBB'] = Room('BBBBBB')
+    room = rooms['AAAAAA']
+    room.score = 5
+    room.on_change(room)                   # изменение после первой записи тоже доедет
+    del rooms['BBBBBB']
+    asyncio.run(rooms.close())
+
+    loaded = []
+    reopened = store(path, on_load=loaded.append)
+    assert len(reopened) == 1 and 'AAAAAA' in reopened and 'BBBBBB' not in reopened
+    assert not reopened.rooms              # в память – только при обращении
+    assert reopened['AAAAAA'].score == 5
+    assert [r.room_id for r in loaded] == ['AAAAAA']
+    asyncio.run(reopened.close())
+
+
+def test_old_rooms_are_dropped_on_open(tmp_path):
+    path = tmp_path / 'rooms.sqlite3'
+    rooms = store(path)
+    rooms['AAAAAA'] = Room('AAAAAA', created_at=time.time() - 7200)
+    rooms['BBBBBB'] = Room('BBBBBB')
+    asyncio.run(rooms.close())
+
+    reopened = store(path, max_age=3600)
+    assert list(reopened) == ['BBBBBB']
+    asyncio.run(reopened.close())
+
+
+def test_close_waits_for_background_flush(tmp_path):
+    path = tmp_path / 'rooms.sqlite3'
+    rooms = store(path)
+    started, release = threading.Event(), threading.Event()
+    write = rooms._write
+
+    def slow(records, deleted):
+        started.set()
+        release.wait(5)
+        write(records, deleted)
+    rooms._write = slow
+
+    async def run():
+        rooms['AAAAAA'] = Room('AAAAAA')
+        task = asyncio.ensure_future(rooms.flush())
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()                      # как run() при остановке
+        rooms['BBBBBB'] = Room('BBBBBB')
+        closing = asyncio.ensure_future(rooms.close())
+        await asyncio.sleep(0.05)
+        assert not closing.done()          # база не закрыта под идущей записью
+        release.set()
+        await closing
+    asyncio.run(run())
+
+    reopened = store(path)
+    assert sorted(reopened) == ['AAAAAA', 'BBBBBB']
+    asyncio.run(reopened.close())
+
+
+def test_worker_db_path():
+    assert worker_db_path('data/rooms.sqlite3', 2) == 'data/rooms.worker-2.sqlite3'
@@ -0,0 +1,54 @@
+"""
+Ход команды в main.py: подсказка даёт number + 1 попыток,
+последняя попытка передаёт ход
+
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:test')  # импорт main тянет настройки бота
+
+import main
+
+
+class Conn:
+    def __init__(self, role: str):
+        self.role = role
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+
+
+def own_cards(room):
+    state = room.game_state
+    return [i for i, color in enumerate(state.colors) if color == state.current_team.color]
+
+
+def test_last_guess_ends_the_turn():
+    room = main.GameRoom('AAAAAA')
+    captain = Conn('captain')
+    team = room.game_state.current_team
+    main.set_hint(room, captain, {'word': 'море', 'number': 1})
+    assert room.game_state.guesses_left == 2
+
+    first, second = own_cards(room)[:2]
+    main.click_card(room, Conn('agent'), {'index': first})
+    assert room.game_state.current_team is team
+    main.click_card(room, Conn('agent'), {'index': second})
+    assert room.game_state.current_team is team.other
+    assert room.game_state.hint is None
+    room.cleanup()
+
+
+def test_hint_number_must_be_a_real_int():
+    room = main.GameRoom('AAAAAA')
+    captain = Conn('captain')
+    main.set_hint(room, captain, {'word': 'море', 'number': True})
+    main.set_hint(room, Conn('agent'), {'word': 'море', 'number': 1})
+    assert room.game_state.hint is None
+    assert [m['message'] for m in captain.sent] == ['Invalid hint']
+    room.cleanup()
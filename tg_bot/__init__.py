@@ -1,2 +1,15 @@
-from .commands import *
-from .callbacks import *
\ No newline at end of file
+# Команды и колбэки тянут за собой telegram (~0.2 с импорта), поэтому
+# загружаются при первом обращении: tg_bot.ingest и tg_bot.outbox нужны серверу
+# ещё до того, как поднят бот
+_LAZY = {
+    'start_command': 'commands', 'new_command': 'commands', 'join_command': 'commands',
+    'list_command': 'commands', 'packs_command': 'commands', 'help_command': 'commands',
+    'unknown_command': 'commands', 'role_callback': 'callbacks', 'join_callback': 'callbacks',
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError(f"module 'tg_bot' has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(f'.{_LAZY[name]}', __name__), name)
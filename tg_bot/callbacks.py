@@ -6,12 +6,10 @@ from telegram.ext import ContextTypes
 
 from game.room import active_rooms
 from utils.links import make_game_link
+from tg_bot.outbox import edit, HIGH, NORMAL
 
 logger = logging.getLogger(__name__)
 
-# Глобальное хранилище (будет в main.py)
-active_rooms = {}
-
 async def role_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -19,7 +17,7 @@ async def role_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     _, role, room_id = query.data.split('_')
 
     if room_id not in active_rooms:
-        await query.edit_message_text("❌ Комната устарела")
+        edit(query, "❌ Комната устарела", priority=NORMAL)
         return
 
     room = active_rooms[room_id]
@@ -27,23 +25,27 @@ async def role_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if role == 'captain':
         team = 'red' if room.captains['red'] is None else 'blue'
         if room.captains[team] is not None:
-            await query.edit_message_text(f"❌ Капитан {team} уже занят")
+            edit(query, f"❌ Капитан {team} уже занят", priority=NORMAL)
             return
         room.add_player(user.id, user.username or user.first_name, role='captain')
         room.set_captain(team, user.id)
         link = make_game_link(room_id, user.id)
-        await query.edit_message_text(
+        edit(
+            query,
             f"✅ **{user.first_name}, вы капитан {team.upper()}!**\n\n"
             f"🎮 **Ваша ссылка:**\n{link}",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            priority=HIGH
         )
     else:  # agent
         room.add_player(user.id, user.username or user.first_name, role='agent')
         link = make_game_link(room_id, user.id)
-        await query.edit_message_text(
+        edit(
+            query,
             f"✅ **{user.first_name}, вы агент команды {room.players[user.id]['team']}**\n\n"
             f"🎮 **Ваша ссылка:**\n{link}",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            priority=HIGH
         )
 
 
@@ -56,7 +58,7 @@ async def join_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     room_id = parts[-1]
 
     if room_id not in active_rooms:
-        await query.edit_message_text("❌ Комната не найдена")
+        edit(query, "❌ Комната не найдена", priority=NORMAL)
         return
 
     room = active_rooms[room_id]
@@ -64,7 +66,7 @@ async def join_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if role_type == 'captain':
         team = parts[2]
         if room.captains[team] is not None:
-            await query.edit_message_text(f"❌ Капитан {team} уже есть")
+            edit(query, f"❌ Капитан {team} уже есть", priority=NORMAL)
             return
         # обновляем роль у уже добавленного игрока
         if user.id in room.players:
@@ -74,18 +76,20 @@ async def join_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             room.add_player(user.id, user.username or user.first_name, role='captain')
         room.set_captain(team, user.id)
         link = make_game_link(room_id, user.id)
-        await query.edit_message_text(
+        edit(
+            query,
             f"✅ **{user.first_name}, вы капитан {team.upper()}!**\n\n"
             f"🎮 **Ссылка:**\n{link}",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            priority=HIGH
         )
     else:  # agent
         # уже добавлен в join_command, просто даём ссылку
         link = make_game_link(room_id, user.id)
-        await query.edit_message_text(
+        edit(
+            query,
             f"✅ **{user.first_name}, вы агент команды {room.players[user.id]['team']}**\n\n"
             f"🎮 **Ссылка:**\n{link}",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            priority=HIGH
         )
-    
-    await query.edit_message_text(response, parse_mode='Markdown')
\ No newline at end of file
@@ -1,20 +1,17 @@
 """Обработчики команд Telegram бота"""
-import uuid
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from game.room import active_rooms, GameRoom
+from game.room import active_rooms, room_ids, GameRoom
+from game.room_ids import RoomLimitReached
+from game.packs import pack_registry, get_word_source
 from utils.links import make_game_link
 from utils.config import FRONTEND_URL
+from tg_bot.outbox import reply, HIGH, NORMAL, LOW
 
 logger = logging.getLogger(__name__)
 
-
-
-# Глобальное хранилище (будет в main.py)
-active_rooms = {}
-
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Обработчик команды /start"""
     user = update.effective_user
@@ -31,21 +28,31 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 4. Начните игру по ссылке!
 
 🛠 **Доступные команды:**
-`/new` - Создать новую комнату
+`/new [язык]` - Создать новую комнату
 `/join [код]` - Присоединиться к комнате
 `/list` - Список активных комнат
+`/packs` - Наборы слов
 `/help` - Справка по командам
 
 🔗 **Фронтенд:** {FRONTEND_URL}
 💡 **Капитаны видят все цвета сразу в игре!**
 """
     
-    await update.message.reply_text(welcome_text, parse_mode='Markdown')
+    reply(update, welcome_text, parse_mode='Markdown', priority=LOW)
 
 async def new_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
-    room_id = str(uuid.uuid4())[:6].upper()
-    room = GameRoom(room_id)
+    words = get_word_source(context.args or ())
+    if words is None:
+        reply(update, "❌ Набор слов не найден. Список: `/packs`", parse_mode='Markdown', priority=NORMAL)
+        return
+
+    try:
+        room_id = room_ids.allocate(user.id)
+    except RoomLimitReached:
+        reply(update, f"❌ Достигнут лимит комнат ({room_ids.max_per_user})", parse_mode='Markdown', priority=NORMAL)
+        return
+    room = GameRoom(room_id, words)
     active_rooms[room_id] = room
 
     keyboard = [
@@ -53,7 +60,8 @@ async def new_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
          InlineKeyboardButton("🔎 Агент", callback_data=f"role_agent_{room_id}")]
     ]
 
-    await update.message.reply_text(
+    reply(
+        update,
         f"🎮 **НОВАЯ КОМНАТА**\n\n"
         f"**Код:** `{room_id}`\n\n"
         f"Выберите роль:\n"
@@ -61,18 +69,19 @@ async def new_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"• 🔎 Агент – угадывает вслепую\n\n"
         f"📌 После выбора вы получите личную ссылку.",
         reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
+        parse_mode='Markdown',
+        priority=HIGH
     )
 
 async def join_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
     if not context.args:
-        await update.message.reply_text("Укажите код: `/join ABC123`", parse_mode='Markdown')
+        reply(update, "Укажите код: `/join ABC123`", parse_mode='Markdown', priority=NORMAL)
         return
 
     room_id = context.args[0].upper()
     if room_id not in active_rooms:
-        await update.message.reply_text(f"❌ Комната `{room_id}` не найдена", parse_mode='Markdown')
+        reply(update, f"❌ Комната `{room_id}` не найдена", parse_mode='Markdown', priority=NORMAL)
         return
 
     room = active_rooms[room_id]
@@ -80,10 +89,12 @@ async def join_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Если уже в комнате → сразу ссылка
     if user.id in room.players:
         link = make_game_link(room_id, user.id)
-        await update.message.reply_text(
+        reply(
+            update,
             f"✅ Вы уже в комнате `{room_id}`\n\n"
             f"🎮 **Ваша ссылка:**\n{link}",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            priority=HIGH
         )
         return
 
@@ -101,12 +112,14 @@ async def join_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         keyboard.append(captain_buttons)
     keyboard.append([InlineKeyboardButton("🔎 Остаться агентом", callback_data=f"join_agent_{room_id}")])
 
-    await update.message.reply_text(
+    reply(
+        update,
         f"✅ **{user.first_name}, вы в комнате `{room_id}`**\n\n"
         f"Ваша команда: {room.players[user.id]['team']}\n"
         f"Выберите роль или оставайтесь агентом:",
         reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
+        parse_mode='Markdown',
+        priority=HIGH
     )
 
 async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -114,10 +127,12 @@ async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     from datetime import datetime
     
     if not active_rooms:
-        await update.message.reply_text(
+        reply(
+            update,
             "📭 **Нет активных комнат**\n\n"
             "Создайте первую комнату: `/new`",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            priority=LOW
         )
         return
     
@@ -131,27 +146,50 @@ async def list_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             )
     
     if active_list:
-        await update.message.reply_text(
+        reply(
+            update,
             "📋 **АКТИВНЫЕ КОМНАТЫ:**\n\n" + "\n".join(active_list) +
             f"\n\n💡 Присоединиться: `/join [код]`",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            priority=LOW
         )
     else:
-        await update.message.reply_text(
+        reply(
+            update,
             "📭 **Нет активных комнат**\n\n"
             "Создайте первую комнату: `/new`",
-            parse_mode='Markdown'
+            parse_mode='Markdown',
+            priority=LOW
         )
 
+async def packs_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Список наборов слов"""
+    if not pack_registry.packs:
+        reply(update, "📭 **Наборы слов не установлены**", parse_mode='Markdown', priority=LOW)
+        return
+
+    lines = [
+        f"• `{pack.id}` - {pack.title} ({pack.language}, {pack.theme}, {pack.difficulty})"
+        for pack in pack_registry.packs.values()
+    ]
+    reply(
+        update,
+        "📚 **НАБОРЫ СЛОВ:**\n\n" + "\n".join(lines) +
+        "\n\n💡 Например: `/new en` или `/new ru-base`",
+        parse_mode='Markdown',
+        priority=LOW
+    )
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Справка по командам"""
     help_text = """
 🛠 **КОМАНДЫ БОТА:**
 
 `/start` - Начало работы
-`/new` - Создать новую комнату
+`/new [язык]` - Создать новую комнату
 `/join [код]` - Присоединиться к комнате
 `/list` - Список активных комнат
+`/packs` - Наборы слов
 `/help` - Эта справка
 
 🎮 **КАК ИГРАТЬ:**
@@ -170,11 +208,12 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 • Удерживайте карточку 1.5 секунды для выбора
 """
     
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    reply(update, help_text, parse_mode='Markdown', priority=LOW)
 
 async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик неизвестных команд"""
-    await update.message.reply_text(
+    reply(
+        update,
         "❓ Неизвестная команда.\n\n"
         "Доступные команды:\n"
         "`/start` - Начало работы\n"
@@ -182,5 +221,6 @@ async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "`/join [код]` - Присоединиться\n"
         "`/list` - Список комнат\n"
         "`/help` - Справка",
-        parse_mode='Markdown'
+        parse_mode='Markdown',
+        priority=LOW
     )
\ No newline at end of file
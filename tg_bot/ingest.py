@@ -0,0 +1,138 @@
+"""
+Приём апдейтов Telegram через очередь
+Вебхук только кладёт апдейт в очередь и сразу отвечает, обработку ведут
+несколько воркеров. Апдейты одного чата обрабатываются строго по очереди
+(у чата своя полоса, и её держит не больше одного воркера), разные чаты –
+параллельно. Повторы от Telegram отсекаются по update_id
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from utils.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+UPDATE_WORKERS = int(os.environ.get('TG_UPDATE_WORKERS', 8))
+# Сколько апдейтов всего и одного чата может ждать обработки
+UPDATE_QUEUE_SIZE = int(os.environ.get('TG_UPDATE_QUEUE_SIZE', 1000))
+CHAT_QUEUE_SIZE = int(os.environ.get('TG_CHAT_QUEUE_SIZE', 20))
+# Сколько последних update_id помнить для отсева повторов
+DEDUP_SIZE = int(os.environ.get('TG_UPDATE_DEDUP_SIZE', 2048))
+
+QUEUED, DUPLICATE, FULL = 'queued', 'duplicate', 'full'
+
+UPDATES = Counter('codenames_updates', 'Апдейты Telegram, пришедшие в вебхук', ['result'])
+UPDATES_PENDING = Gauge('codenames_updates_pending', 'Апдейты, ждущие обработки')
+UPDATE_WAIT = Histogram('codenames_update_wait_seconds', 'Ожидание апдейта в очереди')
+UPDATE_SECONDS = Histogram('codenames_update_seconds', 'Обработка апдейта ботом')
+
+_pending = UPDATES_PENDING.labels()
+
+
+def chat_key(data: Dict) -> Hashable:
+    """Полоса апдейта: чат, иначе пользователь, иначе сам апдейт (без порядка)"""
+    for field in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        if field in data:
+            return data[field].get('chat', {}).get('id')
+    callback = data.get('callback_query')
+    if callback is not None:
+        chat = callback.get('message', {}).get('chat', {}).get('id')
+        if chat is not None:
+            return chat
+        return ('user', callback.get('from', {}).get('id'))
+    for value in data.values():
+        if isinstance(value, dict) and 'from' in value:
+            return ('user', value['from'].get('id'))
+    return ('update', data.get('update_id'))
+
+
+class UpdateQueue:
+    """Ограниченная очередь апдейтов с полосами по чатам и пулом воркеров"""
+
+    def __init__(self, process: Callable[[Any], Awaitable],
+                 workers: int = UPDATE_WORKERS,
+                 max_pending: int = UPDATE_QUEUE_SIZE,
+                 lane_size: int = CHAT_QUEUE_SIZE,
+                 dedup_size: int = DEDUP_SIZE):
+        self.process = process
+        self.workers = workers
+        self.max_pending = max_pending
+        self.lane_size = lane_size
+        self.dedup_size = dedup_size
+        self.pending = 0
+        self.lanes: Dict[Hashable, Deque[Tuple[float, Any]]] = {}
+        self._ready: asyncio.Queue = asyncio.Queue()  # полосы, которые ждут воркера
+        self._seen: 'OrderedDict[int, None]' = OrderedDict()
+        self._tasks: List[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return self.pending
+
+    def _remember(self, update_id: int):
+        self._seen[update_id] = None
+        if len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+
+    def submit(self, update_id: Optional[int], key: Hashable, payload: Any) -> str:
+        """
+        QUEUED – принят, DUPLICATE – уже был, FULL – очередь полна
+        (на FULL вебхук отвечает ошибкой, и Telegram повторит апдейт позже)
+        """
+        if update_id is not None and update_id in self._seen:
+            self._seen.move_to_end(update_id)
+            UPDATES.labels(DUPLICATE).inc()
+            return DUPLICATE
+
+        lane = self.lanes.get(key)
+        if self.pending >= self.max_pending or (lane is not None and len(lane) >= self.lane_size):
+            UPDATES.labels(FULL).inc()
+            return FULL
+
+        if update_id is not None:
+            self._remember(update_id)
+        if lane is None:
+            lane = self.lanes[key] = deque()
+            self._ready.put_nowait(key)
+        lane.append((time.perf_counter(), payload))
+        self.pending += 1
+        _pending.inc()
+        UPDATES.labels(QUEUED).inc()
+        return QUEUED
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            lane = self.lanes[key]
+            queued_at, payload = lane.popleft()
+            UPDATE_WAIT.observe(time.perf_counter() - queued_at)
+            try:
+                with UPDATE_SECONDS.time():
+                    await self.process(payload)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки апдейта: {e}")
+            finally:
+                self.pending -= 1
+                _pending.dec()
+            # Полоса уходит в конец очереди – один чат не занимает воркер надолго
+            if lane:
+                self._ready.put_nowait(key)
+            else:
+                del self.lanes[key]
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"📥 Очередь апдейтов: {self.workers} воркеров, до {self.max_pending} в очереди")
+
+    async def stop(self, timeout: float = 5.0):
+        """Даёт дообработать очередь, затем останавливает воркеры"""
+        deadline = time.monotonic() + timeout
+        while self.pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
@@ -0,0 +1,269 @@
+"""
+Исходящие сообщения бота через планировщик
+Telegram ограничивает частоту: около 30 сообщений в секунду на бота, 1 в секунду
+в личный чат и 20 в минуту в группу. Сообщения ждут в полосах по приоритету
+(ссылки на игру раньше справки) и уходят, когда это позволяют ведро чата и общее
+ведро. В один чат одновременно отправляется не больше одного сообщения, поэтому
+порядок внутри чата и приоритета сохраняется. Правки одного сообщения, которые
+ещё не ушли, склеиваются в одну. На 429 чат замолкает на retry_after, на сетевые
+ошибки – повтор с растущей паузой
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import timedelta
+from typing import Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+from utils.cluster import WORKERS
+from utils.metrics import Counter, Gauge
+from utils.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+HIGH, NORMAL, LOW = range(3)   # ссылки на игру, ответы на действия, справка и списки
+
+# Лимит на бота целиком; при WORKERS > 1 отвечает каждый воркер, поэтому делим поровну
+GLOBAL_RATE = float(os.environ.get('TG_GLOBAL_RATE', 25)) / WORKERS
+GLOBAL_BURST = max(1.0, float(os.environ.get('TG_GLOBAL_BURST', 30)) / WORKERS)
+CHAT_RATE = float(os.environ.get('TG_CHAT_RATE', 1))
+CHAT_BURST = float(os.environ.get('TG_CHAT_BURST', 3))
+GROUP_RATE = float(os.environ.get('TG_GROUP_RATE', 20 / 60))
+SEND_CONCURRENCY = int(os.environ.get('TG_SEND_CONCURRENCY', 8))
+OUTBOX_SIZE = int(os.environ.get('TG_OUTBOX_SIZE', 5000))
+MAX_RETRIES = int(os.environ.get('TG_SEND_RETRIES', 5))
+RETRY_BACKOFF = 0.5
+MAX_CHAT_BUCKETS = 10000
+
+OUTBOX_PENDING = Gauge('codenames_outbox_pending', 'Сообщения бота, ждущие отправки')
+OUTBOX_SENT = Counter('codenames_outbox_sent', 'Отправленные запросы к Bot API', ['method'])
+OUTBOX_RETRIES = Counter('codenames_outbox_retries', 'Повторы отправки', ['reason'])
+OUTBOX_COALESCED = Counter('codenames_outbox_coalesced', 'Правки, склеенные с ещё не отправленной')
+OUTBOX_FAILED = Counter('codenames_outbox_failed', 'Сообщения, которые не удалось отправить')
+
+_pending = OUTBOX_PENDING.labels()
+
+
+class OutboxFull(Exception):
+    """Очередь исходящих переполнена"""
+
+
+class _Job:
+    __slots__ = ('method', 'chat_id', 'kwargs', 'priority', 'future', 'attempts', 'not_before', 'edit_key')
+
+    def __init__(self, method: str, chat_id: int, kwargs: Dict, priority: int,
+                 edit_key: Optional[Tuple[int, int]] = None):
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.attempts = 0
+        self.not_before = 0.0
+        self.edit_key = edit_key
+
+
+class Outbox:
+    """Планировщик исходящих с вёдрами токенов и полосами приоритетов"""
+
+    def __init__(self, bot=None, global_rate: float = GLOBAL_RATE, global_burst: float = GLOBAL_BURST,
+                 chat_rate: float = CHAT_RATE, chat_burst: float = CHAT_BURST,
+                 group_rate: float = GROUP_RATE, concurrency: int = SEND_CONCURRENCY,
+                 max_pending: int = OUTBOX_SIZE, max_retries: int = MAX_RETRIES):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.lanes: List[Deque[_Job]] = [deque() for _ in (HIGH, NORMAL, LOW)]
+        self.edits: Dict[Tuple[int, int], _Job] = {}
+        self.chats: Dict[Hashable, TokenBucket] = {}
+        self.inflight: Set[int] = set()
+        self._sending: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+
+    def bind(self, bot):
+        self.bot = bot
+
+    def __len__(self) -> int:
+        return sum(len(lane) for lane in self.lanes)
+
+    # ==================== ПОСТАНОВКА ====================
+
+    def _enqueue(self, job: _Job, front: bool = False) -> asyncio.Future:
+        if front:
+            self.lanes[job.priority].appendleft(job)
+        else:
+            self.lanes[job.priority].append(job)
+        _pending.inc()
+        self._wakeup.set()
+        return job.future
+
+    def _check_capacity(self):
+        if len(self) >= self.max_pending:
+            raise OutboxFull(f"в очереди уже {len(self)} сообщений")
+
+    def send_message(self, chat_id: int, text: str, priority: int = NORMAL, **kwargs) -> asyncio.Future:
+        """Ставит sendMessage в очередь; future получит Message или ошибку"""
+        self._check_capacity()
+        return self._enqueue(_Job('send_message', chat_id, dict(kwargs, text=text), priority))
+
+    def edit_message_text(self, chat_id: int, message_id: int, text: str,
+                          priority: int = NORMAL, **kwargs) -> asyncio.Future:
+        """Правка сообщения: если прежняя правка ещё не ушла, её заменит эта"""
+        key = (chat_id, message_id)
+        job = self.edits.get(key)
+        if job is not None:
+            job.kwargs = dict(kwargs, message_id=message_id, text=text)
+            OUTBOX_COALESCED.inc()
+            return job.future
+        self._check_capacity()
+        job = _Job('edit_message_text', chat_id, dict(kwargs, message_id=message_id, text=text),
+                   priority, edit_key=key)
+        self.edits[key] = job
+        return self._enqueue(job)
+
+    # ==================== ПЛАНИРОВАНИЕ ====================
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            if len(self.chats) >= MAX_CHAT_BUCKETS:
+                now = time.monotonic()
+                for key in [k for k, b in self.chats.items() if b.idle(now)]:
+                    del self.chats[key]
+            # У групп и каналов id отрицательный, и лимит у них строже
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            bucket = self.chats[chat_id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    def _dispatch(self, now: float) -> Optional[float]:
+        """Запускает всё, что можно отправить сейчас; возвращает, через сколько смотреть снова"""
+        wait = None
+        skipped: Set[int] = set()  # у чата уже есть сообщение раньше по очереди
+        for lane in self.lanes:
+            for job in list(lane):
+                if len(self._sending) >= self.concurrency:
+                    return wait  # разбудит завершение отправки
+                chat = job.chat_id
+                if chat in skipped or chat in self.inflight:
+                    skipped.add(chat)
+                    continue
+                bucket = self._bucket(chat)
+                delay = max(job.not_before - now, bucket.delay(now))
+                if delay > 0:
+                    skipped.add(chat)
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                global_delay = self.global_bucket.delay(now)
+                if global_delay > 0:
+                    return global_delay if wait is None else min(wait, global_delay)
+                bucket.try_take(now)
+                self.global_bucket.try_take(now)
+                lane.remove(job)
+                _pending.dec()
+                skipped.add(chat)
+                self._start(job)
+        return wait
+
+    def _start(self, job: _Job):
+        if job.edit_key is not None and self.edits.get(job.edit_key) is job:
+            del self.edits[job.edit_key]  # следующая правка станет новым запросом
+        self.inflight.add(job.chat_id)
+        task = asyncio.create_task(self._send(job))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, job: _Job):
+        # telegram к этому времени уже загружен ботом; на уровне модуля не импортируем,
+        # чтобы не тянуть его при старте сервера
+        from telegram.error import NetworkError, RetryAfter
+        try:
+            result = await getattr(self.bot, job.method)(chat_id=job.chat_id, **job.kwargs)
+        except RetryAfter as e:
+            delay = e.retry_after
+            if isinstance(delay, timedelta):
+                delay = delay.total_seconds()
+            self._bucket(job.chat_id).block(float(delay))
+            OUTBOX_RETRIES.labels('retry_after').inc()
+            logger.warning(f"🐢 Telegram просит подождать {delay} с (чат {job.chat_id})")
+            self._retry(job, e)
+        except NetworkError as e:
+            job.not_before = time.monotonic() + RETRY_BACKOFF * 2 ** job.attempts
+            OUTBOX_RETRIES.labels('network').inc()
+            self._retry(job, e)
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            OUTBOX_SENT.labels(job.method).inc()
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self.inflight.discard(job.chat_id)
+            self._wakeup.set()
+
+    def _retry(self, job: _Job, error: Exception):
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self._fail(job, error)
+            return
+        if job.edit_key is not None:
+            newer = self.edits.get(job.edit_key)
+            if newer is not None:
+                # Пока ждали, пришла правка новее – она и уйдёт, результат общий
+                newer.future.add_done_callback(lambda f: _copy_result(f, job.future))
+                return
+            self.edits[job.edit_key] = job
+        self._enqueue(job, front=True)
+
+    def _fail(self, job: _Job, error: Exception):
+        OUTBOX_FAILED.inc()
+        logger.error(f"❌ Не удалось выполнить {job.method} в чат {job.chat_id}: {error}")
+        if not job.future.done():
+            job.future.set_exception(error)
+            job.future.exception()  # ошибка уже в логе – не ругаться на непрочитанную
+
+    async def run(self):
+        while True:
+            wait = self._dispatch(time.monotonic())
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def flush(self, timeout: float = 5.0):
+        """Ждёт, пока очередь опустеет (при остановке)"""
+        deadline = time.monotonic() + timeout
+        while (len(self) or self._sending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+
+def _copy_result(source: asyncio.Future, target: asyncio.Future):
+    if target.done():
+        return
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+        target.exception()
+    else:
+        target.set_result(source.result())
+
+
+# Общий планировщик процесса; бота к нему привязывают при запуске
+outbox = Outbox()
+
+
+def reply(update, text: str, priority: int = NORMAL, **kwargs) -> asyncio.Future:
+    """Ответ в чат апдейта через планировщик (ждать future не обязательно)"""
+    return outbox.send_message(update.effective_chat.id, text, priority, **kwargs)
+
+
+def edit(query, text: str, priority: int = NORMAL, **kwargs) -> asyncio.Future:
+    """Правка сообщения с кнопкой, на которую нажали"""
+    message = query.message
+    return outbox.edit_message_text(message.chat_id, message.message_id, text, priority, **kwargs)
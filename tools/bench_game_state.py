@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк состояния партии: прежний dict со списками против GameState
+Меряет память на комнату и стоимость get_public_state
+
+    python tools/bench_game_state.py --rooms 20000
+"""
+
+import os
+import sys
+import random
+import argparse
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:bench')  # импорт game тянет настройки бота
+
+from game.state import GameState
+
+WORDS = [f"слово{i}" for i in range(400)]
+
+
+def legacy_state() -> dict:
+    """Состояние в прежнем виде – как его строил _create_game_state"""
+    colors = (['red'] * 9) + (['blue'] * 8) + ['black'] + (['neutral'] * 7)
+    random.shuffle(colors)
+    return {
+        'words': random.sample(WORDS, 25),
+        'colors': colors,
+        'revealed': [False] * 25,
+        'current_team': 'red',
+        'current_turn': 1,
+        'red_score': 9,
+        'blue_score': 8,
+        'game_status': 'waiting',
+        'winner': None,
+        'last_action': None,
+        'hint': None,
+        'hint_number': None,
+        'guesses_left': 0,
+    }
+
+
+def legacy_public(state: dict) -> dict:
+    return {
+        'room_id': 'ABC123',
+        'words': state['words'],
+        'revealed': state['revealed'],
+        'current_team': state['current_team'],
+        'current_turn': state['current_turn'],
+        'red_score': state['red_score'],
+        'blue_score': state['blue_score'],
+        'game_status': state['game_status'],
+        'winner': state['winner'],
+    }
+
+
+def slotted_state() -> GameState:
+    return GameState.new(random.sample(WORDS, 25))
+
+
+def slotted_public(state: GameState) -> dict:
+    return state.to_wire('ABC123')
+
+
+def measure_memory(factory, rooms: int) -> float:
+    """Байт на комнату (слова общие – считаем только само состояние)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    states = [factory() for _ in range(rooms)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del states
+    return total / rooms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=20000, help='сколько состояний держать в памяти')
+    parser.add_argument('--calls', type=int, default=200000, help='сколько раз вызывать get_public_state')
+    args = parser.parse_args()
+
+    print(f"{'':12}{'байт/комната':>16}{'public, мкс':>16}")
+    for name, factory, public in (
+        ('dict', legacy_state, legacy_public),
+        ('GameState', slotted_state, slotted_public),
+    ):
+        per_room = measure_memory(factory, args.rooms)
+        state = factory()
+        seconds = timeit.timeit(lambda: public(state), number=args.calls)
+        print(f"{name:12}{per_room:16.0f}{seconds / args.calls * 1e6:16.2f}")
+
+
+if __name__ == '__main__':
+    main()
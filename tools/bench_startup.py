@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Холодный старт сервера: через сколько после запуска процесса
+  • порт принимает TCP-соединения,
+  • /ws принимает WebSocket (101, даже если комнаты нет),
+  • /health отвечает,
+  • бот готов (поле bot в /health)
+Бот ходит в поддельный Bot API (tools/fake_bot_api.py) с задержкой --latency,
+как до настоящего Telegram
+
+    python tools/bench_startup.py --runs 5
+    python tools/bench_startup.py --main /tmp/old/main.py --latency 0.5 --json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+from typing import Dict, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from aiohttp import ClientSession, ClientError, WSServerHandshakeError
+
+from fake_bot_api import FakeBotApi, start as start_fake_api  # соседний скрипт в tools
+
+POLL = 0.005
+
+
+async def measure(args, api_port: int) -> Dict[str, Optional[float]]:
+    env = dict(os.environ, BOT_TOKEN='0:bench', PORT=str(args.port), WORKERS='1',
+               TELEGRAM_API_URL=f'http://127.0.0.1:{api_port}', RENDER_URL=f'http://127.0.0.1:{args.port}')
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, args.main], env=env, cwd=os.path.dirname(args.main),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    marks: Dict[str, Optional[float]] = {'listen': None, 'websocket': None, 'health': None, 'bot_ready': None}
+    deadline = started + args.timeout
+    try:
+        async with ClientSession() as session:
+            while time.perf_counter() < deadline and marks['bot_ready'] is None:
+                now = time.perf_counter() - started
+                if marks['listen'] is None:
+                    try:
+                        _, writer = await asyncio.open_connection('127.0.0.1', args.port)
+                        writer.close()
+                        marks['listen'] = now
+                    except OSError:
+                        await asyncio.sleep(POLL)
+                        continue
+                if marks['websocket'] is None:
+                    try:
+                        ws = await session.ws_connect(f'http://127.0.0.1:{args.port}/ws?room=BENCH0')
+                        marks['websocket'] = time.perf_counter() - started
+                        await ws.close()
+                    except (ClientError, WSServerHandshakeError):
+                        pass
+                try:
+                    async with session.get(f'http://127.0.0.1:{args.port}/health') as resp:
+                        if resp.status == 200:
+                            health = await resp.json()
+                            if marks['health'] is None:
+                                marks['health'] = time.perf_counter() - started
+                            # У сервера без поля bot бот поднимается до открытия порта
+                            if health.get('bot', 'ready') == 'ready':
+                                marks['bot_ready'] = time.perf_counter() - started
+                except ClientError:
+                    pass
+                await asyncio.sleep(POLL)
+    finally:
+        server.terminate()
+        server.wait()
+    return marks
+
+
+async def run(args) -> Dict:
+    api = FakeBotApi(latency=args.latency)
+    runner = await start_fake_api(api, args.api_port)
+    try:
+        runs = []
+        for _ in range(args.runs):
+            runs.append(await measure(args, args.api_port))
+            await asyncio.sleep(0.3)  # порт освобождается не сразу
+    finally:
+        await runner.cleanup()
+    ms = lambda values: round(statistics.median(values) * 1000) if values else None
+    return {
+        'main': args.main,
+        'runs': args.runs,
+        'latency_s': args.latency,
+        'median_ms': {name: ms([r[name] for r in runs if r[name] is not None]) for name in runs[0]},
+        'failed': {name: sum(r[name] is None for r in runs) for name in runs[0]},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--main', default=os.path.join(ROOT_DIR, 'main.py'), help='какой main.py запускать')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.3, help='средняя задержка ответа Bot API, с')
+    parser.add_argument('--port', type=int, default=18950)
+    parser.add_argument('--api-port', type=int, default=18951)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+    args.main = os.path.abspath(args.main)
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result))
+        return
+    m = result['median_ms']
+    print(f"{result['main']}: {result['runs']} запусков, задержка Bot API {args.latency} с, медиана:")
+    print(f"  порт {m['listen']} мс, WebSocket {m['websocket']} мс, /health {m['health']} мс, "
+          f"бот готов {m['bot_ready']} мс")
+    failed = {k: v for k, v in result['failed'].items() if v}
+    if failed:
+        print(f"  ⚠️ не дождались: {failed}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк протокола WebSocket: JSON, JSON + permessage-deflate и бинарный ?proto=bin
+Проигрывает случайные партии и считает байты на партию (с заголовками кадров)
+и время кодирования/разбора одного сообщения. Сжатие aiohttp выполняет
+отдельно для каждого получателя, поэтому его время – на каждое соединение
+
+    python tools/bench_wire.py --games 2000
+"""
+
+import os
+import sys
+import zlib
+import random
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:bench')  # импорт game тянет настройки бота
+
+from game.state import GameState, COLOR_NAMES
+from websocket import frames
+
+WORDS = [f"слово{i}" for i in range(400)]
+
+
+def play_game() -> list:
+    """Сообщения одной партии в том виде, в каком их рассылает main.py"""
+    state = GameState.new(random.sample(WORDS, 25))
+    seq = 0
+    init = state.to_wire('ABC123')
+    messages = [{'type': 'init', 'game_state': init, 'role': 'captain', 'seq': seq, 'epoch': '1a2b3c4d'}]
+    team = 'red'
+    for index in random.sample(range(25), 25):
+        color = COLOR_NAMES[state.reveal(index)]
+        if color == 'red':
+            state.red_score -= 1
+        elif color == 'blue':
+            state.blue_score -= 1
+        seq += 1
+        messages.append({'type': 'card_revealed', 'index': index, 'color': color,
+                         'red_score': state.red_score, 'blue_score': state.blue_score, 'seq': seq})
+        if color == 'black' or state.red_score == 0 or state.blue_score == 0:
+            seq += 1
+            if color == 'black':
+                winner = 'blue' if team == 'red' else 'red'
+            else:
+                winner = 'red' if state.red_score == 0 else 'blue'
+            messages.append({'type': 'game_over', 'winner': winner, 'seq': seq})
+            break
+        if color != team:
+            team = 'blue' if team == 'red' else 'red'
+            seq += 1
+            messages.append({'type': 'turn_switch', 'current_team': team, 'seq': seq})
+        if random.random() < 0.3:
+            messages.append({'type': 'pong'})
+    return messages
+
+
+def frame_size(payload: bytes) -> int:
+    """Размер кадра сервер → клиент (без маски)"""
+    n = len(payload)
+    return n + (2 if n < 126 else 4 if n < 65536 else 10)
+
+
+def deflate_stream(payloads: list) -> list:
+    """permessage-deflate с сохранением контекста между сообщениями"""
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return [(compressor.compress(p) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4] for p in payloads]
+
+
+def json_payloads(encoded: list) -> list:
+    return [f.data for f in encoded]
+
+
+def binary_payloads(encoded: list) -> list:
+    return [f.binary if f.binary is not None else f.data for f in encoded]
+
+
+def decode(payload: bytes):
+    return frames.decode_binary(payload) if payload[:1] != b'{' else frames.loads(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=2000, help='сколько партий проиграть')
+    args = parser.parse_args()
+
+    games = [play_game() for _ in range(args.games)]
+    count = sum(len(g) for g in games)
+
+    start = time.perf_counter()
+    encoded = [[frames.encode(m) for m in g] for g in games]
+    encode_us = (time.perf_counter() - start) / count * 1e6
+    print(f"JSON: {frames.backend_name}, сообщений: {count}, кодирование JSON + бинарь: {encode_us:.2f} мкс")
+    print()
+
+    print(f"{'':16}{'байт/партия':>14}{'без init':>12}{'сжатие, мкс':>14}{'разбор, мкс':>14}")
+    for name, payloads, compress in (
+        ('json', json_payloads, False),
+        ('json+deflate', json_payloads, True),
+        ('bin', binary_payloads, False),
+        ('bin+deflate', binary_payloads, True),
+    ):
+        streams = [payloads(g) for g in encoded]
+        deflate_us = 0.0
+        wire = streams
+        if compress:
+            start = time.perf_counter()
+            wire = [deflate_stream(s) for s in streams]
+            deflate_us = (time.perf_counter() - start) / count * 1e6
+
+        total = sum(frame_size(p) for s in wire for p in s)
+        tail = sum(frame_size(p) for s in wire for p in s[1:])
+
+        start = time.perf_counter()
+        for s in streams:
+            for p in s:
+                decode(p)
+        decode_us = (time.perf_counter() - start) / count * 1e6
+
+        print(f"{name:16}{total / args.games:14.0f}{tail / args.games:12.0f}"
+              f"{deflate_us:14.2f}{decode_us:14.2f}")
+
+
+if __name__ == '__main__':
+    main()
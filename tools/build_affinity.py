@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Индекс похожести слов для раскладок (game/boards.py)
+
+Для каждого слова источника – до --top самых похожих:
+  • однокоренные: совпадает основа после отсечения окончания (всегда);
+  • близкие по векторам: косинус не меньше --threshold (если есть --vectors,
+    файлы в формате подсказчика, см. tools/spymaster_embeddings.py)
+Результат – <источник>.affinity.json рядом с JSON словаря или пака,
+сервер подхватывает его без перезапуска
+
+    python tools/build_affinity.py                      # общий словарь
+    python tools/build_affinity.py --pack en-base --vectors data/spymaster --lang en
+    python tools/build_affinity.py --all --vectors data/spymaster
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Sequence, Set
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.environ.setdefault('BOT_TOKEN', '0:affinity')  # импорт game тянет настройки бота
+
+from game.words import word_bank
+from game.packs import pack_registry
+from game.boards import affinity_path
+
+# Окончания, длинные раньше коротких
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ой', 'ей', 'ий', 'ый', 'ая', 'яя',
+    'ое', 'ее', 'ов', 'ев', 'ах', 'ях', 'ом', 'ем', 'ам', 'ям', 'ию', 'ия', 'ие', 'ок', 'ек', 'ик',
+    'ка', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    'ings', 'ing', 'ers', 'er', 'es', 'ed', 's',
+), key=len, reverse=True)
+MIN_STEM = 3
+STEM_PREFIX = 5   # длинные основы сравниваем по началу: «самолет» ~ «самолетик»
+
+
+def stem(word: str) -> str:
+    word = word.lower().replace('ё', 'е')
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            word = word[:-len(ending)]
+            break
+    return word[:STEM_PREFIX]
+
+
+def stem_neighbors(words: Sequence[str]) -> Dict[str, Set[str]]:
+    groups: Dict[str, List[str]] = {}
+    for word in words:
+        groups.setdefault(stem(word), []).append(word)
+    near: Dict[str, Set[str]] = {}
+    for group in groups.values():
+        for word in group:
+            if len(group) > 1:
+                near.setdefault(word, set()).update(w for w in group if w != word)
+    return near
+
+
+def vector_neighbors(words: Sequence[str], directory: str, lang: str, top: int,
+                     threshold: float) -> Dict[str, Set[str]]:
+    import numpy as np
+
+    vectors = np.load(os.path.join(directory, f'{lang}.npy'), mmap_mode='r')
+    with open(os.path.join(directory, f'{lang}.vocab.txt'), encoding='utf-8') as f:
+        ids = {line.rstrip('\n'): i for i, line in enumerate(f)}
+    known = [w for w in words if w.lower() in ids]
+    print(f"Векторы есть у {len(known)} из {len(words)} слов")
+    if len(known) < 2:
+        return {}
+    matrix = np.asarray(vectors[[ids[w.lower()] for w in known]], dtype=np.float32)
+    near: Dict[str, Set[str]] = {}
+    for start in range(0, len(known), 1024):
+        sims = matrix[start:start + 1024] @ matrix.T
+        for row, word_sims in enumerate(sims):
+            word_sims[start + row] = -1.0
+            best = np.argpartition(-word_sims, min(top, len(known) - 1))[:top]
+            for j in best:
+                if word_sims[j] >= threshold:
+                    near.setdefault(known[start + row], set()).add(known[j])
+    return near
+
+
+def build(words, args) -> str:
+    started = time.perf_counter()
+    bank = list(words.words) if hasattr(words, 'words') else [words.word(i) for i in range(len(words))]
+    near = stem_neighbors(bank)
+    if args.vectors:
+        language = getattr(words, 'language', args.lang)
+        for word, others in vector_neighbors(bank, args.vectors, language, args.top, args.threshold).items():
+            near.setdefault(word, set()).update(others)
+    # Симметрично: если b похоже на a, то и a на b
+    for word, others in list(near.items()):
+        for other in others:
+            near.setdefault(other, set()).add(word)
+
+    path = affinity_path(words)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'neighbors': {w: sorted(o)[:args.top * 2] for w, o in sorted(near.items())}},
+                  f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    pairs = sum(len(o) for o in near.values()) // 2
+    print(f"✅ {path}: {len(near)} слов с соседями, пар {pairs}, {time.perf_counter() - started:.1f} с")
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pack', help='id пака вместо общего словаря')
+    parser.add_argument('--all', action='store_true', help='общий словарь и все паки')
+    parser.add_argument('--vectors', help='каталог с <язык>.npy и <язык>.vocab.txt')
+    parser.add_argument('--lang', default='ru', help='язык общего словаря')
+    parser.add_argument('--top', type=int, default=8, help='соседей по векторам на слово')
+    parser.add_argument('--threshold', type=float, default=0.55, help='минимальный косинус')
+    args = parser.parse_args()
+
+    if args.all:
+        sources = [word_bank] + list(pack_registry.packs.values())
+    elif args.pack:
+        if args.pack not in pack_registry.packs:
+            parser.error(f"нет пака {args.pack}")
+        sources = [pack_registry.packs[args.pack]]
+    else:
+        sources = [word_bank]
+    built = set()
+    for words in sources:
+        if affinity_path(words) not in built:  # ru-base читает тот же words.json
+            built.add(build(words, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Поддельный Bot API для проверки исходящих сообщений без сети
+Отвечает на POST /bot<token>/<method> как Telegram: getMe, sendMessage,
+editMessageText, остальное – true. Лимиты как у настоящего: на чат и общий,
+сверх них – 429 с retry_after. Бота направить сюда: TELEGRAM_API_URL=http://127.0.0.1:8081
+
+    python tools/fake_bot_api.py --port 8081
+    python tools/fake_bot_api.py --demo --chats 200   # планировщик против сервера
+"""
+
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.environ.setdefault('BOT_TOKEN', '0:fake')  # бот из демо ходит только сюда
+
+from aiohttp import web
+
+from utils.ratelimit import TokenBucket
+
+
+class FakeBotApi:
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 group_rate: float = 20 / 60, latency: float = 0.0):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.latency = latency
+        self.chats: Dict[int, TokenBucket] = {}
+        self.next_message_id = 1
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.limited = 0
+        self.messages: List[Dict] = []   # что дошло до чатов, по порядку
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        if chat_id not in self.chats:
+            rate = self.group_rate if chat_id < 0 else self.chat_rate
+            self.chats[chat_id] = TokenBucket(rate, self.chat_burst)
+        return self.chats[chat_id]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(random.uniform(0, 2 * self.latency))
+        self.calls[method] += 1
+
+        if method == 'getMe':
+            return self._ok({'id': 1, 'is_bot': True, 'first_name': 'Codenames', 'username': 'fake_bot'})
+        if method not in ('sendMessage', 'editMessageText'):
+            return self._ok(True)
+
+        chat_id = int(params['chat_id'])
+        now = time.monotonic()
+        wait = max(self._bucket(chat_id).delay(now), self.global_bucket.delay(now))
+        if wait > 0:
+            self.limited += 1
+            retry_after = max(1, round(wait))
+            return web.json_response({
+                'ok': False, 'error_code': 429,
+                'description': f'Too Many Requests: retry after {retry_after}',
+                'parameters': {'retry_after': retry_after},
+            })
+        self._bucket(chat_id).try_take(now)
+        self.global_bucket.try_take(now)
+
+        if method == 'sendMessage':
+            message_id = self.next_message_id
+            self.next_message_id += 1
+        else:
+            message_id = int(params['message_id'])
+        self.messages.append({'method': method, 'chat_id': chat_id, 'text': params.get('text'),
+                              'at': time.perf_counter()})
+        return self._ok({
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'group' if chat_id < 0 else 'private'},
+            'text': params.get('text', ''),
+        })
+
+    @staticmethod
+    def _ok(result) -> web.Response:
+        return web.json_response({'ok': True, 'result': result})
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({'calls': self.calls, 'limited': self.limited,
+                                  'delivered': len(self.messages)})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        app.router.add_get('/stats', self.stats)
+        return app
+
+
+async def start(api: FakeBotApi, port: int) -> web.AppRunner:
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner
+
+
+# ==================== ДЕМО ====================
+
+async def demo(args):
+    """Ссылки, справка и правки в args.chats чатов через Outbox против поддельного сервера"""
+    from telegram import Bot
+    from tg_bot.outbox import Outbox, HIGH, NORMAL, LOW
+
+    api = FakeBotApi(latency=args.latency)
+    runner = await start(api, args.port)
+    bot = Bot('0:demo', base_url=f'http://127.0.0.1:{args.port}/bot')
+    await bot.initialize()
+    outbox = Outbox(bot)
+    sender = asyncio.create_task(outbox.run())
+
+    started = time.perf_counter()
+    latency = {HIGH: [], LOW: []}
+
+    async def timed(future, priority):
+        try:
+            await future
+        except Exception:
+            return
+        latency[priority].append(time.perf_counter() - started)
+
+    waits = []
+    chats = list(range(1, args.chats + 1)) + [-i for i in range(1, args.groups + 1)]
+    for chat_id in chats:
+        waits.append(timed(outbox.send_message(chat_id, 'Справка', LOW), LOW))
+        waits.append(timed(outbox.send_message(chat_id, 'Ссылка на игру', HIGH), HIGH))
+        # Серия правок табло – до Telegram должна дойти последняя
+        for score in range(args.edits):
+            waits.append(outbox.edit_message_text(chat_id, 1, f'Счёт {score}', NORMAL))
+    await asyncio.gather(*waits, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    sender.cancel()
+    await bot.shutdown()
+    await runner.cleanup()
+
+    mean = lambda v: round(sum(v) / len(v), 2) if v else None
+    print(f"Чатов: {len(chats)}, запросов к API: {sum(api.calls.values())}, доставлено: {len(api.messages)}, "
+          f"429: {api.limited}, за {elapsed:.1f} с")
+    print(f"Среднее время до доставки: ссылка {mean(latency[HIGH])} с, справка {mean(latency[LOW])} с")
+    print(f"Правок поставлено: {len(chats) * args.edits}, ушло в API: "
+          f"{sum(1 for m in api.messages if m['method'] == 'editMessageText')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help='средняя задержка ответа, с')
+    parser.add_argument('--demo', action='store_true', help='прогнать планировщик против сервера')
+    parser.add_argument('--chats', type=int, default=100, help='личных чатов в демо')
+    parser.add_argument('--groups', type=int, default=5, help='групп в демо')
+    parser.add_argument('--edits', type=int, default=5, help='правок на чат в демо')
+    args = parser.parse_args()
+
+    if args.demo:
+        asyncio.run(demo(args))
+        return
+
+    async def serve():
+        await start(FakeBotApi(latency=args.latency), args.port)
+        print(f"🤖 Поддельный Bot API на http://127.0.0.1:{args.port}", flush=True)
+        await asyncio.Future()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест /ws: N комнат по M клиентов, живой трафик, задержки рассылки
+Сервер – приложение из main.py (create_app без вебхука Telegram) в отдельном процессе,
+комнаты создаются в нём напрямую. Клиенты играют: открывают карточки, сбрасывают
+партию после победы, шлют ping. Задержка рассылки – от отправки действия до
+получения результата каждым клиентом комнаты
+
+    python tools/loadtest.py --rooms 1000 --clients 4 --duration 30
+    python tools/loadtest.py --rooms 200 --proto bin --json > result.json
+    python tools/loadtest.py --rooms 500 --trace traces.jsonl --trace-speed 10
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import resource
+import subprocess
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.environ.setdefault('BOT_TOKEN', '0:loadtest')  # бот не инициализируется
+
+
+def rss_kb(pid: str = 'self') -> Optional[int]:
+    """Резидентная память процесса (только Linux)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def room_ids(count: int) -> List[str]:
+    return [f'L{i:05d}' for i in range(count)]
+
+
+# ==================== СЕРВЕР ====================
+
+def traced_room_class(main, traces: List[Dict]):
+    """
+    Комната, которая раскладывает цвета по трассам: партия n комнаты номер i –
+    трасса (i + n) % len(traces), как и у клиента в replay. Иначе клики трассы
+    попадали бы в чужую раскладку и исходы партий не совпадали
+    """
+    from game.boards import board_pool
+    from game.state import GameState
+
+    class TracedRoom(main.GameRoom):
+        def __init__(self, room_id: str, first: int):
+            self.trace_game = first   # до super(): конструктор сразу строит партию
+            super().__init__(room_id)
+
+        def _create_game_state(self) -> GameState:
+            colors = traces[self.trace_game % len(traces)]['colors']
+            self.trace_game += 1
+            return GameState(board_pool.take(self.words), bytes(colors))
+
+    def pass_turn(room, conn, data: Dict):
+        """Пас из трассы: в протоколе его нет, добавляем только серверу теста"""
+        room.switch_team()
+        room.broadcaster.broadcast({'type': 'turn_switch', 'current_team': room.game_state.current_team.value})
+
+    main.ROOM_ACTIONS['pass'] = pass_turn
+    return TracedRoom
+
+
+async def serve(args):
+    """Дочерний процесс: приложение из main.py с заранее созданными комнатами"""
+    os.environ['WORKERS'] = '1'
+    from aiohttp import web
+    import main
+
+    traced = traced_room_class(main, load_traces(args.trace)) if args.trace else None
+    rss_empty = rss_kb()
+    for i, room_id in enumerate(room_ids(args.rooms)):
+        main.active_rooms[room_id] = traced(room_id, i) if traced else main.GameRoom(room_id)
+        main.room_expiry.track(room_id)
+    rss_rooms = rss_kb()
+
+    runner = web.AppRunner(main.create_app(webhook=False))
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.port, backlog=4096).start()
+    main.start_background_tasks()
+    asyncio.create_task(main.restore_rooms())
+
+    print(json.dumps({'rss_empty': rss_empty, 'rss_rooms': rss_rooms}), flush=True)
+    await asyncio.Future()
+
+
+# ==================== КЛИЕНТЫ ====================
+
+class Stats:
+    def __init__(self):
+        self.broadcast: List[float] = []
+        self.pong: List[float] = []
+        self.actions = 0
+        self.received = 0
+        self.errors = 0
+        self.trace_games = 0      # доигранные по трассе партии
+        self.trace_matched = 0    # из них с тем же победителем, что в трассе
+
+
+class LoadRoom:
+    """Комната глазами клиентов: что отправлено и когда"""
+
+    def __init__(self, room_id: str):
+        self.room_id = room_id
+        self.clients = []
+        self.sent: Dict = {}           # ключ события -> время отправки
+        self.revealed = set()
+        self.over = False
+        self.winner: Optional[str] = None
+        self.reset_seen = asyncio.Event()
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def read_loop(ws, room: LoadRoom, stats: Stats, decode):
+    from aiohttp import WSMsgType
+    async for msg in ws:
+        if msg.type not in (WSMsgType.TEXT, WSMsgType.BINARY):
+            continue
+        now = time.perf_counter()
+        data = decode(msg)
+        stats.received += 1
+        kind = data.get('type')
+        if kind == 'card_revealed':
+            sent = room.sent.get(('card', data['index']))
+        elif kind == 'game_reset':
+            sent = room.sent.get('reset')
+            room.reset_seen.set()
+        elif kind == 'pong':
+            sent = room.sent.pop(('ping', id(ws)), None)
+            if sent is not None:
+                stats.pong.append(now - sent)
+            continue
+        else:
+            if kind == 'game_over':
+                room.over = True
+                room.winner = data.get('winner')
+            elif kind == 'error':
+                stats.errors += 1
+            continue
+        if sent is not None:
+            stats.broadcast.append(now - sent)
+
+
+async def drive(room: LoadRoom, stats: Stats, rate: float, deadline: float):
+    """Игровой трафик комнаты: клики, сброс после победы и изредка ping"""
+    await asyncio.sleep(random.random() / rate)
+    while (now := time.perf_counter()) < deadline:
+        ws = random.choice(room.clients)
+        roll = random.random()
+        if room.over or len(room.revealed) == 25 or roll < 0.02:
+            room.revealed.clear()
+            room.over = False
+            room.sent['reset'] = time.perf_counter()
+            await ws.send_str('{"action":"reset_game"}')
+        elif roll < 0.12:
+            room.sent[('ping', id(ws))] = time.perf_counter()
+            await ws.send_str('{"action":"ping"}')
+        else:
+            index = random.choice([i for i in range(25) if i not in room.revealed])
+            room.revealed.add(index)
+            room.sent[('card', index)] = time.perf_counter()
+            await ws.send_str(f'{{"action":"click_card","index":{index}}}')
+        stats.actions += 1
+        await asyncio.sleep(min(random.expovariate(rate), deadline - now))
+
+
+async def replay(room: LoadRoom, stats: Stats, traces: List[Dict], speed: float, deadline: float, first: int):
+    """
+    Партии по трассам tools/simulate.py: раскладка (её ставит сервер теста, см.
+    traced_room_class), порядок кликов, пасы и паузы – как в трассе. Все действия
+    партии идут через одно соединение, чтобы сервер получил их в том же порядке
+    """
+    from game.state import COLOR_NAMES
+
+    game = first
+    while time.perf_counter() < deadline:
+        trace = traces[game % len(traces)]
+        game += 1
+        ws = random.choice(room.clients)
+        for index, delay in zip(trace['clicks'], trace['delays']):
+            await asyncio.sleep(max(0.0, min(delay / speed, deadline - time.perf_counter())))
+            if time.perf_counter() >= deadline or room.over:
+                break
+            if index < 0:
+                await ws.send_str('{"action":"pass"}')
+            else:
+                room.revealed.add(index)
+                room.sent[('card', index)] = time.perf_counter()
+                await ws.send_str(f'{{"action":"click_card","index":{index}}}')
+            stats.actions += 1
+        if time.perf_counter() < deadline and trace['winner'] >= 0:
+            await asyncio.sleep(0.05)   # game_over последнего клика ещё в пути
+            stats.trace_games += 1
+            stats.trace_matched += room.winner == COLOR_NAMES[trace['winner']]
+        room.revealed.clear()
+        room.over = False
+        room.winner = None
+        room.reset_seen.clear()
+        room.sent['reset'] = time.perf_counter()
+        await ws.send_str('{"action":"reset_game"}')
+        stats.actions += 1
+        # Следующая партия – только на новой раскладке
+        try:
+            await asyncio.wait_for(room.reset_seen.wait(), max(0.0, deadline - time.perf_counter()))
+        except asyncio.TimeoutError:
+            break
+
+
+def load_traces(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def run_clients(args, stats: Stats) -> float:
+    from aiohttp import ClientSession, TCPConnector, WSMsgType
+    from websocket import frames
+
+    def decode(msg):
+        if msg.type == WSMsgType.BINARY:
+            return frames.decode_binary(msg.data)
+        return frames.loads(msg.data)
+
+    rooms = [LoadRoom(room_id) for room_id in room_ids(args.rooms)]
+    query = '&proto=bin' if args.proto == 'bin' else ''
+    semaphore = asyncio.Semaphore(args.connect_concurrency)
+    readers = []
+
+    async with ClientSession(connector=TCPConnector(limit=0)) as session:
+        async def connect(room: LoadRoom, role: str):
+            async with semaphore:
+                ws = await session.ws_connect(
+                    f'http://127.0.0.1:{args.port}/ws?room={room.room_id}&role={role}{query}',
+                    compress=15 if args.compress else 0, heartbeat=None,
+                )
+                await ws.receive()  # init
+            room.clients.append(ws)
+            readers.append(asyncio.create_task(read_loop(ws, room, stats, decode)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            connect(room, 'captain' if i < args.captains else 'agent')
+            for room in rooms for i in range(args.clients)
+        ))
+        print(f"🔌 {len(readers)} соединений за {time.perf_counter() - started:.1f} с", file=sys.stderr)
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        if args.trace:
+            traces = load_traces(args.trace)
+            await asyncio.gather(*(replay(room, stats, traces, args.trace_speed, deadline, first)
+                                   for first, room in enumerate(rooms)))
+        else:
+            await asyncio.gather(*(drive(room, stats, args.rate, deadline) for room in rooms))
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.5)  # дочитываем последние рассылки
+
+        for room in rooms:
+            for ws in room.clients:
+                await ws.close()
+        for task in readers:
+            task.cancel()
+    return elapsed
+
+
+async def fetch_text(port: int, path: str) -> str:
+    from aiohttp import ClientSession
+    async with ClientSession() as session:
+        async with session.get(f'http://127.0.0.1:{port}{path}') as resp:
+            return await resp.text()
+
+
+def metric_mean(text: str, name: str) -> Optional[float]:
+    """Среднее гистограммы из вывода /metrics (по всем меткам)"""
+    total = count = 0.0
+    for line in text.splitlines():
+        if line.startswith(name + '_sum'):
+            total += float(line.rsplit(' ', 1)[1])
+        elif line.startswith(name + '_count'):
+            count += float(line.rsplit(' ', 1)[1])
+    return total / count if count else None
+
+
+def server_env(args) -> Dict[str, str]:
+    """
+    Все клиенты теста подключаются с 127.0.0.1 и шлют сколько велит --rate,
+    поэтому лимиты /ws (websocket/admission.py) поднимаем под нагрузку.
+    Заданное в окружении явно не трогаем
+    """
+    connections = str(args.rooms * args.clients)
+    unlimited = str(10 ** 6)
+    limits = {
+        'WS_MAX_CONNECTIONS': connections,
+        'WS_MAX_PER_IP': connections,
+        'WS_MAX_PER_ROOM': str(args.clients),
+        'WS_CONNECT_RATE': unlimited,
+        'WS_CONNECT_BURST': unlimited,
+        'WS_MESSAGE_RATE': unlimited,
+        'WS_MESSAGE_BURST': unlimited,
+        'WS_ROOM_ACTION_RATE': unlimited,
+        'WS_ROOM_ACTION_BURST': unlimited,
+    }
+    return {**limits, **os.environ}
+
+
+async def run(args) -> Dict:
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--rooms', str(args.rooms), '--port', str(args.port)]
+    if args.trace:
+        command += ['--trace', os.path.abspath(args.trace)]
+    server = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE, stderr=None if args.server_logs else subprocess.DEVNULL, text=True,
+        env=server_env(args),
+    )
+    try:
+        ready = json.loads(await asyncio.to_thread(server.stdout.readline))
+        stats = Stats()
+        elapsed = await run_clients(args, stats)
+        rss_clients = rss_kb(str(server.pid))
+        metrics_text = await fetch_text(args.port, '/metrics')
+    finally:
+        server.terminate()
+        server.wait()
+
+    connections = args.rooms * args.clients
+    ms = lambda v: round(v * 1000, 2)
+    result = {
+        'rooms': args.rooms,
+        'clients': connections,
+        'proto': args.proto,
+        'compress': args.compress,
+        'duration_s': round(elapsed, 2),
+        'actions': stats.actions,
+        'actions_per_s': round(stats.actions / elapsed, 1),
+        'received': stats.received,
+        'received_per_s': round(stats.received / elapsed, 1),
+        'errors': stats.errors,
+        'broadcast_ms': {p: ms(percentile(stats.broadcast, q)) for p, q in
+                         (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))},
+        'pong_ms': {p: ms(percentile(stats.pong, q)) for p, q in (('p50', 0.5), ('p99', 0.99))},
+        'server_action_ms': ms(metric_mean(metrics_text, 'codenames_action_latency_seconds') or 0),
+        'server_loop_lag_ms': ms(metric_mean(metrics_text, 'codenames_event_loop_lag_seconds') or 0),
+    }
+    if args.trace:
+        result['trace_games'] = stats.trace_games
+        result['trace_matched'] = stats.trace_matched
+    if ready['rss_empty'] and ready['rss_rooms'] and rss_clients:
+        result['memory_kb'] = {
+            'empty': ready['rss_empty'],
+            'per_room': round((ready['rss_rooms'] - ready['rss_empty']) / max(1, args.rooms), 2),
+            'per_connection': round((rss_clients - ready['rss_rooms']) / max(1, connections), 2),
+        }
+    return result
+
+
+def print_report(result: Dict):
+    b, p = result['broadcast_ms'], result['pong_ms']
+    print(f"Комнат: {result['rooms']}, клиентов: {result['clients']}, протокол: {result['proto']}"
+          f"{' + deflate' if result['compress'] else ''}, {result['duration_s']} с")
+    print(f"Действий: {result['actions']} ({result['actions_per_s']}/с), "
+          f"получено сообщений: {result['received']} ({result['received_per_s']}/с), ошибок: {result['errors']}")
+    print(f"Рассылка, мс: p50 {b['p50']}  p90 {b['p90']}  p99 {b['p99']}  max {b['max']}")
+    print(f"pong, мс:     p50 {p['p50']}  p99 {p['p99']}")
+    print(f"Сервер: действие {result['server_action_ms']} мс, опоздание цикла {result['server_loop_lag_ms']} мс")
+    if 'trace_games' in result:
+        print(f"Трассы: доиграно {result['trace_games']} партий, победитель совпал в {result['trace_matched']}")
+    if 'memory_kb' in result:
+        m = result['memory_kb']
+        print(f"Память сервера: {m['empty'] / 1024:.1f} МБ без комнат, "
+              f"{m['per_room']} КБ/комната, {m['per_connection']} КБ/соединение")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rooms', type=int, default=500, help='сколько комнат создать')
+    parser.add_argument('--clients', type=int, default=4, help='клиентов в комнате')
+    parser.add_argument('--captains', type=int, default=2, help='сколько из них капитаны')
+    parser.add_argument('--rate', type=float, default=1.0, help='действий в секунду на комнату')
+    parser.add_argument('--duration', type=float, default=20, help='длительность игры, с')
+    parser.add_argument('--proto', choices=('json', 'bin'), default='json')
+    parser.add_argument('--compress', action='store_true', help='permessage-deflate')
+    parser.add_argument('--port', type=int, default=18765)
+    parser.add_argument('--connect-concurrency', type=int, default=200, help='одновременных рукопожатий')
+    parser.add_argument('--trace', help='играть по трассам tools/simulate.py --trace вместо случайных кликов')
+    parser.add_argument('--trace-speed', type=float, default=1.0, help='во сколько раз ускорить паузы трассы')
+    parser.add_argument('--json', action='store_true', help='результат одной строкой JSON')
+    parser.add_argument('--server-logs', action='store_true', help='не глушить логи сервера')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    raise_fd_limit()
+    if args.serve:
+        asyncio.run(serve(args))
+        return
+
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False))
+    else:
+        print_report(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Монте-Карло партий Codenames на numpy
+Миллионы раскладок лежат массивами (коды цветов и маска открытых карточек)
+и доигрываются все сразу, шаг за шагом по одному клику. Правила – как
+в GameRoom.reveal_card/_check_winner из main.py: чёрная карточка – победа
+соперника, команда без закрытых своих карточек побеждает, ход переходит
+только после карточки соперника (или паса игрока).
+Кто что открывает, решают стратегии команд (POLICIES), их можно смешивать:
+сильные красные против случайных синих и т. п.
+
+Отчёт: преимущество первого хода, частота убийцы, длина партий в кликах
+и ходах. --trace пишет клики партий в JSONL для tools/loadtest.py --trace
+
+    python tools/simulate.py --games 1000000
+    python tools/simulate.py --red clued --blue random --accuracy 0.8 --json
+    python tools/simulate.py --games 20000 --trace traces.jsonl --trace-games 5000
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '0:simulate')  # импорт game тянет настройки бота
+
+from game.state import BOARD_SIZE, DECK, RED, BLUE, BLACK, NEUTRAL
+
+PASS = -1
+MAX_STEPS = 200   # страховка от стратегии, которая бесконечно пасует
+
+
+class Simulation:
+    """Пачка партий: всё состояние – массивы по первой оси «партия»"""
+
+    def __init__(self, games: int, rng: np.random.Generator):
+        self.rng = rng
+        self.games = games
+        deck = np.frombuffer(DECK, dtype=np.uint8)
+        # Перемешиваем колоду каждой партии: argsort случайных ключей – перестановка
+        self.colors = deck[np.argsort(rng.random((games, BOARD_SIZE)), axis=1)]
+        self.revealed = np.zeros((games, BOARD_SIZE), dtype=bool)
+        self.team = np.full(games, RED, dtype=np.uint8)   # красные ходят первыми
+        self.left = np.zeros((games, 2), dtype=np.int8)   # закрытые карточки RED, BLUE
+        self.left[:, RED] = (deck == RED).sum()
+        self.left[:, BLUE] = (deck == BLUE).sum()
+        self.turns = np.ones(games, dtype=np.int16)
+        self.clicks = np.zeros(games, dtype=np.int16)
+        self.winner = np.full(games, -1, dtype=np.int8)
+        self.assassin = np.zeros(games, dtype=bool)
+
+    @property
+    def active(self) -> np.ndarray:
+        return np.flatnonzero(self.winner < 0)
+
+    def closed(self, games: np.ndarray, color: Optional[int] = None) -> np.ndarray:
+        """Маска закрытых карточек (нужного цвета) для партий games"""
+        mask = ~self.revealed[games]
+        if color is not None:
+            mask &= self.colors[games] == color
+        return mask
+
+    def pick(self, mask: np.ndarray) -> np.ndarray:
+        """Случайная отмеченная карточка в каждой строке; -1 – отмеченных нет"""
+        counts = mask.sum(axis=1)
+        target = (self.rng.random(len(mask)) * counts).astype(np.int64)
+        choice = (mask.cumsum(axis=1) <= target[:, None]).sum(axis=1)
+        return np.where(counts > 0, choice, PASS)
+
+    def step(self, games: np.ndarray, choice: np.ndarray):
+        """Применяет клики (или пасы) партий games"""
+        passed = choice == PASS
+        if passed.any():
+            g = games[passed]
+            self.team[g] ^= 1
+            self.turns[g] += 1
+
+        g, index = games[~passed], choice[~passed]
+        self.revealed[g, index] = True
+        self.clicks[g] += 1
+        color = self.colors[g, index]
+        team = self.team[g]
+        for side in (RED, BLUE):
+            hit = color == side
+            self.left[g[hit], side] -= 1
+
+        black = color == BLACK
+        self.winner[g[black]] = team[black] ^ 1
+        self.assassin[g[black]] = True
+        alive = ~black
+        for side in (RED, BLUE):
+            won = alive & (self.left[g, side] == 0)
+            self.winner[g[won]] = side
+            alive &= ~won
+        # Ход переходит только на карточке соперника
+        switch = alive & (color != team) & (color != NEUTRAL)
+        self.team[g[switch]] ^= 1
+        self.turns[g[switch]] += 1
+
+
+# ==================== СТРАТЕГИИ ====================
+
+class RandomPolicy:
+    """Агенты без подсказок: любая закрытая карточка"""
+
+    def __init__(self, sim: Simulation, args):
+        self.sim = sim
+
+    def choose(self, games: np.ndarray) -> np.ndarray:
+        return self.sim.pick(self.sim.closed(games))
+
+
+class CluedPolicy:
+    """
+    Капитан загадывает от 1 до --max-hint своих слов, агент угадывает своё
+    с вероятностью --accuracy (иначе открывает случайную чужую карточку)
+    и пасует, когда подсказка исчерпана
+    """
+
+    def __init__(self, sim: Simulation, args):
+        self.sim = sim
+        self.accuracy = args.accuracy
+        self.max_hint = args.max_hint
+        self.budget = np.zeros(sim.games, dtype=np.int8)
+        self.turn = np.zeros(sim.games, dtype=np.int16)
+
+    def choose(self, games: np.ndarray) -> np.ndarray:
+        sim = self.sim
+        team = sim.team[games]
+        own_left = sim.left[games, team]
+
+        new_turn = self.turn[games] != sim.turns[games]
+        if new_turn.any():
+            g = games[new_turn]
+            hint = sim.rng.integers(1, self.max_hint + 1, len(g))
+            self.budget[g] = np.minimum(hint, own_left[new_turn])
+            self.turn[g] = sim.turns[g]
+
+        own = sim.closed(games) & (sim.colors[games] == team[:, None])
+        other = sim.closed(games) & ~own
+        guessed = sim.rng.random(len(games)) < self.accuracy
+        choice = np.where(guessed, sim.pick(own), sim.pick(other))
+        choice = np.where(choice == PASS, sim.pick(own | other), choice)
+
+        spent = self.budget[games] <= 0
+        choice[spent] = PASS
+        self.budget[games[~spent]] -= 1
+        return choice
+
+
+POLICIES = {
+    'random': RandomPolicy,
+    'clued': CluedPolicy,
+}
+
+
+# ==================== ПРОГОН ====================
+
+def play(games: int, args, rng: np.random.Generator, trace: Optional[List] = None) -> Simulation:
+    """Доигрывает пачку; в trace – клики первых len(trace) партий"""
+    sim = Simulation(games, rng)
+    policies = {RED: POLICIES[args.red](sim, args), BLUE: POLICIES[args.blue](sim, args)}
+    for _ in range(MAX_STEPS):
+        active = sim.active
+        if not len(active):
+            break
+        choice = np.empty(len(active), dtype=np.int64)
+        team = sim.team[active]
+        for side, policy in policies.items():
+            mine = team == side
+            if mine.any():
+                choice[mine] = policy.choose(active[mine])
+        if trace is not None:
+            traced = active < len(trace)
+            for game, index in zip(active[traced].tolist(), choice[traced].tolist()):
+                trace[game].append(index)
+        sim.step(active, choice)
+    return sim
+
+
+def distribution(values: np.ndarray) -> Dict:
+    q = np.percentile(values, [50, 90, 99]).tolist()
+    return {'mean': round(float(values.mean()), 2), 'p50': q[0], 'p90': q[1], 'p99': q[2],
+            'max': int(values.max())}
+
+
+def report(sims: List[Simulation], elapsed: float, args) -> Dict:
+    winner = np.concatenate([s.winner for s in sims])
+    assassin = np.concatenate([s.assassin for s in sims])
+    clicks = np.concatenate([s.clicks for s in sims])
+    turns = np.concatenate([s.turns for s in sims])
+    finished = winner >= 0
+    games = len(winner)
+    rate = lambda mask: round(float(mask.sum()) / games, 4)
+    return {
+        'games': games,
+        'policies': {'red': args.red, 'blue': args.blue},
+        'elapsed_s': round(elapsed, 2),
+        'games_per_s': round(games / elapsed),
+        'unfinished': int((~finished).sum()),
+        'red_wins': rate(winner == RED),            # красные ходят первыми
+        'blue_wins': rate(winner == BLUE),
+        'first_player_advantage': round(rate(winner == RED) - rate(winner == BLUE), 4),
+        'assassin': rate(assassin),
+        'assassin_by_red': rate(assassin & (winner == BLUE)),
+        'assassin_by_blue': rate(assassin & (winner == RED)),
+        'clicks': distribution(clicks[finished]),
+        'turns': distribution(turns[finished]),
+        'clicks_histogram': np.bincount(clicks[finished], minlength=BOARD_SIZE + 1).tolist(),
+    }
+
+
+def write_trace(path: str, trace: List[List[int]], sim: Simulation, think: float, rng: np.random.Generator):
+    """Партия на строку: клики (-1 – пас) и паузы перед ними в секундах"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for game, clicks in enumerate(trace):
+            delays = rng.exponential(think, len(clicks)).round(3).tolist()
+            f.write(json.dumps({
+                'clicks': clicks,
+                'delays': delays,
+                'colors': sim.colors[game].tolist(),
+                'winner': int(sim.winner[game]),
+            }, separators=(',', ':')) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=200000, help='партий в одной пачке массивов')
+    parser.add_argument('--red', choices=POLICIES, default='clued')
+    parser.add_argument('--blue', choices=POLICIES, default='clued')
+    parser.add_argument('--accuracy', type=float, default=0.75, help='clued: вероятность угадать своё')
+    parser.add_argument('--max-hint', type=int, default=3, help='clued: наибольшее число в подсказке')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--trace', help='записать клики партий в JSONL')
+    parser.add_argument('--trace-games', type=int, default=1000)
+    parser.add_argument('--think', type=float, default=2.0, help='средняя пауза перед кликом в трассе, с')
+    parser.add_argument('--json', action='store_true', help='отчёт в JSON')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sims = []
+    trace = [[] for _ in range(min(args.trace_games, args.batch, args.games))] if args.trace else None
+    started = time.perf_counter()
+    for start in range(0, args.games, args.batch):
+        sims.append(play(min(args.batch, args.games - start), args, rng, trace if start == 0 else None))
+    elapsed = time.perf_counter() - started
+    result = report(sims, elapsed, args)
+
+    if args.trace:
+        write_trace(args.trace, trace, sims[0], args.think, rng)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"🎲 {result['games']} партий ({args.red} против {args.blue}) за {result['elapsed_s']} с, "
+          f"{result['games_per_s']} партий/с")
+    print(f"   Победы красных (ходят первыми): {result['red_wins']:.1%}, синих: {result['blue_wins']:.1%}, "
+          f"преимущество первого хода: {result['first_player_advantage']:+.1%}")
+    print(f"   Убийца: {result['assassin']:.1%} (открыли красные {result['assassin_by_red']:.1%}, "
+          f"синие {result['assassin_by_blue']:.1%})")
+    for name in ('clicks', 'turns'):
+        d = result[name]
+        print(f"   {'Клики' if name == 'clicks' else 'Ходы'}: среднее {d['mean']}, "
+              f"p50 {d['p50']:.0f}, p90 {d['p90']:.0f}, p99 {d['p99']:.0f}, max {d['max']}")
+    if result['unfinished']:
+        print(f"   ⚠️ Не доиграно за {MAX_STEPS} шагов: {result['unfinished']}")
+    if args.trace:
+        print(f"   Трасса: {args.trace} ({len(trace)} партий)")
+
+
+if __name__ == '__main__':
+    main()
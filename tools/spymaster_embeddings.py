@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Векторы слов для подсказчика (game/spymaster.py)
+
+build – из текстового файла word2vec/GloVe (строка: слово и числа через пробел,
+первая строка «слов размерность» необязательна) делает <язык>.npy и
+<язык>.vocab.txt: только слова из букв, в нижнем регистре, первые --limit штук
+(файлы векторов обычно отсортированы по частоте), размерность сжата через PCA
+до --dim – умножение матриц на поле тогда укладывается в десятки миллисекунд
+
+bench – время подбора подсказки на случайных полях (по готовым файлам
+или по случайной матрице)
+
+    python tools/spymaster_embeddings.py build cc.ru.300.vec --lang ru --out data/spymaster
+    python tools/spymaster_embeddings.py bench --dir data/spymaster --lang ru
+    python tools/spymaster_embeddings.py bench --random 100000 --dim 100
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+os.environ.setdefault('BOT_TOKEN', '0:spymaster')  # импорт game тянет настройки бота
+
+import numpy as np
+
+
+def read_vectors(path: str, limit: int, strip_tags: bool):
+    words, rows, seen = [], [], set()
+    with open(path, encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            parts = line.rstrip().split(' ')
+            if len(parts) <= 2:
+                continue  # заголовок
+            word = parts[0].lower()
+            if strip_tags:
+                word = word.split('_', 1)[0]  # RusVectores: слово_NOUN
+            if not word.isalpha() or word in seen:
+                continue
+            seen.add(word)
+            words.append(word)
+            rows.append(np.asarray(parts[1:], dtype=np.float32))
+            if len(words) >= limit:
+                break
+    return words, np.vstack(rows)
+
+
+def reduce_dim(matrix: np.ndarray, dim: int, sample: int = 50000) -> np.ndarray:
+    """PCA: главные компоненты по выборке строк, затем проекция всей матрицы"""
+    if dim >= matrix.shape[1]:
+        return matrix
+    mean = matrix.mean(axis=0)
+    rows = matrix[np.random.default_rng(0).choice(len(matrix), min(sample, len(matrix)), replace=False)]
+    _, _, vt = np.linalg.svd(rows - mean, full_matrices=False)
+    return (matrix - mean) @ vt[:dim].T
+
+
+def build(args):
+    started = time.perf_counter()
+    words, matrix = read_vectors(args.source, args.limit, args.strip_tags)
+    matrix = reduce_dim(matrix, args.dim).astype(np.float32)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-8)
+    os.makedirs(args.out, exist_ok=True)
+    np.save(os.path.join(args.out, f'{args.lang}.npy'), matrix)
+    with open(os.path.join(args.out, f'{args.lang}.vocab.txt'), 'w', encoding='utf-8') as f:
+        f.write('\n'.join(words) + '\n')
+    print(f"✅ {len(words)} слов, размерность {matrix.shape[1]}, "
+          f"{matrix.nbytes / 2 ** 20:.0f} МБ, {time.perf_counter() - started:.1f} с")
+
+
+def bench(args):
+    from game.spymaster import Embeddings
+    from game.state import DECK, RED, BLUE
+
+    directory, lang = args.dir, args.lang
+    if args.random:
+        directory, lang = tempfile.mkdtemp(), 'random'
+        matrix = np.random.default_rng(0).standard_normal((args.random, args.dim), dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.save(os.path.join(directory, f'{lang}.npy'), matrix)
+        with open(os.path.join(directory, f'{lang}.vocab.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(f'w{i}' for i in range(args.random)) + '\n')
+
+    started = time.perf_counter()
+    model = Embeddings(os.path.join(directory, f'{lang}.npy'), os.path.join(directory, f'{lang}.vocab.txt'),
+                       candidates=args.candidates)
+    print(f"Загрузка: {time.perf_counter() - started:.2f} с, {model.vectors.shape[0]} слов, "
+          f"кандидатов {model.candidates.shape[0]}, размерность {model.vectors.shape[1]}")
+
+    pool = model.words[:min(len(model.words), 20000)]
+    timings, example = [], None
+    for i in range(args.boards):
+        words = random.sample(pool, 25)
+        colors = bytearray(DECK)
+        random.shuffle(colors)
+        revealed = sum(1 << j for j in random.sample(range(25), random.randint(0, 10)))
+        started = time.perf_counter()
+        clues = model.suggest(words, bytes(colors), revealed, random.choice((RED, BLUE)))
+        timings.append(time.perf_counter() - started)
+        example = example or clues
+    timings.sort()
+    ms = lambda q: timings[min(len(timings) - 1, int(len(timings) * q))] * 1000
+    print(f"Подсказка, мс: p50 {ms(0.5):.1f}  p90 {ms(0.9):.1f}  p99 {ms(0.99):.1f}  max {ms(1.0):.1f}")
+    for clue in example or ():
+        print(f"  {clue.word} {clue.count}: {', '.join(clue.targets)} ({clue.score:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('build', help='подготовить векторы')
+    p.add_argument('source', help='текстовый файл векторов')
+    p.add_argument('--lang', default='ru')
+    p.add_argument('--out', default='data/spymaster')
+    p.add_argument('--limit', type=int, default=100000, help='сколько слов взять')
+    p.add_argument('--dim', type=int, default=100, help='размерность после PCA')
+    p.add_argument('--strip-tags', action='store_true', help='отрезать _POS у слов')
+
+    p = sub.add_parser('bench', help='замерить подбор подсказки')
+    p.add_argument('--dir', default='data/spymaster')
+    p.add_argument('--lang', default='ru')
+    p.add_argument('--random', type=int, default=0, help='случайная матрица из N слов вместо файлов')
+    p.add_argument('--dim', type=int, default=100, help='размерность случайной матрицы')
+    p.add_argument('--candidates', type=int, default=0, help='кандидатов в подсказки (0 – все)')
+    p.add_argument('--boards', type=int, default=200)
+
+    args = parser.parse_args()
+    build(args) if args.command == 'build' else bench(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+# utils/cluster.py
+"""
+Многопроцессный режим: WORKERS процессов слушают один порт через SO_REUSEPORT
+
+Каждая комната принадлежит одному воркеру (shard_of). Воркер создаёт комнаты
+только со своим шардом, а запросы, попавшие не туда, идут к владельцу через
+unix-сокет: WebSocket проксируется, командам бота отвечают внутренние эндпоинты
+"""
+
+import os
+import sys
+import zlib
+import time
+import signal
+import asyncio
+import logging
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web, ClientSession, UnixConnector, WSMsgType
+
+logger = logging.getLogger(__name__)
+
+WORKERS = max(1, int(os.environ.get('WORKERS', 1)))
+WORKER_ID = int(os.environ.get('WORKER_ID', 0))
+SOCKET_DIR = os.environ.get('CLUSTER_SOCKET_DIR', tempfile.gettempdir())
+
+
+def shard_of(room_id: str, workers: int = WORKERS) -> int:
+    """Номер воркера-владельца комнаты"""
+    return zlib.crc32(room_id.encode('utf-8')) % workers
+
+
+def is_local(room_id: str) -> bool:
+    return WORKERS == 1 or shard_of(room_id) == WORKER_ID
+
+
+def socket_path(worker_id: int) -> str:
+    return os.path.join(SOCKET_DIR, f'codenames-worker-{worker_id}.sock')
+
+
+# ==================== КАНАЛ МЕЖДУ ВОРКЕРАМИ ====================
+
+_sessions: Dict[int, ClientSession] = {}
+
+
+def _session(worker_id: int) -> ClientSession:
+    session = _sessions.get(worker_id)
+    if session is None or session.closed:
+        session = ClientSession(connector=UnixConnector(path=socket_path(worker_id)))
+        _sessions[worker_id] = session
+    return session
+
+
+async def fetch_json(worker_id: int, path: str) -> Optional[Any]:
+    """GET к внутреннему эндпоинту воркера; None, если ответа нет"""
+    try:
+        async with _session(worker_id).get(f'http://worker{path}') as resp:
+            if resp.status == 404:
+                return None
+            resp.raise_for_status()
+            return await resp.json()
+    except Exception as e:
+        logger.error(f"❌ Воркер {worker_id} не ответил на {path}: {e}")
+        return None
+
+
+async def fetch_all(path: str) -> List[Any]:
+    """Опрашивает все остальные воркеры"""
+    others = [w for w in range(WORKERS) if w != WORKER_ID]
+    results = await asyncio.gather(*(fetch_json(w, path) for w in others))
+    return [r for r in results if r is not None]
+
+
+async def close_sessions():
+    for session in _sessions.values():
+        await session.close()
+    _sessions.clear()
+
+
+async def proxy_websocket(request: web.Request, room_id: str, compress: bool = True) -> web.WebSocketResponse:
+    """Пробрасывает WebSocket клиента воркеру-владельцу комнаты"""
+    owner = shard_of(room_id)
+    ws = web.WebSocketResponse(autoping=True, heartbeat=30, compress=compress)
+    await ws.prepare(request)
+
+    try:
+        # Между воркерами сжимать незачем
+        upstream = await _session(owner).ws_connect(f'http://worker{request.path_qs}', compress=0)
+    except Exception as e:
+        logger.error(f"❌ Воркер {owner} недоступен для комнаты {room_id}: {e}")
+        await ws.close(code=1011, message=b'Worker unavailable')
+        return ws
+
+    async def pump(source, target):
+        async for msg in source:
+            if msg.type == WSMsgType.TEXT:
+                await target.send_str(msg.data)
+            elif msg.type == WSMsgType.BINARY:
+                await target.send_bytes(msg.data)
+
+    tasks = [asyncio.create_task(pump(ws, upstream)), asyncio.create_task(pump(upstream, ws))]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if upstream.closed and not ws.closed:
+            await ws.close(code=upstream.close_code or 1000)
+        await upstream.close()
+        await ws.close()
+    return ws
+
+
+# ==================== ЗАПУСК ВОРКЕРОВ ====================
+
+def run_workers(script: str, workers: int = WORKERS):
+    """Супервизор: запускает воркеры и перезапускает упавшие"""
+    procs: Dict[int, subprocess.Popen] = {}
+
+    def spawn(worker_id: int):
+        env = dict(os.environ, WORKERS=str(workers), WORKER_ID=str(worker_id))
+        procs[worker_id] = subprocess.Popen([sys.executable, script], env=env)
+        logger.info(f"👷 Воркер {worker_id} запущен (pid {procs[worker_id].pid})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for proc in procs.values():
+            proc.send_signal(signal.SIGINT)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for worker_id in range(workers):
+        spawn(worker_id)
+
+    while not stopping:
+        pid, status = os.wait()
+        for worker_id, proc in list(procs.items()):
+            if proc.pid == pid and not stopping:
+                logger.error(f"❌ Воркер {worker_id} завершился ({status}), перезапускаем")
+                proc.returncode = status
+                time.sleep(1)
+                spawn(worker_id)
+
+    for proc in procs.values():
+        proc.wait()
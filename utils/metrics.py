@@ -0,0 +1,251 @@
+# utils/metrics.py
+"""
+Метрики в текстовом формате Prometheus
+Значения обновляются по месту событий, поэтому /metrics только печатает
+готовые числа: стоимость не зависит от числа комнат и соединений.
+Метрика с метками отдаёт дочерний объект через labels(...) – на горячем
+пути его лучше получить один раз и сохранить
+"""
+
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils import cluster
+
+logger = logging.getLogger(__name__)
+
+# Задержки от долей миллисекунды до секунд
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Глубины очередей
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], const: str) -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if const:
+        pairs.append(const)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+    """Общая часть: имя, описание, метки и дочерние серии"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values) -> 'Metric':
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: ожидались метки {self.labelnames}")
+            child = self._children[key] = self._child()
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def _series(self) -> Iterable[Tuple[Tuple[str, ...], object]]:
+        if not self.labelnames and () not in self._children:
+            self._children[()] = self._child()
+        return self._children.items()
+
+    def samples(self, const: str) -> List[str]:
+        lines = []
+        for key, child in self._series():
+            lines.extend(child.samples(self.name, _format_labels(self.labelnames, key, const)))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f'{name}{labels} {_format_value(self.value)}']
+
+
+class _CounterValue(_Value):
+    __slots__ = ()
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f'{name}_total{labels} {_format_value(self.value)}']
+
+
+class Counter(Metric):
+    """Монотонный счётчик (в выводе получает суффикс _total)"""
+
+    kind = 'counter'
+
+    def _child(self):
+        return _CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """Текущее значение; с func – вычисляется при выводе (func должна быть O(1))"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 func: Optional[Callable[[], float]] = None, registry: Optional['Registry'] = None):
+        super().__init__(name, documentation, labelnames, registry)
+        self.func = func
+
+    def _child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def samples(self, const: str) -> List[str]:
+        if self.func is not None:
+            self.labels().set(self.func())
+        return super().samples(const)
+
+
+class _HistogramValue:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        inner = labels[1:-1]
+        prefix = inner + ',' if inner else ''
+        lines = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            lines.append(f'{name}_bucket{{{prefix}le="{_format_value(bound)}"}} {total}')
+        lines.append(f'{name}_sum{labels} {_format_value(self.sum)}')
+        lines.append(f'{name}_count{labels} {self.count}')
+        return lines
+
+
+class Histogram(Metric):
+    """Распределение по фиксированным корзинам"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS, registry: Optional['Registry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> '_Timer':
+        return _Timer(self.labels())
+
+
+class _Timer:
+    """with histogram.time(): ..."""
+
+    __slots__ = ('child', 'start')
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Registry:
+    """Набор метрик процесса"""
+
+    def __init__(self, const_labels: Optional[Dict[str, str]] = None):
+        self.metrics: Dict[str, Metric] = {}
+        self.const = ','.join(f'{k}="{v}"' for k, v in (const_labels or {}).items())
+
+    def register(self, metric: Metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"метрика {metric.name} уже зарегистрирована")
+        self.metrics[metric.name] = metric
+
+    def collect(self) -> Dict[str, List[str]]:
+        """Строки значений по метрикам – для сборки вывода из нескольких воркеров"""
+        return {name: metric.samples(self.const) for name, metric in self.metrics.items()}
+
+    def render(self, others: Iterable[Dict[str, List[str]]] = ()) -> str:
+        collected = self.collect()
+        for other in others:
+            for name, lines in other.items():
+                if name in collected:
+                    collected[name].extend(lines)
+        out = []
+        for name, metric in self.metrics.items():
+            out.append(f'# HELP {name} {metric.documentation}')
+            out.append(f'# TYPE {name} {metric.kind}')
+            out.extend(collected[name])
+        return '\n'.join(out) + '\n'
+
+
+# В многопроцессном режиме каждая серия помечена номером воркера
+REGISTRY = Registry({'worker': str(cluster.WORKER_ID)} if cluster.WORKERS > 1 else None)
+
+EVENT_LOOP_LAG = Histogram(
+    'codenames_event_loop_lag_seconds',
+    'Опоздание цикла событий относительно запланированного пробуждения',
+)
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    """Фоновая задача: меряет, насколько позже срока просыпается sleep"""
+    loop = asyncio.get_running_loop()
+    lag = EVENT_LOOP_LAG.labels()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag.observe(max(0.0, loop.time() - start - interval))
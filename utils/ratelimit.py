@@ -0,0 +1,55 @@
+# utils/ratelimit.py
+"""
+Ведро токенов: rate токенов в секунду, не больше capacity про запас
+Ведро не спит само – оно говорит, сколько ждать, а ждёт вызывающий
+"""
+
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Ограничение частоты с допуском коротких всплесков"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic() if now is None else now
+        self.blocked_until = 0.0   # внешний запрет, например retry_after от сервера
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: Optional[float] = None, tokens: float = 1.0) -> float:
+        """Через сколько секунд можно будет взять tokens (0 – уже можно)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < tokens:
+            wait = max(wait, (tokens - self.tokens) / self.rate)
+        return wait
+
+    def try_take(self, now: Optional[float] = None, tokens: float = 1.0) -> bool:
+        now = time.monotonic() if now is None else now
+        if self.delay(now, tokens) > 0:
+            return False
+        self.tokens -= tokens
+        return True
+
+    def block(self, seconds: float, now: Optional[float] = None):
+        """Запрещает брать токены ещё seconds секунд"""
+        now = time.monotonic() if now is None else now
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = now
+
+    def idle(self, now: Optional[float] = None) -> bool:
+        """Ведро полное и не заблокировано – его можно забыть"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        return self.tokens >= self.capacity and now >= self.blocked_until
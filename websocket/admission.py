@@ -0,0 +1,233 @@
+"""
+Допуск к /ws и ограничение частоты действий
+Подключение проверяется до рукопожатия: общий лимит воркера, лимит соединений
+и частоты подключений с одного IP, лимит игроков комнаты. Отказ – короткий
+HTTP 429/503 без апгрейда.
+Каждое входящее сообщение сначала платит токен из ведра соединения – ещё до
+разбора JSON. Действие доплачивает свою цену (сброс партии дороже клика) из того
+же ведра и только потом платит её из общего ведра комнаты: комната пропускает
+втрое больше, чем одно соединение, так что один игрок её не забьёт.
+Об отказе клиент узнаёт из заранее закодированного кадра error – один раз
+на серию, а кто продолжает слать, отключается. Весь учёт – словари
+и вёдра токенов, O(1) на сообщение.
+IP берётся из X-Forwarded-For, только если WS_PROXY_HOPS > 0: без прокси
+заголовок пишет сам клиент
+"""
+
+import os
+import time
+import logging
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from utils.metrics import Counter
+from utils.ratelimit import TokenBucket
+from websocket.frames import encode
+
+logger = logging.getLogger(__name__)
+
+# Соединений на воркер, с одного IP и игроков в комнате (зрителей ограничивает MAX_SPECTATORS)
+WS_MAX_CONNECTIONS = int(os.environ.get('WS_MAX_CONNECTIONS', 10000))
+WS_MAX_PER_IP = int(os.environ.get('WS_MAX_PER_IP', 30))
+WS_MAX_PER_ROOM = int(os.environ.get('WS_MAX_PER_ROOM', 20))
+# Новых подключений в секунду с одного IP
+WS_CONNECT_RATE = float(os.environ.get('WS_CONNECT_RATE', 2))
+WS_CONNECT_BURST = float(os.environ.get('WS_CONNECT_BURST', 10))
+# Сообщений в секунду от одного соединения (включая ping)
+WS_MESSAGE_RATE = float(os.environ.get('WS_MESSAGE_RATE', 10))
+WS_MESSAGE_BURST = float(os.environ.get('WS_MESSAGE_BURST', 20))
+# Стоимость действий в секунду на комнату, см. ACTION_COST; должна быть заметно
+# больше WS_MESSAGE_RATE, иначе один игрок выберет ведро комнаты целиком
+WS_ROOM_ACTION_RATE = float(os.environ.get('WS_ROOM_ACTION_RATE', 30))
+WS_ROOM_ACTION_BURST = float(os.environ.get('WS_ROOM_ACTION_BURST', 60))
+# Сколько отказов подряд терпим, прежде чем отключить
+WS_MAX_STRIKES = int(os.environ.get('WS_MAX_STRIKES', 50))
+# Сколько доверенных прокси перед сервером дописывают X-Forwarded-For
+# (на Render – один); 0 – заголовку не верим, адрес берём из сокета
+WS_PROXY_HOPS = int(os.environ.get('WS_PROXY_HOPS', 0))
+# Предельный размер входящего сообщения, байт
+WS_MAX_MESSAGE_BYTES = int(os.environ.get('WS_MAX_MESSAGE_BYTES', 4096))
+
+# Сброс перестраивает и рассылает всё поле, подсказчик считает векторы
+ACTION_COST = {'reset_game': 10, 'auto_hint': 5, 'suggest_hints': 5}
+MAX_IP_ENTRIES = 10000
+
+WS_REJECTED = Counter('codenames_ws_rejected', 'Отказы в подключении к /ws', ['reason'])
+WS_THROTTLED = Counter('codenames_ws_throttled', 'Сообщения, отброшенные лимитом частоты', ['scope'])
+WS_KICKED = Counter('codenames_ws_kicked', 'Соединения, отключённые за превышение лимитов')
+
+_throttled_connection = WS_THROTTLED.labels('connection')
+_throttled_room = WS_THROTTLED.labels('room')
+_kicked = WS_KICKED.labels()
+
+# Отказы готовы заранее: кадр кодируется один раз на весь процесс
+THROTTLED = encode({'type': 'error', 'message': 'Too many messages'})
+ROOM_THROTTLED = encode({'type': 'error', 'message': 'Room is too busy'})
+
+_REJECTIONS = {
+    'server_full': (503, b'Server is full'),
+    'ip_connections': (429, b'Too many connections'),
+    'ip_rate': (429, b'Too many connection attempts'),
+    'room_full': (503, b'Room is full'),
+}
+
+
+class AdmissionRejected(Exception):
+    """Подключение не допущено; reason – ключ _REJECTIONS"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+    def response(self) -> web.Response:
+        status, body = _REJECTIONS[self.reason]
+        return web.Response(status=status, body=body, headers={'Retry-After': '1'})
+
+
+class _Client:
+    """Соединения и частота подключений одного IP"""
+
+    __slots__ = ('connections', 'bucket')
+
+    def __init__(self, rate: float, burst: float):
+        self.connections = 0
+        self.bucket = TokenBucket(rate, burst)
+
+
+class _Room:
+    __slots__ = ('connections', 'bucket')
+
+    def __init__(self, rate: float, burst: float):
+        self.connections = 0
+        self.bucket = TokenBucket(rate, burst)
+
+
+class Ticket:
+    """Допуск одного соединения: что освободить при отключении и его ведро сообщений"""
+
+    __slots__ = ('ip', 'room_id', 'bucket', 'strikes')
+
+    def __init__(self, ip: Optional[str], room_id: Optional[str], rate: float, burst: float):
+        self.ip = ip
+        self.room_id = room_id
+        self.bucket = TokenBucket(rate, burst)
+        self.strikes = 0   # отказов подряд
+
+
+class Admission:
+    """Лимиты подключений и частоты сообщений одного воркера"""
+
+    def __init__(self, max_connections: int = WS_MAX_CONNECTIONS, max_per_ip: int = WS_MAX_PER_IP,
+                 max_per_room: int = WS_MAX_PER_ROOM, max_strikes: int = WS_MAX_STRIKES):
+        self.max_connections = max_connections
+        self.max_per_ip = max_per_ip
+        self.max_per_room = max_per_room
+        self.max_strikes = max_strikes
+        self.connections = 0
+        self.clients: Dict[str, _Client] = {}
+        self.rooms: Dict[str, _Room] = {}
+
+    def _client(self, ip: str) -> _Client:
+        client = self.clients.get(ip)
+        if client is None:
+            if len(self.clients) >= MAX_IP_ENTRIES:
+                now = time.monotonic()
+                for key in [k for k, c in self.clients.items() if not c.connections and c.bucket.idle(now)]:
+                    del self.clients[key]
+            client = self.clients[ip] = _Client(WS_CONNECT_RATE, WS_CONNECT_BURST)
+        return client
+
+    def admit(self, ip: Optional[str], room_id: Optional[str]) -> Ticket:
+        """
+        Учитывает новое соединение или бросает AdmissionRejected.
+        ip=None – соединение уже проверил воркер, который его принял;
+        room_id=None – комната живёт в другом воркере, её лимит проверит владелец
+        """
+        client = room = None
+        if ip is not None:
+            if self.connections >= self.max_connections:
+                raise self._reject('server_full')
+            client = self._client(ip)
+            if client.connections >= self.max_per_ip:
+                raise self._reject('ip_connections')
+            if not client.bucket.try_take():
+                raise self._reject('ip_rate')
+        if room_id is not None:
+            room = self.rooms.get(room_id)
+            if room is None:
+                room = self.rooms[room_id] = _Room(WS_ROOM_ACTION_RATE, WS_ROOM_ACTION_BURST)
+            elif room.connections >= self.max_per_room:
+                raise self._reject('room_full')
+            room.connections += 1
+        if client is not None:
+            client.connections += 1
+            self.connections += 1
+        return Ticket(ip, room_id, WS_MESSAGE_RATE, WS_MESSAGE_BURST)
+
+    @staticmethod
+    def _reject(reason: str) -> AdmissionRejected:
+        WS_REJECTED.labels(reason).inc()
+        return AdmissionRejected(reason)
+
+    def release(self, ticket: Ticket):
+        if ticket.ip is not None:
+            self.connections -= 1
+            self.clients[ticket.ip].connections -= 1
+        if ticket.room_id is not None:
+            room = self.rooms[ticket.room_id]
+            room.connections -= 1
+            if not room.connections:
+                del self.rooms[ticket.room_id]
+
+    def _strike(self, ticket: Ticket) -> bool:
+        ticket.strikes += 1
+        if ticket.strikes == self.max_strikes:
+            _kicked.inc()
+            logger.warning(f"🚫 Отключаем соединение ({ticket.ip or 'через воркер'}, комната {ticket.room_id}): "
+                           f"{ticket.strikes} отказов подряд")
+        return ticket.strikes == 1
+
+    def allow_message(self, ticket: Ticket, conn) -> bool:
+        """Любое входящее сообщение – до разбора JSON"""
+        if ticket.bucket.try_take():
+            if ticket.strikes and ticket.bucket.tokens >= ticket.bucket.capacity - 1:
+                ticket.strikes = 0  # клиент притих – серия отказов закончилась
+            return True
+        _throttled_connection.inc()
+        if self._strike(ticket):
+            conn.send(THROTTLED)
+        return False
+
+    def allow_action(self, ticket: Ticket, action: str, conn) -> bool:
+        """
+        Действие с комнатой – по его цене: сначала из ведра соединения
+        (токен за само сообщение уже взял allow_message), затем из ведра комнаты
+        """
+        cost = ACTION_COST.get(action, 1)
+        if cost > 1 and not ticket.bucket.try_take(tokens=cost - 1):
+            _throttled_connection.inc()
+            if self._strike(ticket):
+                conn.send(THROTTLED)
+            return False
+        room = self.rooms.get(ticket.room_id)
+        if room is None or room.bucket.try_take(tokens=cost):
+            ticket.strikes = 0
+            return True
+        _throttled_room.inc()
+        if self._strike(ticket):
+            conn.send(ROOM_THROTTLED)
+        return False
+
+    def kicked(self, ticket: Ticket) -> bool:
+        return ticket.strikes >= self.max_strikes
+
+
+def client_ip(request: web.Request, hops: int = WS_PROXY_HOPS) -> str:
+    """Адрес клиента: за прокси – запись X-Forwarded-For, которую дописал ближайший доверенный"""
+    if hops:
+        forwarded = request.headers.get('X-Forwarded-For')
+        if forwarded:
+            chain = [part.strip() for part in forwarded.split(',')]
+            return chain[-hops] if len(chain) >= hops else chain[0]
+    return request.remote or ''
@@ -0,0 +1,256 @@
+"""
+Рассылка сообщений по соединениям комнаты
+У каждого соединения своя ограниченная очередь и своя задача-писатель,
+поэтому медленный клиент не задерживает остальных игроков.
+Каждая рассылка получает номер seq и попадает в кольцевой буфер,
+из которого переподключившийся клиент дочитывает пропущенное. Рассылка
+с полным состоянием (сброс партии) буфер очищает: всё, что было до неё,
+клиенту уже не нужно.
+Зрители живут отдельно (websocket/spectators.py) и получают рассылки пачками
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from collections import deque
+from itertools import islice
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+from aiohttp import WSMsgType
+
+from utils.metrics import Counter, Gauge, Histogram, DEPTH_BUCKETS
+from websocket.frames import Frame, encode
+from websocket.spectators import SpectatorStream
+
+logger = logging.getLogger(__name__)
+
+# Сколько сообщений может ждать отправки одному клиенту
+SEND_QUEUE_SIZE = int(os.environ.get('WS_SEND_QUEUE_SIZE', 64))
+# Сколько секунд ждём, пока клиент примет одно сообщение
+SEND_TIMEOUT = float(os.environ.get('WS_SEND_TIMEOUT', 10))
+# Что делать с отстающим клиентом:
+#   disconnect – закрыть соединение, клиент переподключится и получит init
+#   drop       – выбросить самое старое сообщение из очереди
+# По умолчанию отключаем: потерянный card_revealed рассинхронизирует поле
+SLOW_CLIENT_POLICY = os.environ.get('WS_SLOW_CLIENT_POLICY', 'disconnect')
+# Сколько последних рассылок помнить для переподключений (?since=<seq>):
+# примерно ход – подсказка, клики и смена хода; кто отстал сильнее, получит init
+HISTORY_SIZE = int(os.environ.get('WS_HISTORY_SIZE', 32))
+
+WS_CONNECTIONS = Gauge('codenames_ws_connections', 'Открытые WebSocket-соединения')
+WS_MESSAGES = Counter('codenames_ws_messages', 'WebSocket-сообщения', ['direction'])
+WS_BYTES = Counter('codenames_ws_bytes', 'Байты полезной нагрузки WebSocket', ['direction'])
+SEND_QUEUE_DEPTH = Gauge('codenames_ws_send_queue_depth', 'Сообщения, ждущие отправки во всех очередях')
+SEND_QUEUE_DEPTH_ON_ENQUEUE = Histogram(
+    'codenames_ws_send_queue_depth_on_enqueue',
+    'Глубина очереди соединения в момент постановки сообщения',
+    buckets=DEPTH_BUCKETS,
+)
+SLOW_CLIENTS = Counter('codenames_ws_slow_clients', 'Отстающие клиенты по принятому решению', ['policy'])
+
+_queued = SEND_QUEUE_DEPTH.labels()
+_depth_on_enqueue = SEND_QUEUE_DEPTH_ON_ENQUEUE.labels()
+_messages_out = WS_MESSAGES.labels('out')
+_bytes_out = WS_BYTES.labels('out')
+
+
+class Connection:
+    """WebSocket-соединение с собственной очередью исходящих сообщений"""
+
+    def __init__(self, ws, role: str = 'agent',
+                 queue_size: int = SEND_QUEUE_SIZE,
+                 policy: str = SLOW_CLIENT_POLICY,
+                 send_timeout: float = SEND_TIMEOUT,
+                 binary: bool = False):
+        self.ws = ws
+        self.role = role
+        self.binary = binary  # клиент понимает бинарный протокол (?proto=bin)
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.dropped = 0
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._stopped = False
+        self._writer = asyncio.create_task(self._write_loop())
+        self._writer.add_done_callback(self._writer_done)
+
+    @property
+    def closed(self) -> bool:
+        return self._stopped or self.ws.closed or self._writer.done()
+
+    def _writer_done(self, task: asyncio.Task):
+        # Неотправленное больше не ждёт отправки
+        self._stopped = True
+        _queued.dec(self.queue.qsize())
+
+    def send(self, message: Union[Dict, Frame]) -> bool:
+        """Ставит сообщение в очередь, не дожидаясь отправки"""
+        if self.closed:
+            return False
+        frame = message if isinstance(message, Frame) else encode(message)
+        _depth_on_enqueue.observe(self.queue.qsize())
+        try:
+            self.queue.put_nowait(frame)
+            _queued.inc()
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        SLOW_CLIENTS.labels(self.policy).inc()
+        if self.policy == 'drop':
+            self.queue.get_nowait()
+            self.queue.put_nowait(frame)
+            self.dropped += 1
+            return True
+
+        logger.warning(f"🐢 Клиент не успевает за рассылкой ({self.queue.qsize()} в очереди), отключаем")
+        self.close()
+        return False
+
+    async def _write_loop(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                _queued.dec()
+                payload = frame.binary if self.binary and frame.binary is not None else frame.data
+                opcode = WSMsgType.BINARY if payload is frame.binary else WSMsgType.TEXT
+                await asyncio.wait_for(self.ws.send_frame(payload, opcode), self.send_timeout)
+                _messages_out.inc()
+                _bytes_out.inc(len(payload))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка отправки, закрываем соединение: {e!r}")
+            if not self.ws.closed:
+                await self.ws.close()
+
+    def close(self):
+        """Останавливает писателя и закрывает сокет"""
+        self._stopped = True
+        self._writer.cancel()
+        if not self.ws.closed:
+            asyncio.create_task(self.ws.close())
+
+
+class RoomBroadcaster:
+    """Набор соединений комнаты с неблокирующей рассылкой"""
+
+    def __init__(self, room_id: str, queue_size: int = SEND_QUEUE_SIZE,
+                 policy: str = SLOW_CLIENT_POLICY, history_size: int = HISTORY_SIZE):
+        self.room_id = room_id
+        self.queue_size = queue_size
+        self.policy = policy
+        self.connections: List[Connection] = []
+        self.spectators = SpectatorStream(room_id)
+        # epoch меняется при пересоздании комнаты (например, после перезапуска),
+        # чтобы старый seq клиента не совпал случайно с новым журналом
+        self.epoch = uuid.uuid4().hex[:8]
+        self.seq = 0
+        # Только JSON-байты: при дочитывании бинарным клиентам уходит текстовый кадр
+        self.history: Deque[Tuple[int, bytes]] = deque(maxlen=history_size)
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    def __iter__(self):
+        return iter(self.connections)
+
+    def add(self, ws, role: str = 'agent', binary: bool = False) -> Connection:
+        conn = Connection(ws, role, queue_size=self.queue_size, policy=self.policy, binary=binary)
+        self.connections.append(conn)
+        WS_CONNECTIONS.inc()
+        return conn
+
+    def add_spectator(self, ws, binary: bool = False) -> Optional[Connection]:
+        """Зритель; None, если комната уже набрала максимум зрителей"""
+        if self.spectators.full:
+            return None
+        conn = Connection(ws, 'spectator', queue_size=self.queue_size, policy=self.policy, binary=binary)
+        self.spectators.add(conn)
+        return conn
+
+    def remove(self, conn: Connection) -> bool:
+        if conn.role == 'spectator':
+            return self.spectators.remove(conn)
+        if conn not in self.connections:
+            return False
+        self.connections.remove(conn)
+        WS_CONNECTIONS.dec()
+        conn.close()
+        return True
+
+    def _record(self, messages: Dict[str, Dict], default: str = 'agent',
+                full_state: bool = False) -> Dict[str, Frame]:
+        """
+        Нумерует рассылку, кодирует каждый вариант один раз и кладёт в журнал.
+        Варианты по ролям бывают только у рассылок с полным состоянием,
+        а они журнал очищают – поэтому в журнале всегда один вариант
+        """
+        self.seq += 1
+        frames = {role: encode(dict(message, seq=self.seq)) for role, message in messages.items()}
+        if full_state:
+            self.history.clear()
+        else:
+            # Копия: bytes от orjson держат буфер около килобайта, сколько бы ни вышло JSON
+            self.history.append((self.seq, bytes(memoryview(frames[default].data))))
+        # Зрителям – то же, что агентам, но в следующем тике
+        if self.spectators or self.spectators.delayed:
+            self.spectators.push(dict(messages.get('spectator', messages[default]), seq=self.seq))
+        return frames
+
+    def replay(self, since: int, epoch: Optional[str], role: str) -> Optional[List[Frame]]:
+        """
+        Рассылки после since для роли или None, если журнал их уже не покрывает
+        и клиенту нужен полный снимок. Зритель при задержке дочитывает только
+        до seq своего отложенного вида
+        """
+        last = self.seq
+        if role == 'spectator':
+            view = self.spectators.delayed_view()
+            if view is not None:
+                last = view[1]
+        if epoch != self.epoch or since > last or since < 0:
+            return None
+        if since == last:
+            return []
+        if not self.history or self.history[0][0] > since + 1:
+            return None
+        start = since + 1 - self.history[0][0]
+        return [Frame(data) for _, data in islice(self.history, start, start + last - since)]
+
+    def broadcast(self, message: Dict, exclude: Optional[Connection] = None) -> int:
+        """
+        Рассылает сообщение всем соединениям комнаты
+        Сообщение кодируется один раз, отправка идёт параллельно в задачах-писателях
+        """
+        frame = self._record({'agent': message})['agent']
+        sent = 0
+        for conn in list(self.connections):
+            if conn is exclude:
+                continue
+            if conn.closed:
+                self.remove(conn)
+            elif conn.send(frame):
+                sent += 1
+        return sent
+
+    def broadcast_by_role(self, messages: Dict[str, Dict], default: str = 'agent') -> int:
+        """
+        Рассылает каждому соединению сообщение для его роли, кодируя каждый вариант один раз.
+        Варианты по ролям – это полное состояние, так что журнал до него не нужен
+        """
+        frames = self._record(messages, default, full_state=True)
+        sent = 0
+        for conn in list(self.connections):
+            if conn.closed:
+                self.remove(conn)
+            elif conn.send(frames.get(conn.role, frames[default])):
+                sent += 1
+        return sent
+
+    def close_all(self):
+        self.spectators.close_all()
+        for conn in self.connections:
+            conn.close()
+        WS_CONNECTIONS.dec(len(self.connections))
+        self.connections.clear()
@@ -0,0 +1,104 @@
+"""
+Сериализация исходящих сообщений
+Сообщение кодируется один раз в кадр, который разделяют все получатели.
+Частые мелкие сообщения дополнительно кодируются в компактный бинарный
+вид для клиентов с ?proto=bin:
+
+    card_revealed  01 | seq u32 | index u8 | color u8 | red_score u8 | blue_score u8
+    turn_switch    02 | seq u32 | current_team u8
+    game_over      03 | seq u32 | winner u8 (255 – нет)
+    pong           04
+
+Числа little-endian, цвета и команды – индексы в COLOR_NAMES и TEAMS
+"""
+
+import os
+import json
+import struct
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from game.state import COLOR_NAMES
+
+logger = logging.getLogger(__name__)
+
+# auto – orjson, если установлен, иначе стандартный json
+JSON_BACKEND = os.environ.get('JSON_BACKEND', 'auto')
+
+
+def _select_backend(name: str) -> Tuple[str, Callable[[Any], bytes], Callable]:
+    """Выбирает JSON-библиотеку при старте процесса"""
+    if name in ('auto', 'orjson'):
+        try:
+            import orjson
+            return 'orjson', orjson.dumps, orjson.loads
+        except ImportError:
+            if name == 'orjson':
+                logger.warning("⚠️ orjson не установлен, используем json")
+
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    return 'json', lambda obj: encoder.encode(obj).encode('utf-8'), json.loads
+
+
+backend_name, dumps, loads = _select_backend(JSON_BACKEND)
+
+
+TEAMS = ('red', 'blue')
+_NONE = 255
+
+# тип -> (код, формат, поля)
+_LAYOUTS = {
+    'card_revealed': (1, struct.Struct('<BIBBBB'), ('seq', 'index', 'color', 'red_score', 'blue_score')),
+    'turn_switch': (2, struct.Struct('<BIB'), ('seq', 'current_team')),
+    'game_over': (3, struct.Struct('<BIB'), ('seq', 'winner')),
+    'pong': (4, struct.Struct('<B'), ()),
+}
+_BY_CODE = {code: (name, layout, fields) for name, (code, layout, fields) in _LAYOUTS.items()}
+_ENUMS = {'color': COLOR_NAMES, 'current_team': TEAMS, 'winner': TEAMS}
+
+
+def encode_binary(message: Dict) -> Optional[bytes]:
+    """Бинарный вид сообщения или None, если для него нет раскладки"""
+    spec = _LAYOUTS.get(message.get('type'))
+    if spec is None:
+        return None
+    code, layout, fields = spec
+    if len(message) != len(fields) + 1:
+        return None  # лишние поля бинарно не передать – отправим JSON
+    try:
+        values = []
+        for field in fields:
+            value = message[field]
+            if field in _ENUMS:
+                value = _NONE if value is None else _ENUMS[field].index(value)
+            values.append(value)
+        return layout.pack(code, *values)
+    except (KeyError, ValueError, struct.error):
+        return None
+
+
+def decode_binary(data: bytes) -> Dict:
+    name, layout, fields = _BY_CODE[data[0]]
+    message = {'type': name}
+    for field, value in zip(fields, layout.unpack(data)[1:]):
+        if field in _ENUMS:
+            value = None if value == _NONE else _ENUMS[field][value]
+        message[field] = value
+    return message
+
+
+class Frame:
+    """Закодированное сообщение: JSON для текстового кадра и, если есть, бинарный вид"""
+
+    __slots__ = ('data', 'binary')
+
+    def __init__(self, data: bytes, binary: Optional[bytes] = None):
+        self.data = data
+        self.binary = binary
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+def encode(message: Dict) -> Frame:
+    return Frame(dumps(message), encode_binary(message))
@@ -2,12 +2,14 @@
 
 import json
 import asyncio
+import logging
 from datetime import datetime
 from aiohttp import web
-from game.room import GameRoom
+from game.room import active_rooms
+from websocket.broadcaster import Connection
+
+logger = logging.getLogger(__name__)
 
-# Глобальное хранилище (будет в main.py)
-active_rooms = {}
 
 async def websocket_handler(request):
     ws = web.WebSocketResponse()
@@ -35,29 +37,30 @@ async def websocket_handler(request):
         await ws.close(code=1008, message=b'User not in room')
         return ws
 
-    room.ws_connections.append(ws)
+    conn = room.broadcaster.add(ws, room.get_player_role(uid) or 'agent')
 
     try:
         # Отправляем состояние для этого конкретного игрока
-        await ws.send_json({
+        conn.send({
             'type': 'init',
-            'game_state': room.get_game_state_for_player(uid)
+            'game_state': room.get_game_state_for_player(uid),
+            'seq': room.broadcaster.seq,
+            'epoch': room.broadcaster.epoch
         })
 
         # ... обработка сообщений (click_card и т.д.) ...
     finally:
-        if ws in room.ws_connections:
-            room.ws_connections.remove(ws)
+        room.broadcaster.remove(conn)
     return ws
 
-async def handle_websocket_message(room_id: str, user_id: int, message: str, ws: web.WebSocketResponse):
+async def handle_websocket_message(room_id: str, user_id: int, message: str, conn: Connection):
     """Обработка сообщений от клиента"""
     try:
         data = json.loads(message)
         action = data.get('action')
         
         if room_id not in active_rooms:
-            await ws.send_json({'type': 'error', 'message': 'Room not found'})
+            conn.send({'type': 'error', 'message': 'Room not found'})
             return
         
         room = active_rooms[room_id]
@@ -67,89 +70,70 @@ async def handle_websocket_message(room_id: str, user_id: int, message: str, ws:
             if index is None:
                 return
             
-            result = room.reveal_card(index, user_id)
-            
-            if 'error' in result:
-                await ws.send_json({'type': 'error', 'message': result['error']})
-                return
-            
-            # Рассылаем обновление всем игрокам
-            await broadcast_to_room(room_id, {
-                'type': 'card_revealed',
-                'index': result['index'],
-                'color': result['color'],
-                'user_id': user_id,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Если игра окончена
-            if result['game_over']:
-                await broadcast_to_room(room_id, {
-                    'type': 'game_over',
-                    'winner': result['winner'],
-                    'game_state': room.get_game_state_for_player(user_id),
-                    'timestamp': datetime.now().isoformat()
-                })
-                
-                # Удаляем комнату через 30 секунд
-                asyncio.create_task(cleanup_room_after_delay(room_id, 30))
-            
-            # Переключаем команду, если нужно
-            elif result['color'] not in [room.game_state['current_team'], 'neutral', 'black']:
-                room.switch_team()
-                
-                await broadcast_to_room(room_id, {
-                    'type': 'turn_switch',
-                    'current_team': room.game_state['current_team'],
-                    'current_turn': room.game_state['current_turn'],
-                    'timestamp': datetime.now().isoformat()
-                })
+            # Ход применяет актор комнаты – строго после предыдущих действий
+            if not room.actor.submit(apply_click_card, room, user_id, index, conn):
+                conn.send({'type': 'error', 'message': 'Room busy'})
         
         elif action == 'get_state':
             # Отправляем состояние для конкретного пользователя
             game_state = room.get_game_state_for_player(user_id)
-            await ws.send_json({
+            conn.send({
                 'type': 'state_update',
                 'game_state': game_state,
                 'timestamp': datetime.now().isoformat()
             })
         
         elif action == 'ping':
-            await ws.send_json({
+            conn.send({
                 'type': 'pong',
                 'timestamp': datetime.now().isoformat()
             })
     
     except json.JSONDecodeError:
-        await ws.send_json({'type': 'error', 'message': 'Invalid JSON'})
+        conn.send({'type': 'error', 'message': 'Invalid JSON'})
     except Exception as e:
-        print(f"Error handling message: {e}")
-        await ws.send_json({'type': 'error', 'message': 'Internal server error'})
+        logger.error(f"❌ Ошибка обработки сообщения: {e}")
+        conn.send({'type': 'error', 'message': 'Internal server error'})
 
-async def broadcast_to_room(room_id: str, message: dict, exclude_ws=None):
-    """Рассылка сообщения всем в комнате"""
-    if room_id not in active_rooms:
+def apply_click_card(room, user_id: int, index: int, conn: Connection):
+    """Открывает карточку и рассылает результат (вызывается актором комнаты)"""
+    result = room.reveal_card(index, user_id)
+    
+    if 'error' in result:
+        conn.send({'type': 'error', 'message': result['error']})
         return
     
-    room = active_rooms[room_id]
-    disconnected = []
+    # Рассылаем обновление всем игрокам
+    room.broadcaster.broadcast({
+        'type': 'card_revealed',
+        'index': result['index'],
+        'color': result['color'],
+        'user_id': user_id,
+        'timestamp': datetime.now().isoformat()
+    })
     
-    for ws in room.ws_connections:
-        if ws == exclude_ws:
-            continue
-            
-        if not ws.closed:
-            try:
-                await ws.send_json(message)
-            except:
-                disconnected.append(ws)
-        else:
-            disconnected.append(ws)
+    # Если игра окончена
+    if result['game_over']:
+        room.broadcaster.broadcast({
+            'type': 'game_over',
+            'winner': result['winner'],
+            'game_state': room.get_game_state_for_player(user_id),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+        # Удаляем комнату через 30 секунд
+        asyncio.create_task(cleanup_room_after_delay(room.room_id, 30))
     
-    # Удаляем отключённые соединения
-    for ws in disconnected:
-        if ws in room.ws_connections:
-            room.ws_connections.remove(ws)
+    # Переключаем команду, если нужно
+    elif result['color'] not in [room.game_state.current_team.value, 'neutral', 'black']:
+        room.switch_team()
+        
+        room.broadcaster.broadcast({
+            'type': 'turn_switch',
+            'current_team': room.game_state.current_team.value,
+            'current_turn': room.game_state.current_turn,
+            'timestamp': datetime.now().isoformat()
+        })
 
 async def cleanup_room_after_delay(room_id: str, delay_seconds: int):
     """Удаляет комнату через указанное время"""
@@ -157,6 +141,6 @@ async def cleanup_room_after_delay(room_id: str, delay_seconds: int):
     
     if room_id in active_rooms:
         room = active_rooms[room_id]
-        if not room.ws_connections:
+        if not len(room.broadcaster):
             room.cleanup()
             del active_rooms[room_id]
\ No newline at end of file
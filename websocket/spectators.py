@@ -0,0 +1,158 @@
+"""
+Зрители комнаты
+Зрители не входят в рассылку игроков: broadcast только откладывает сообщение
+в буфер, а раз в tick отдельная задача собирает накопленное (старше delay)
+в один кадр batch и раздаёт его зрителям. Кадр кодируется один раз на всех,
+а обход большого списка зрителей прерывается, чтобы цикл событий успевал
+обслуживать игроков.
+При задержке поток ведёт и «отложенный вид»: снимок состояния и seq последнего
+отданного зрителям события. Из него новый зритель получает init, а переподключение
+дочитывает журнал только до этого seq – иначе задержку можно обойти
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from utils.metrics import Gauge, Histogram
+from websocket.frames import encode
+
+logger = logging.getLogger(__name__)
+
+# Раз в сколько секунд зрители получают накопленные события
+SPECTATOR_TICK = float(os.environ.get('SPECTATOR_TICK', 0.1))
+# Задержка трансляции для зрителей, с (0 – без задержки)
+SPECTATOR_DELAY = float(os.environ.get('SPECTATOR_DELAY', 0))
+# Сколько зрителей может смотреть одну комнату
+MAX_SPECTATORS = int(os.environ.get('MAX_SPECTATORS', 5000))
+# Сколько соединений обходить подряд, не отдавая управление циклу событий
+FANOUT_CHUNK = 50
+
+SPECTATORS = Gauge('codenames_ws_spectators', 'Зрители во всех комнатах')
+SPECTATOR_FANOUT = Histogram('codenames_spectator_fanout_seconds', 'Раздача одного кадра batch всем зрителям комнаты')
+
+_spectators = SPECTATORS.labels()
+_fanout = SPECTATOR_FANOUT.labels()
+
+
+class SpectatorStream:
+    """Зрители одной комнаты и их поток событий с батчингом по тикам"""
+
+    def __init__(self, room_id: str, tick: float = SPECTATOR_TICK, delay: float = SPECTATOR_DELAY,
+                 limit: int = MAX_SPECTATORS):
+        self.room_id = room_id
+        self.tick = tick
+        self.delay = delay
+        self.limit = limit
+        self.connections: List = []
+        # (когда разослано игрокам, сообщение с seq, снимок состояния после него)
+        self.pending: Deque[Tuple[float, Dict, Optional[bytes]]] = deque()
+        self._task: Optional[asyncio.Task] = None
+        # Отложенный вид, см. watch
+        self._snapshot: Optional[Callable[[], bytes]] = None
+        self.view: Optional[bytes] = None
+        self.view_seq = 0
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    @property
+    def full(self) -> bool:
+        return len(self.connections) >= self.limit
+
+    def add(self, conn):
+        self.connections.append(conn)
+        _spectators.inc()
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def remove(self, conn) -> bool:
+        if conn not in self.connections:
+            return False
+        self.connections.remove(conn)
+        _spectators.dec()
+        conn.close()
+        return True
+
+    @property
+    def delayed(self) -> bool:
+        """Ведётся отложенный вид: события копятся, даже пока зрителей нет"""
+        return self.delay > 0 and self._snapshot is not None
+
+    def watch(self, snapshot: Callable[[], bytes], seq: int):
+        """snapshot – текущее состояние для зрителя в JSON; нужен только при задержке"""
+        if self.delay > 0:
+            self._snapshot = snapshot
+            self.view, self.view_seq = snapshot(), seq
+
+    def push(self, message: Dict):
+        """Сообщение игрокам уже ушло – зрители получат его в ближайшем тике"""
+        now = time.monotonic()
+        if self.delayed:
+            if self._task is None:
+                self._take_due(now)  # некому раздавать – просто сдвигаем вид
+            self.pending.append((now, message, self._snapshot()))
+        else:
+            self.pending.append((now, message, None))
+
+    def _take_due(self, now: float) -> List[Dict]:
+        due = []
+        while self.pending and now - self.pending[0][0] >= self.delay:
+            _, message, snapshot = self.pending.popleft()
+            due.append(message)
+            if snapshot is not None:
+                self.view, self.view_seq = snapshot, message['seq']
+        return due
+
+    def delayed_view(self) -> Optional[Tuple[bytes, int]]:
+        """
+        Снимок и seq, которые зрители видят сейчас; None – задержки нет
+        и годится живое состояние. Пока работает раздача, вид сдвигает только она,
+        чтобы новый зритель получил следующий batch без пропусков
+        """
+        if not self.delayed:
+            return None
+        if self._task is None:
+            self._take_due(time.monotonic())
+        return self.view, self.view_seq
+
+    async def _run(self):
+        try:
+            while self.connections:
+                await asyncio.sleep(self.tick)
+                messages = self._take_due(time.monotonic())
+                if not messages:
+                    continue
+                try:
+                    await self._fanout(encode({'type': 'batch', 'messages': messages}))
+                except Exception as e:
+                    logger.error(f"❌ Комната {self.room_id}: ошибка рассылки зрителям: {e}")
+        finally:
+            self._task = None
+            if not self.delayed:
+                self.pending.clear()
+
+    async def _fanout(self, frame):
+        started = time.perf_counter()
+        connections = list(self.connections)
+        for start in range(0, len(connections), FANOUT_CHUNK):
+            if start:
+                await asyncio.sleep(0)
+            for conn in connections[start:start + FANOUT_CHUNK]:
+                if conn.closed:
+                    self.remove(conn)
+                else:
+                    conn.send(frame)
+        _fanout.observe(time.perf_counter() - started)
+
+    def close_all(self):
+        if self._task is not None:
+            self._task.cancel()
+        for conn in self.connections:
+            conn.close()
+        _spectators.dec(len(self.connections))
+        self.connections.clear()
+        self.pending.clear()